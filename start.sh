@@ -5,12 +5,84 @@ if [ ! -z "$API_URL" ]; then
     sed -i "s|http://localhost:5000|$API_URL|g" /app/whtconsole/dist/spa/js/*.js
 fi
 
+# Number of API processes (each one a single gevent worker)
+WORKERS=${WORKERS:-1}
+
+# Number of webhook ingest processes; 0 serves webhooks from the API processes
+INGEST_WORKERS=${INGEST_WORKERS:-0}
+
+# More than one process needs a message queue so live updates reach
+# clients connected to any of them
+if [ "$WORKERS" -gt 1 ] || [ "$INGEST_WORKERS" -gt 0 ]; then
+    export SOCKETIO_MESSAGE_QUEUE=${SOCKETIO_MESSAGE_QUEUE:-mongodb}
+fi
+
+# Each process gets its own socket; nginx pins clients to one of them
+# (ip_hash) so Socket.IO sessions stay on the process that owns them
+UPSTREAM=/etc/nginx/conf.d/whtesting-upstream.conf
+echo "upstream whtesting_api {" > $UPSTREAM
+echo "    ip_hash;" >> $UPSTREAM
+
+# Prometheus scrapes each process separately on this port, e.g.
+# /metrics/api/0; 0 disables the listener. Keep it off the public network
+METRICS_PORT=${METRICS_PORT:-9180}
+METRICS_CONF=/etc/nginx/conf.d/whtesting-metrics.conf
+: > $METRICS_CONF
+if [ "$METRICS_PORT" -gt 0 ]; then
+    echo "server {" >> $METRICS_CONF
+    echo "    listen $METRICS_PORT;" >> $METRICS_CONF
+fi
+
+# Scrape location for the process behind a socket
+add_metrics_target() {
+    if [ "$METRICS_PORT" -gt 0 ]; then
+        echo "    location = /metrics/$1 { proxy_pass http://unix:$2:/api/metrics; }" >> $METRICS_CONF
+    fi
+}
+
 # Start Gunicorn with gevent worker
 cd /app/whtapi
-gunicorn --worker-class geventwebsocket.gunicorn.workers.GeventWebSocketWorker \
-         --workers 1 \
-         --bind unix:/run/whtesting/gunicorn.sock \
-         'app:create_app()' &
+
+# Build missing indexes once, before any process serves requests
+JOB_WORKERS=0 RETENTION_INTERVAL_S=0 flask --app 'app:create_app()' indexes ensure \
+    || echo "Could not ensure indexes, run 'flask indexes ensure' once MongoDB is reachable"
+for i in $(seq 0 $((WORKERS - 1))); do
+    # Only the first process runs the retention pruner
+    if [ "$i" -gt 0 ]; then
+        export RETENTION_INTERVAL_S=0
+    fi
+    gunicorn --worker-class geventwebsocket.gunicorn.workers.GeventWebSocketWorker \
+             --workers 1 \
+             --bind unix:/run/whtesting/gunicorn-$i.sock \
+             'app:create_app()' &
+    echo "    server unix:/run/whtesting/gunicorn-$i.sock;" >> $UPSTREAM
+    add_metrics_target api/$i /run/whtesting/gunicorn-$i.sock
+done
+echo "}" >> $UPSTREAM
+
+# Webhooks go to the ingest processes or are spread over the API
+# processes (they need no session affinity). Each ingest process has its
+# own socket so its metrics can be scraped
+echo "upstream whtesting_ingest {" >> $UPSTREAM
+if [ "$INGEST_WORKERS" -gt 0 ]; then
+    for i in $(seq 0 $((INGEST_WORKERS - 1))); do
+        gunicorn --worker-class gevent \
+                 --workers 1 \
+                 --bind unix:/run/whtesting/ingest-$i.sock \
+                 'app:create_ingest_app()' &
+        echo "    server unix:/run/whtesting/ingest-$i.sock;" >> $UPSTREAM
+        add_metrics_target ingest/$i /run/whtesting/ingest-$i.sock
+    done
+else
+    for i in $(seq 0 $((WORKERS - 1))); do
+        echo "    server unix:/run/whtesting/gunicorn-$i.sock;" >> $UPSTREAM
+    done
+fi
+echo "}" >> $UPSTREAM
+
+if [ "$METRICS_PORT" -gt 0 ]; then
+    echo "}" >> $METRICS_CONF
+fi
 
 # Start Nginx
-nginx -g 'daemon off;' 
\ No newline at end of file
+nginx -g 'daemon off;'
@@ -1,15 +1,38 @@
 from flask import Flask
 from flask_cors import CORS
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
 from app.routes.auth import auth_bp
 from app.routes.webhook import webhook_bp
 from app.routes.path import path_bp
-from app.utils.websocket import socketio, configure_socketio
+from app.routes.job import job_bp
+from app.routes.metrics import metrics_bp
+from app.utils.websocket import socketio, configure_socketio, configure_socketio_emitter
+from app.utils.ingest import ingest_queue
+from app.utils.ratelimit import ingest_limits
+from app.models.route import route_table
+from app.models.path import (
+    write_webhook_batch,
+    delete_path_data,
+    reconcile_webhook_counts
+)
+from app.models.job import job_runner
+from app.models.retention import retention_pruner
+from app.models.forward import forwarder
+from app.models.rollup import rollup_buffer
+from app.models.storage import webhook_storage, migrate_to_timeseries
+from app.schema import check_indexes, ensure_indexes
+from app.commands import register_commands
+from app.utils.auth import configure_auth_cache
+from app.utils.metrics import configure_metrics
+from app.utils.serialization import BSONJSONProvider
 from config import Config
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    # Responses can carry ObjectIds and datetimes straight from MongoDB
+    app.json = BSONJSONProvider(app)
     
     # CORS configuration
     CORS(app, 
@@ -18,16 +41,145 @@ def create_app():
          allow_headers=["Content-Type", "Authorization"],
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
     
+    # Request timing, and Mongo command timing through the client's listeners
+    listeners = configure_metrics(app)
+    
     # Initialize MongoDB
-    app.mongo = MongoClient(app.config['MONGO_URI'])
+    app.mongo = MongoClient(
+        app.config['MONGO_URI'],
+        event_listeners=listeners,
+        **mongo_client_options(app.config)
+    )
     app.db = app.mongo.get_default_database()
     
+    # Pick the webhook storage backend (creates the time-series collection)
+    webhook_storage.init_app(app)
+    
+    # Indexes are built once per deployment by `flask indexes ensure` (see
+    # start.sh), each process only reports drift from app.schema
+    try:
+        if app.config['ENSURE_INDEXES_ON_STARTUP']:
+            ensure_indexes(app.db, app.config)
+        else:
+            report = check_indexes(app.db, app.config)
+            if report:
+                app.logger.warning(f"Indexes differ from app.schema, run `flask indexes ensure`: {report}")
+    except PyMongoError as e:
+        app.logger.warning(f"Could not check indexes: {e}")
+    
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(webhook_bp, url_prefix='/api/webhook')
     app.register_blueprint(path_bp, url_prefix='/api/paths')
+    app.register_blueprint(job_bp, url_prefix='/api/jobs')
+    app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+    
+    # Size the verified-principal cache used by require_auth
+    configure_auth_cache(app)
+    
+    # Size the webhook route cache
+    route_table.init_app(app)
+    
+    # Webhook rate, concurrency and body size limits
+    ingest_limits.init_app(app)
+    
+    # Start the write-behind ingest flusher (no-op unless INGEST_MODE=batched)
+    ingest_queue.init_app(app, write_webhook_batch)
+    
+    # Start the chart rollup flusher (sync ingest only)
+    rollup_buffer.init_app(app)
+    
+    # Start the forwarding workers (no-op when FORWARD_WORKERS=0)
+    forwarder.init_app(app)
+    
+    # Start the retention pruner (no-op when RETENTION_INTERVAL_S=0)
+    retention_pruner.init_app(app)
+    
+    # Start the background job workers (path data deletion, reconciliation,
+    # storage migration)
+    job_runner.init_app(app, {
+        'delete_path_data': delete_path_data,
+        'reconcile_counts': reconcile_webhook_counts,
+        'migrate_storage': migrate_to_timeseries
+    })
+    
+    # Maintenance commands (flask backfill-rollups, ...)
+    register_commands(app)
     
     # Initialize SocketIO with CORS settings
-    configure_socketio(app)
+    relay = configure_socketio(app)
+    share_route_invalidations(relay)
+    
+    return app
+
+def create_ingest_app():
+    """Minimal app serving only the public webhook endpoint
+
+    Runs as its own pool of processes (see start.sh) so webhook bursts don't
+    compete with the console API for a worker. It resolves, stores and
+    queues live updates like the full app; the updates reach the Socket.IO
+    processes through SOCKETIO_MESSAGE_QUEUE. Indexes, background jobs and
+    retention are left to the API processes.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.json = BSONJSONProvider(app)
     
-    return app 
\ No newline at end of file
+    listeners = configure_metrics(app)
+    app.mongo = MongoClient(
+        app.config['MONGO_URI'],
+        event_listeners=listeners,
+        **mongo_client_options(app.config)
+    )
+    app.db = app.mongo.get_default_database()
+    
+    app.register_blueprint(webhook_bp, url_prefix='/api/webhook')
+    app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+    
+    webhook_storage.init_app(app)
+    route_table.init_app(app)
+    ingest_limits.init_app(app)
+    ingest_queue.init_app(app, write_webhook_batch)
+    rollup_buffer.init_app(app)
+    forwarder.init_app(app)
+    
+    relay = configure_socketio_emitter(app)
+    share_route_invalidations(relay)
+    
+    return app
+
+def mongo_client_options(config):
+    """MongoClient keyword arguments from the MONGO_* settings
+
+    Timeouts left at 0 are not passed, so pymongo's defaults (or the ones
+    in MONGO_URI) apply.
+    """
+    options = {
+        'maxPoolSize': config['MONGO_MAX_POOL_SIZE'],
+        'minPoolSize': config['MONGO_MIN_POOL_SIZE'],
+    }
+    timeouts = {
+        'maxIdleTimeMS': config['MONGO_MAX_IDLE_TIME_MS'],
+        'waitQueueTimeoutMS': config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+        'connectTimeoutMS': config['MONGO_CONNECT_TIMEOUT_MS'],
+        'socketTimeoutMS': config['MONGO_SOCKET_TIMEOUT_MS'],
+        'serverSelectionTimeoutMS': config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+    }
+    options.update({name: value for name, value in timeouts.items() if value > 0})
+    if config['MONGO_COMPRESSORS']:
+        options['compressors'] = config['MONGO_COMPRESSORS']
+    return options
+
+def share_route_invalidations(relay):
+    """Share route cache invalidations with the other processes"""
+    if relay is None:
+        return
+    relay.subscribe(
+        'route_invalidate',
+        lambda data: route_table.apply_invalidation(*data)
+    )
+    route_table.add_invalidation_listener(
+        lambda user_id, user_path: relay.publish_message(
+            'route_invalidate', (user_id, user_path)
+        )
+    ) 
\ No newline at end of file
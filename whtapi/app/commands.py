@@ -0,0 +1,99 @@
+import click
+from bson import ObjectId
+from flask import current_app
+from app.models.job import enqueue_job
+from app.models.path import reconcile_webhook_counts
+from app.models.rollup import backfill_rollups
+from app.models.storage import (
+    webhook_storage,
+    migrate_to_timeseries,
+    migration_status,
+    MIGRATION_BATCH_SIZE
+)
+from app.schema import check_indexes, ensure_indexes
+
+def register_commands(app):
+    """Register the maintenance commands on the app's ``flask`` CLI"""
+
+    @app.cli.command('backfill-rollups')
+    @click.option('--path-id', multiple=True, help='Only rebuild these paths (repeatable)')
+    def backfill_rollups_command(path_id):
+        """Rebuild chart rollups from the stored webhooks"""
+        path_ids = [ObjectId(p) for p in path_id] or None
+        written = backfill_rollups(current_app.db, path_ids)
+        click.echo(f"Wrote {written} rollup buckets")
+
+    @app.cli.command('reconcile-counts')
+    @click.option('--background', is_flag=True, help='Queue a job instead of running it here')
+    def reconcile_counts_command(background):
+        """Reset every path's webhook_count to its actual number of webhooks"""
+        if background:
+            job = enqueue_job(current_app.db, 'reconcile_counts')
+            click.echo(f"Queued job {job['_id']}")
+            return
+        result = reconcile_webhook_counts(current_app.db)
+        click.echo(f"Corrected {result['updated']} paths")
+
+    @app.cli.group('storage')
+    def storage_group():
+        """Move webhooks to the time-series backend, see app.models.storage"""
+
+    @storage_group.command('migrate')
+    @click.option('--batch-size', type=int, default=MIGRATION_BATCH_SIZE, help='Webhooks copied per batch')
+    @click.option('--background', is_flag=True, help='Queue a job instead of running it here')
+    def migrate_storage_command(batch_size, background):
+        """Copy webhook_data into the time-series collection"""
+        if not webhook_storage.timeseries:
+            raise click.UsageError("Set WEBHOOK_STORAGE=timeseries first")
+        if background:
+            job = enqueue_job(current_app.db, 'migrate_storage', {'batch_size': batch_size})
+            click.echo(f"Queued job {job['_id']}")
+            return
+        result = migrate_to_timeseries(
+            current_app.db, {'batch_size': batch_size},
+            lambda progress: click.echo(f"Copied {progress['copied']} webhooks")
+        )
+        click.echo(f"Done, copied {result['copied']} webhooks")
+
+    @storage_group.command('status')
+    def storage_status_command():
+        """Show the backend, migration progress and collection sizes"""
+        click.echo(f"Backend: {webhook_storage.backend} ({webhook_storage.collection_name})"
+                   f"{', dual read' if webhook_storage.dual_read else ''}")
+        status = migration_status(current_app.db)
+        if status:
+            state = 'complete' if status.get('completed_at') else 'in progress'
+            click.echo(f"Migration {state}: {status.get('copied', 0)} copied, "
+                       f"up to {status.get('migrated_until')}")
+        for name, stats in webhook_storage.stats(current_app.db).items():
+            click.echo(f"{name}: {stats['count']} documents, {stats['storage_size']} bytes "
+                       f"on disk, {stats['index_size']} bytes of indexes")
+
+    @app.cli.group('indexes')
+    def indexes_group():
+        """Check or create the indexes declared in app.schema"""
+
+    def print_report(report):
+        for collection, differences in report.items():
+            for kind, names in differences.items():
+                for name in names:
+                    click.echo(f"{collection}: {kind} {name}")
+
+    @indexes_group.command('check')
+    def check_indexes_command():
+        """Report missing, changed and undeclared indexes"""
+        report = check_indexes(current_app.db, current_app.config)
+        print_report(report)
+        if report:
+            raise SystemExit(1)
+        click.echo("Indexes match the schema")
+
+    @indexes_group.command('ensure')
+    @click.option('--drop-extra', is_flag=True, help='Also drop undeclared indexes')
+    def ensure_indexes_command(drop_extra):
+        """Create missing indexes (and optionally drop undeclared ones)"""
+        print_report(ensure_indexes(current_app.db, current_app.config, drop_extra))
+        remaining = check_indexes(current_app.db, current_app.config)
+        if remaining:
+            click.echo("Left as is:")
+            print_report(remaining)
@@ -0,0 +1,301 @@
+import atexit
+import heapq
+from collections import deque
+import http.client
+import itertools
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import DESCENDING
+from pymongo.errors import PyMongoError
+from app.utils.http_pool import HostPolicy, PoolManager
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Delivery states recorded in webhook_deliveries
+PENDING = 'pending'
+DELIVERED = 'delivered'
+FAILED = 'failed'
+
+# Client errors worth retrying; other 4xx responses are final
+RETRY_STATUSES = {408, 425, 429}
+
+# Request headers that are not passed on to forwarding targets
+SKIPPED_HEADERS = {
+    'host', 'content-length', 'connection', 'keep-alive', 'transfer-encoding',
+    'te', 'trailer', 'upgrade', 'proxy-authorization', 'proxy-connection',
+    'x-real-ip', 'x-forwarded-for'
+}
+
+# Attempts kept in each delivery log entry
+LOG_ATTEMPTS = 10
+
+def forward_headers(request_headers, client_ip, webhook_id):
+    """Headers sent with a forwarded webhook: the original ones, minus
+    hop-by-hop headers, plus where it came from"""
+    headers = {
+        name: value for name, value in request_headers
+        if name.lower() not in SKIPPED_HEADERS
+    }
+    headers['X-Forwarded-For'] = client_ip or ''
+    headers['X-Whtesting-Webhook-Id'] = str(webhook_id)
+    return headers
+
+class Forwarder:
+    """Relays received webhooks to their path's forwarding targets
+
+    ``submit`` only puts deliveries on an in-process schedule, so the ingest
+    response never waits for a target. Worker threads send them through a
+    connection pool per target host, which also caps the host's concurrent
+    requests; a delivery for a host at its limit is parked until one of its
+    requests finishes instead of holding a worker. Failures are retried with exponential backoff and
+    every attempt is recorded in the ``webhook_deliveries`` log.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.db = None
+        self.max_pending_bytes = 64 * 1024 * 1024
+        self.max_attempts = 5
+        self.backoff = 1.0
+        self.backoff_max = 300.0
+        self.pools = PoolManager()
+        self._schedule = []  # heap of (due, seq, delivery)
+        self._parked = {}  # pool key -> deque of deliveries waiting for a slot
+        self._pending_bytes = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def init_app(self, app):
+        """Configure the forwarder from the app config and start the workers"""
+        config = app.config
+        self.enabled = config['FORWARD_WORKERS'] > 0
+        if not self.enabled:
+            return
+
+        self.db = app.db
+        self.max_pending_bytes = config['FORWARD_QUEUE_BYTES']
+        self.max_attempts = config['FORWARD_MAX_ATTEMPTS']
+        self.backoff = config['FORWARD_BACKOFF_S']
+        self.backoff_max = config['FORWARD_BACKOFF_MAX_S']
+        self.pools = PoolManager(
+            config['FORWARD_TIMEOUT_S'], HostPolicy(config['FORWARD_ALLOWED_HOSTS']),
+            config['FORWARD_MAX_POOLS']
+        )
+        self._stopping = False
+
+        for i in range(config['FORWARD_WORKERS']):
+            thread = threading.Thread(
+                target=self._run,
+                name=f'webhook-forwarder-{i}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10.0):
+        """Stop the workers; deliveries still scheduled are dropped"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        with self._cond:
+            self._schedule, self._parked, self._pending_bytes = [], {}, 0
+        self.pools.clear()
+
+    def submit(self, webhook_doc, targets, body, headers):
+        """Schedule the delivery of a webhook to each of its targets
+
+        Never blocks on the network. When the bodies of the deliveries
+        already waiting add up to FORWARD_QUEUE_BYTES, new ones are dropped.
+
+        Returns:
+            int: Number of deliveries scheduled
+        """
+        if not self.enabled:
+            return 0
+
+        now = time.monotonic()
+        scheduled = 0
+        with self._cond:
+            for target in targets:
+                if self._pending_bytes + len(body) > self.max_pending_bytes:
+                    metrics.inc('whtesting_forward_dropped_total')
+                    logger.warning("Forwarding queue full, dropping delivery to %s", target['url'])
+                    continue
+                delivery = {
+                    '_id': ObjectId(),
+                    'webhook_id': webhook_doc['_id'],
+                    'path_id': webhook_doc['path_id'],
+                    'user_id': webhook_doc['user_id'],
+                    'url': target['url'],
+                    'concurrency': target['concurrency'],
+                    'body': body,
+                    'headers': headers,
+                    'attempts': 0,
+                    'created_at': datetime.now(timezone.utc)
+                }
+                self._push(delivery, now)
+                scheduled += 1
+            self._cond.notify(scheduled)
+        return scheduled
+
+    def pending(self):
+        """Number of deliveries waiting to be sent or retried"""
+        return len(self._schedule) + sum(len(parked) for parked in self._parked.values())
+
+    def pending_bytes(self):
+        """Size of the bodies of the deliveries waiting"""
+        return self._pending_bytes
+
+    def _push(self, delivery, due):
+        # Called with self._cond held
+        heapq.heappush(self._schedule, (due, next(self._seq), delivery))
+        self._pending_bytes += len(delivery['body'])
+
+    def _schedule_at(self, delivery, due):
+        with self._cond:
+            self._push(delivery, due)
+            self._cond.notify()
+
+    def _acquire(self, pool, delivery):
+        """Take a slot of the pool, or park the delivery until one is released"""
+        with self._cond:
+            if pool.acquire():
+                return True
+            self._parked.setdefault(pool.key, deque()).append(delivery)
+            self._pending_bytes += len(delivery['body'])
+            return False
+
+    def _release(self, pool):
+        """Give the slot back and wake the oldest delivery parked for its host"""
+        with self._cond:
+            pool.release()
+            parked = self._parked.get(pool.key)
+            if parked:
+                delivery = parked.popleft()
+                if not parked:
+                    del self._parked[pool.key]
+                self._pending_bytes -= len(delivery['body'])
+                self._push(delivery, time.monotonic())
+                self._cond.notify()
+
+    def _next(self):
+        """Wait for the next due delivery, None when stopping"""
+        with self._cond:
+            while not self._stopping:
+                wait = None
+                if self._schedule:
+                    wait = self._schedule[0][0] - time.monotonic()
+                    if wait <= 0:
+                        delivery = heapq.heappop(self._schedule)[2]
+                        self._pending_bytes -= len(delivery['body'])
+                        return delivery
+                self._cond.wait(wait)
+            return None
+
+    def _run(self):
+        while True:
+            delivery = self._next()
+            if delivery is None:
+                return
+            pool, target = self.pools.pool_for(delivery['url'], delivery['concurrency'])
+            if not self._acquire(pool, delivery):
+                continue
+            try:
+                self.attempt(delivery, pool, target)
+            except Exception:
+                logger.exception("Forwarding to %s failed", delivery['url'])
+            finally:
+                self._release(pool)
+
+    def attempt(self, delivery, pool, target):
+        """Send a delivery once, then log it and schedule a retry if needed
+
+        Returns:
+            str: The delivery's status after this attempt
+        """
+        delivery['attempts'] += 1
+        status_code, error = None, None
+        started = time.perf_counter()
+        try:
+            status_code, _ = pool.request('POST', target, delivery['body'], delivery['headers'])
+        except (OSError, http.client.HTTPException) as e:
+            error = f"{type(e).__name__}: {e}"
+        duration = time.perf_counter() - started
+
+        retryable = status_code is None or status_code >= 500 or status_code in RETRY_STATUSES
+        next_attempt_at = None
+        if status_code is not None and 200 <= status_code < 300:
+            status = DELIVERED
+        elif retryable and delivery['attempts'] < self.max_attempts:
+            status = PENDING
+            delay = min(self.backoff * 2 ** (delivery['attempts'] - 1), self.backoff_max)
+            delay *= random.uniform(0.5, 1.0)
+            next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            self._schedule_at(delivery, time.monotonic() + delay)
+        else:
+            status = FAILED
+
+        metrics.observe('whtesting_forward_seconds', duration, status=status)
+        self._log(delivery, status, status_code, error, duration, next_attempt_at)
+        return status
+
+    def _log(self, delivery, status, status_code, error, duration, next_attempt_at):
+        now = datetime.now(timezone.utc)
+        try:
+            self.db.webhook_deliveries.update_one(
+                {'_id': delivery['_id']},
+                {
+                    '$set': {
+                        'status': status,
+                        'attempts': delivery['attempts'],
+                        'status_code': status_code,
+                        'error': error,
+                        'updated_at': now,
+                        'next_attempt_at': next_attempt_at
+                    },
+                    '$setOnInsert': {
+                        'webhook_id': delivery['webhook_id'],
+                        'path_id': delivery['path_id'],
+                        'user_id': delivery['user_id'],
+                        'url': delivery['url'],
+                        'created_at': delivery['created_at']
+                    },
+                    '$push': {'log': {
+                        '$each': [{
+                            'at': now,
+                            'status_code': status_code,
+                            'error': error,
+                            'duration_ms': round(duration * 1000, 1)
+                        }],
+                        '$slice': -LOG_ATTEMPTS
+                    }}
+                },
+                upsert=True
+            )
+        except PyMongoError:
+            logger.exception("Failed to log delivery %s", delivery['_id'])
+
+forwarder = Forwarder()
+
+metrics.describe('whtesting_forward_seconds', 'histogram', 'Webhook forwarding attempts by outcome')
+metrics.describe('whtesting_forward_dropped_total', 'counter', 'Deliveries dropped because the forwarding queue was full')
+metrics.gauge('whtesting_forward_pending', 'Deliveries waiting to be sent or retried', forwarder.pending)
+metrics.gauge('whtesting_forward_pending_bytes', 'Body bytes of the deliveries waiting', forwarder.pending_bytes)
+
+def get_deliveries(db, path_id, limit, webhook_id=None):
+    """Latest deliveries of a path's webhooks, newest first"""
+    query = {'path_id': path_id}
+    if webhook_id is not None:
+        query['webhook_id'] = webhook_id
+    return list(db.webhook_deliveries.find(query).sort('created_at', DESCENDING).limit(limit))
@@ -0,0 +1,216 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle: queued -> running -> done | failed. A running job whose
+# lease ran out (its worker died) is claimed again and resumed, unless it
+# has used up its attempts.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+def enqueue_job(db, job_type, params=None, user_id=None, run_after=None):
+    """Queue a job for the background workers
+
+    Args:
+        run_after (datetime): Earliest time the job may run, None for now
+
+    Returns:
+        dict: The job document
+    """
+    job = {
+        '_id': ObjectId(),
+        'type': job_type,
+        'params': params or {},
+        'user_id': user_id,
+        'status': QUEUED,
+        'progress': {},
+        'attempts': 0,
+        'error': None,
+        'created_at': datetime.now(timezone.utc),
+        'run_after': run_after,
+        'lease_until': None
+    }
+    db.jobs.insert_one(job)
+    return job
+
+def get_job(db, job_id, user_id):
+    """Get a job owned by a user
+
+    Returns:
+        tuple: (job_dict, error_message)
+    """
+    try:
+        job_obj_id = ObjectId(job_id)
+    except:
+        return None, "Invalid job ID"
+
+    job = db.jobs.find_one({'_id': job_obj_id, 'user_id': user_id}, {'lease_until': 0})
+    if not job:
+        return None, "Job not found"
+    return job, None
+
+class JobRunner:
+    """Worker threads running jobs from the ``jobs`` collection
+
+    Jobs are claimed with an atomic update that takes a lease, so any number
+    of processes can run workers. Handlers are called as
+    ``handler(db, params, report)`` and must be safe to resume: ``report``
+    saves progress and renews the lease, and a job whose worker died is
+    picked up again once its lease expires.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.handlers = {}
+        self.workers = 0
+        self.poll_interval = 1.0
+        self.lease = timedelta(seconds=60)
+        self.max_attempts = 3
+        self._threads = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+
+    def init_app(self, app, handlers):
+        """Configure the runner from the app config and start the workers"""
+        config = app.config
+        self.db = app.db
+        self.handlers = handlers
+        self.workers = config['JOB_WORKERS']
+        self.poll_interval = config['JOB_POLL_INTERVAL_S']
+        self.lease = timedelta(seconds=config['JOB_LEASE_S'])
+        self.max_attempts = config['JOB_MAX_ATTEMPTS']
+
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                name=f'job-worker-{i}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        if self._threads:
+            atexit.register(self.stop)
+
+    def stop(self, timeout=10.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def claim(self):
+        """Take the oldest runnable job, None if there is none"""
+        now = datetime.now(timezone.utc)
+        return self.db.jobs.find_one_and_update(
+            {
+                'type': {'$in': list(self.handlers)},
+                '$or': [
+                    {'status': QUEUED, 'run_after': {'$not': {'$gt': now}}},
+                    {
+                        'status': RUNNING,
+                        'lease_until': {'$lt': now},
+                        'attempts': {'$lt': self.max_attempts}
+                    }
+                ]
+            },
+            {
+                '$set': {
+                    'status': RUNNING,
+                    'lease_until': now + self.lease,
+                    'started_at': now
+                },
+                '$inc': {'attempts': 1}
+            },
+            sort=[('created_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def fail_abandoned(self):
+        """Fail jobs whose lease ran out on their last attempt
+
+        Returns:
+            int: Number of jobs failed
+        """
+        now = datetime.now(timezone.utc)
+        result = self.db.jobs.update_many(
+            {
+                'status': RUNNING,
+                'lease_until': {'$lt': now},
+                'attempts': {'$gte': self.max_attempts}
+            },
+            {'$set': {
+                'status': FAILED,
+                'error': "Worker lost the job on its last attempt",
+                'lease_until': None,
+                'finished_at': now
+            }}
+        )
+        return result.modified_count
+
+    def run_job(self, job):
+        """Run a claimed job to completion and record the outcome"""
+        def report(progress):
+            self.db.jobs.update_one(
+                {'_id': job['_id']},
+                {'$set': {
+                    'progress': progress,
+                    'lease_until': datetime.now(timezone.utc) + self.lease
+                }}
+            )
+
+        try:
+            result = self.handlers[job['type']](self.db, job['params'], report)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job['_id'], job['type'])
+            retry = job['attempts'] < self.max_attempts
+            self.db.jobs.update_one({'_id': job['_id']}, {'$set': {
+                'status': QUEUED if retry else FAILED,
+                'error': str(e),
+                'lease_until': None,
+                **({} if retry else {'finished_at': datetime.now(timezone.utc)})
+            }})
+            return
+
+        self.db.jobs.update_one({'_id': job['_id']}, {'$set': {
+            'status': DONE,
+            'result': result,
+            'error': None,
+            'lease_until': None,
+            'finished_at': datetime.now(timezone.utc)
+        }})
+
+    def run_pending(self):
+        """Run jobs until none are left
+
+        Returns:
+            int: Number of jobs run
+        """
+        self.fail_abandoned()
+        count = 0
+        while not self._stopping.is_set():
+            job = self.claim()
+            if job is None:
+                break
+            self.run_job(job)
+            count += 1
+        return count
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.run_pending()
+            except PyMongoError:
+                logger.exception("Job worker failed to claim a job")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+job_runner = JobRunner()
@@ -1,14 +1,258 @@
-from datetime import datetime, timezone
-from bson import ObjectId
+import json
+import logging
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from bson import Binary, ObjectId
 from flask import current_app
-from app.utils.base62 import objectid_to_base62
+from pymongo import ASCENDING, ReturnDocument, UpdateOne, WriteConcern
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.utils.fields import build_projection
+from app.utils.ingest import ingest_queue
+from app.models.route import route_table
+from app.models.job import enqueue_job
+from app.models.retention import effective_retention
+from app.models.rollup import get_rollup_series, record_rollups, rollup_buffer
+from app.models.search import add_search_fields
+from app.models.storage import webhook_storage
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# A webhook document waiting to be written, with its out-of-line payload
+# document for webhook_payloads (or None when the payload is kept inline)
+# and the durability tier it is written with
+PendingWebhook = namedtuple('PendingWebhook', ['doc', 'payload_doc', 'durability'], defaults=(None,))
+
+# Write concerns of the durability tiers a path can pick for its webhooks;
+# without a tier (or INGEST_DURABILITY) the client's write concern applies
+DURABILITY_TIERS = {
+    'fire_and_forget': WriteConcern(w=0),
+    'acknowledged': WriteConcern(w=1, j=False),
+    'majority': WriteConcern(w='majority', j=True),
+}
+
+# Database handles per (database, tier), see durability_db
+_durability_dbs = {}
+
+# Internal storage fields of compressed/out-of-line payloads
+PAYLOAD_STORAGE_FIELDS = ('payload_z', 'payload_codec', 'payload_format', 'payload_external')
+
+# Leave the compressed bytes and the search fields out of list queries,
+# payloads are fetched lazily
+LIST_PROJECTION = {'payload_z': 0, 'search_fields': 0, 'search_text': 0}
+
+# Fields a webhook listing can ask for with ``fields=``, and the stored
+# fields each one is built from
+WEBHOOK_FIELDS = {
+    '_id': ('_id',),
+    'path_id': ('path_id',),
+    'user_id': ('user_id',),
+    'received_at': ('received_at',),
+    'content_type': ('content_type',),
+    'ip_address': ('ip_address',),
+    'payload': ('payload', 'payload_codec', 'payload_format', 'payload_size',
+                'payload_preview', 'payload_external'),
+}
+
+# Fields a path listing can ask for; base and effective_retention are computed
+PATH_FIELDS = {
+    '_id': ('_id',),
+    'user_id': ('user_id',),
+    'path': ('path',),
+    'description': ('description',),
+    'created_at': ('created_at',),
+    'last_used': ('last_used',),
+    'webhook_count': ('webhook_count',),
+    'retention': ('retention',),
+    'forward_targets': ('forward_targets',),
+    'durability': ('durability',),
+    'base': (),
+    'effective_retention': ('retention',),
+}
+
+# Documents deleted or counters updated per round trip by background jobs
+JOB_BATCH_SIZE = 1000
+
+# Extra wait before a deleted path's data is removed, on top of the route
+# cache TTL and flush interval, for webhook requests still being handled
+PATH_DELETE_MARGIN_S = 30
+
+def _compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return zlib.compress(data)
+
+def _decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this payload")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def durability_db(db, tier):
+    """Database handle whose collections write with the tier's write concern
+
+    Handles are created once per tier. An unset or unknown tier gives
+    ``db`` itself, i.e. the client's write concern.
+    """
+    write_concern = DURABILITY_TIERS.get(tier)
+    if write_concern is None:
+        return db
+    handle = _durability_dbs.get((db, tier))
+    if handle is None:
+        handle = _durability_dbs[(db, tier)] = db.with_options(write_concern=write_concern)
+    return handle
+
+def encode_payload(webhook_doc, config, body_size=None):
+    """Pick the storage tier of a webhook's payload
+
+    Payloads up to PAYLOAD_COMPRESS_THRESHOLD bytes stay inline as they are.
+    Larger ones are compressed and replaced by a preview; above
+    PAYLOAD_EXTERNAL_THRESHOLD the compressed bytes go to webhook_payloads
+    instead of the webhook document.
+
+    Args:
+        webhook_doc (dict): Webhook document, updated in place
+        config (dict): App config
+        body_size (int): Request body size, avoids serializing small payloads
+
+    Returns:
+        PendingWebhook: The document and its out-of-line payload document
+    """
+    threshold = config['PAYLOAD_COMPRESS_THRESHOLD']
+    if threshold <= 0 or (body_size is not None and body_size <= threshold):
+        return PendingWebhook(webhook_doc, None)
+
+    payload = webhook_doc.get('payload')
+    if isinstance(payload, str):
+        raw, payload_format = payload.encode('utf-8'), 'text'
+    else:
+        raw = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+        payload_format = 'json'
+
+    if len(raw) <= threshold:
+        return PendingWebhook(webhook_doc, None)
+
+    codec = config['PAYLOAD_COMPRESSION']
+    if codec == 'zstd' and zstandard is None:
+        codec = 'zlib'
+    compressed = Binary(_compress(raw, codec))
+
+    del webhook_doc['payload']
+    webhook_doc.update({
+        'payload_codec': codec,
+        'payload_format': payload_format,
+        'payload_size': len(raw),
+        'payload_preview': raw[:config['PAYLOAD_PREVIEW_BYTES']].decode('utf-8', 'ignore')
+    })
+
+    if len(raw) <= config['PAYLOAD_EXTERNAL_THRESHOLD']:
+        webhook_doc['payload_z'] = compressed
+        return PendingWebhook(webhook_doc, None)
+
+    webhook_doc['payload_external'] = True
+    return PendingWebhook(webhook_doc, {
+        '_id': webhook_doc['_id'],
+        'path_id': webhook_doc['path_id'],
+        'received_at': webhook_doc['received_at'],
+        'data': compressed
+    })
+
+def decode_payload(webhook_doc, external_data=None):
+    """Return the full payload of a webhook document, whatever its tier
+
+    Args:
+        external_data (bytes): Compressed bytes from webhook_payloads, needed
+            for out-of-line payloads
+    """
+    codec = webhook_doc.get('payload_codec')
+    if codec is None:
+        return webhook_doc.get('payload')
+
+    data = external_data if webhook_doc.get('payload_external') else webhook_doc.get('payload_z')
+    if data is None:
+        raise ValueError("Payload data is missing")
+
+    raw = _decompress(data, codec)
+    if webhook_doc.get('payload_format') == 'text':
+        return raw.decode('utf-8')
+    return json.loads(raw)
+
+def load_payload(db, webhook_doc):
+    """Return the full payload of a webhook document, fetching it if stored out of line"""
+    external_data = None
+    if webhook_doc.get('payload_external'):
+        stored = db.webhook_payloads.find_one({'_id': webhook_doc['_id']})
+        external_data = stored['data'] if stored else None
+    return decode_payload(webhook_doc, external_data)
+
+def iter_full_payloads(db, docs, batch_size=100):
+    """Yield webhook documents with their full payloads filled in
+
+    Out-of-line payloads are fetched with one query per batch of documents.
+    """
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield from _fill_payloads(db, batch)
+            batch = []
+    yield from _fill_payloads(db, batch)
+
+def _fill_payloads(db, docs):
+    external_ids = [doc['_id'] for doc in docs if doc.get('payload_external')]
+    external = {}
+    if external_ids:
+        external = {
+            stored['_id']: stored['data']
+            for stored in db.webhook_payloads.find({'_id': {'$in': external_ids}})
+        }
+    for doc in docs:
+        doc['payload'] = decode_payload(doc, external.get(doc['_id']))
+        yield doc
+
+def present_payload(webhook_doc):
+    """Shape a webhook document's payload for list responses
+
+    Compressed and out-of-line payloads are returned as their preview, with
+    a payload_ref for /data/<webhook_id>/payload.
+    """
+    if 'payload_codec' not in webhook_doc:
+        return webhook_doc
+    for field in PAYLOAD_STORAGE_FIELDS:
+        webhook_doc.pop(field, None)
+    webhook_doc['payload'] = None
+    webhook_doc['payload_truncated'] = True
+    webhook_doc['payload_ref'] = str(webhook_doc['_id'])
+    return webhook_doc
+
+def get_webhooks_since(db, user_id, after_id, limit):
+    """A user's webhooks stored after ``after_id``, oldest first
+
+    At most ``limit`` + 1 documents are returned so callers can tell when
+    more than ``limit`` follow. Payloads are presented as in list responses.
+    """
+    # Webhooks are stamped just before their _id is made, so the received_at
+    # bound (with some clock skew between processes) leaves none out; it
+    # lets the time-series backend skip older buckets
+    cursor = webhook_storage.find(db, {
+        'user_id': user_id,
+        '_id': {'$gt': after_id},
+        'received_at': {'$gte': after_id.generation_time - timedelta(minutes=1)}
+    }, LIST_PROJECTION, sort=[('_id', ASCENDING)], limit=limit + 1)
+    return [present_payload(doc) for doc in cursor]
 
 def create_path(user_id, path, description=None):
     """Create a new path for a user"""
     db = current_app.db
     
     # Check if path already exists for this user
-    if db.paths.find_one({'user_id': user_id, 'path': path}):
+    if db.paths.find_one({'user_id': user_id, 'path': path, 'deleted_at': None}):
         return None, "Path already exists for this user"
     
     path_doc = {
@@ -17,70 +261,316 @@ def create_path(user_id, path, description=None):
         'description': description,
         'created_at': datetime.now(timezone.utc),
         'last_used': None,
-        'webhook_count': 0
+        'webhook_count': 0,
+        'deleted_at': None
     }
     
-    # Ensure indexes
-    db.paths.create_index([('user_id', 1), ('path', 1)], unique=True)
-    db.paths.create_index('user_id')  # For listing paths
-    
-    result = db.paths.insert_one(path_doc)
-    path_doc['_id'] = str(result.inserted_id)
-    path_doc['user_id'] = str(user_id)
+    db.paths.insert_one(path_doc)
+    route_table.invalidate(user_id, path)
     
     return path_doc, None
 
-def get_user_paths(user_id):
-    """Get all paths for a user"""
+def get_user_paths(user_id, base62_id, fields=None):
+    """Get all paths for a user
+
+    Args:
+        base62_id (str): The user's stored base62_id, shown as each path's base
+        fields (set): PATH_FIELDS names to return, None for all of them
+    """
     db = current_app.db
-    paths = list(db.paths.find({'user_id': user_id}))
+    projection = None if fields is None else build_projection(fields, PATH_FIELDS)
+    paths = list(db.paths.find({'user_id': user_id, 'deleted_at': None}, projection))
     
-    # Convert ObjectId to string for JSON serialization
+    # ObjectIds and dates are encoded by the app's JSON provider
+    retention_days = current_app.config['RETENTION_DAYS']
     for path in paths:
-        path['_id'] = str(path['_id'])
-        path['user_id'] = str(path['user_id'])
-        path['base'] = objectid_to_base62(user_id)  # Add base62_id
+        if fields is None or 'base' in fields:
+            path['base'] = base62_id  # Add base62_id
+        if fields is None or 'effective_retention' in fields:
+            path['effective_retention'] = effective_retention(path, retention_days)
     
     return paths
 
-def delete_path(user_id, path_id):
-    """Delete a path and its associated webhook data"""
+def get_user_paths_summary(user_id, base62_id, resolution, start, end, events=0):
+    """Get all paths for a user with their sparkline series and latest events
+
+    The cost does not grow with the number of paths: the sparklines come from
+    one grouped aggregation over the rollups of all the user's paths, and the
+    latest ``events`` webhooks of each path are joined in with an indexed
+    ``$lookup`` sub-pipeline.
+    """
+    db = current_app.db
+
+    pipeline = [{'$match': {'user_id': user_id, 'deleted_at': None}}]
+    if events:
+        pipeline.append(webhook_storage.latest_lookup(db, events, LIST_PROJECTION, 'events'))
+    paths = list(db.paths.aggregate(pipeline))
+
+    series_by_path = get_rollup_series(
+        db, [path['_id'] for path in paths], resolution, start, end
+    )
+
+    retention_days = current_app.config['RETENTION_DAYS']
+    for path in paths:
+        timestamps, counts = series_by_path[path['_id']]
+        path['chart'] = {'timestamps': timestamps, 'counts': counts}
+        path['effective_retention'] = effective_retention(path, retention_days)
+        path['base'] = base62_id
+
+        for event in path.get('events', []):
+            present_payload(event)
+
+    return paths
+
+def update_path_settings(user_id, base62_id, path_id, settings):
+    """Update a path's settings
+
+    Args:
+        settings (dict): Fields to set; a None value removes the field
+
+    Returns:
+        tuple: (path_doc, error_message)
+    """
     db = current_app.db
     
     try:
         path_obj_id = ObjectId(path_id)
     except:
-        return False, "Invalid path ID"
+        return None, "Invalid path ID"
     
-    # Find and delete path
-    path = db.paths.find_one_and_delete({
-        '_id': path_obj_id,
-        'user_id': user_id
-    })
+    update = {}
+    to_set = {k: v for k, v in settings.items() if v is not None}
+    to_unset = {k: '' for k, v in settings.items() if v is None}
+    if to_set:
+        update['$set'] = to_set
+    if to_unset:
+        update['$unset'] = to_unset
+    
+    query = {'_id': path_obj_id, 'user_id': user_id, 'deleted_at': None}
+    path = db.paths.find_one_and_update(
+        query,
+        update,
+        return_document=ReturnDocument.AFTER
+    ) if update else db.paths.find_one(query)
     
     if not path:
-        return False, "Path not found or unauthorized"
+        return None, "Path not found or unauthorized"
     
-    # Delete associated webhook data
-    db.webhook_data.delete_many({'path_id': path_obj_id})
+    # Cached routes carry the forwarding targets and durability tier
+    if settings.keys() & {'forward_targets', 'durability'}:
+        route_table.invalidate(user_id, path['path'])
     
-    return True, None
+    path['base'] = base62_id
+    path['effective_retention'] = effective_retention(
+        path, current_app.config['RETENTION_DAYS']
+    )
+    return path, None
+
+def delete_path(user_id, path_id):
+    """Delete a path and queue the deletion of its webhook data
+
+    The path is marked deleted right away, which hides it and stops new
+    webhooks from being routed to it. Its webhooks, payloads and rollups
+    are removed in the background by a delete_path_data job, which only
+    starts once every cached route has expired and queued webhooks have
+    been flushed, and removes the path document last.
 
-def record_webhook(path_id, user_id, content_type, payload, headers=None, ip_address=None):
-    """Record a webhook request"""
+    Returns:
+        tuple: (job_id, error_message)
+    """
     db = current_app.db
     
-    # Update path last_used and increment webhook_count
+    try:
+        path_obj_id = ObjectId(path_id)
+    except:
+        return None, "Invalid path ID"
+    
+    now = datetime.now(timezone.utc)
+    path = db.paths.find_one_and_update(
+        {'_id': path_obj_id, 'user_id': user_id, 'deleted_at': None},
+        {'$set': {'deleted_at': now}}
+    )
+    
+    if not path:
+        return None, "Path not found or unauthorized"
+    
+    route_table.invalidate(user_id, path['path'])
+    
+    # Other processes may still route to the path until their cached route
+    # expires, and accepted webhooks may still be queued for a flush
+    config = current_app.config
+    delay = config['ROUTE_CACHE_TTL'] + config['INGEST_FLUSH_INTERVAL_MS'] / 1000.0 \
+        + PATH_DELETE_MARGIN_S
+    job = enqueue_job(db, 'delete_path_data', {'path_id': path_obj_id}, user_id,
+                      run_after=now + timedelta(seconds=delay))
+    
+    return str(job['_id']), None
+
+def delete_path_data(db, params, report):
+    """Job handler: delete a deleted path's data in bounded chunks
+
+    Each chunk is independent, so an interrupted job simply carries on
+    with what is left when it is resumed. The marked path document goes
+    last, once nothing can be written for it any more.
+    """
+    path_id = params['path_id']
+    batch_size = params.get('batch_size', JOB_BATCH_SIZE)
+    deleted = 0
+    if webhook_storage.timeseries:
+        # A path is a series of the time-series collection, deleted at once
+        deleted += webhook_storage.collection(db).delete_many(
+            {'meta.path_id': path_id}
+        ).deleted_count
+        report({'deleted': deleted})
+    while webhook_storage.reads_legacy:
+        ids = [
+            doc['_id'] for doc in
+            db.webhook_data.find({'path_id': path_id}, {'_id': 1}).limit(batch_size)
+        ]
+        if not ids:
+            break
+        deleted += db.webhook_data.delete_many({'_id': {'$in': ids}}).deleted_count
+        db.webhook_payloads.delete_many({'_id': {'$in': ids}})
+        report({'deleted': deleted})
+
+    # Out-of-line payloads whose webhook was never written
+    db.webhook_payloads.delete_many({'path_id': path_id})
+    db.webhook_rollups.delete_many({'path_id': path_id})
+    db.webhook_deliveries.delete_many({'path_id': path_id})
+    db.paths.delete_one({'_id': path_id, 'deleted_at': {'$ne': None}})
+    return {'deleted': deleted}
+
+def build_path_updates(docs):
+    """Coalesce webhook documents into one counter update per path"""
+    per_path = {}
+    for doc in docs:
+        count, last_used = per_path.get(doc['path_id'], (0, None))
+        received_at = doc['received_at']
+        if last_used is None or received_at > last_used:
+            last_used = received_at
+        per_path[doc['path_id']] = (count + 1, last_used)
+
+    return [
+        UpdateOne(
+            {'_id': path_id},
+            {
+                '$inc': {'webhook_count': count},
+                '$max': {'last_used': last_used}
+            }
+        )
+        for path_id, (count, last_used) in per_path.items()
+    ]
+
+def write_webhook_batch(db, entries):
+    """Write a batch of pending webhooks, their payloads and path counters
+
+    Webhooks of each durability tier are written together with its write
+    concern.
+    """
+    tiers = {}
+    for entry in entries:
+        tiers.setdefault(entry.durability, []).append(entry)
+    for tier, tier_entries in tiers.items():
+        _write_entries(durability_db(db, tier), tier_entries)
+
+def _write_entries(db, entries):
+    # Webhooks queued before their path was deleted are dropped
+    path_ids = list({entry.doc['path_id'] for entry in entries})
+    live = {path['_id'] for path in db.paths.find(
+        {'_id': {'$in': path_ids}, 'deleted_at': None}, {'_id': 1}
+    )}
+    if len(live) < len(path_ids):
+        kept = [entry for entry in entries if entry.doc['path_id'] in live]
+        logger.info("Dropped %d webhooks of deleted paths", len(entries) - len(kept))
+        entries = kept
+        if not entries:
+            return
+
+    payload_docs = [entry.payload_doc for entry in entries if entry.payload_doc]
+    if payload_docs:
+        try:
+            db.webhook_payloads.insert_many(payload_docs, ordered=False)
+        except BulkWriteError:
+            logger.exception("Failed to store some out-of-line payloads")
+
+    docs = [entry.doc for entry in entries]
+    inserted = docs
+    try:
+        webhook_storage.insert_many(db, docs, ordered=False)
+    except BulkWriteError as e:
+        # Only count documents that actually made it in
+        failed = {err['index'] for err in e.details.get('writeErrors', [])}
+        inserted = [doc for i, doc in enumerate(docs) if i not in failed]
+        logger.error("Dropped %d webhooks during batch insert", len(failed))
+
+    if not inserted:
+        return
+
+    try:
+        db.paths.bulk_write(build_path_updates(inserted), ordered=False)
+    except PyMongoError:
+        logger.exception("Failed to update path counters for batch")
+
+    try:
+        record_rollups(db, inserted)
+    except PyMongoError:
+        logger.exception("Failed to update rollups for batch")
+
+def store_webhook(webhook_doc, body_size=None, durability=None):
+    """Persist a webhook document and bump its path counters
+
+    The payload's search fields are extracted and large payloads are
+    compressed or moved out of line first (see add_search_fields and
+    encode_payload). In batched ingest mode the document is handed to the
+    write-behind queue instead of being written inline.
+
+    Args:
+        durability (str): The path's DURABILITY_TIERS tier, INGEST_DURABILITY
+            when None
+
+    Returns:
+        tuple: (accepted, error_message)
+    """
+    config = current_app.config
+    add_search_fields(webhook_doc, config)
+    entry = encode_payload(webhook_doc, config, body_size)._replace(
+        durability=durability or config['INGEST_DURABILITY'] or None
+    )
+
+    if ingest_queue.enabled:
+        if not ingest_queue.submit(entry):
+            return False, "Server busy, try again later"
+        return True, None
+
+    db = durability_db(current_app.db, entry.durability)
+    if entry.payload_doc:
+        db.webhook_payloads.insert_one(entry.payload_doc)
+    webhook_storage.insert_one(db, webhook_doc)
     db.paths.update_one(
-        {'_id': path_id},
+        {'_id': webhook_doc['path_id']},
         {
-            '$set': {'last_used': datetime.now(timezone.utc)},
-            '$inc': {'webhook_count': 1}
+            '$inc': {'webhook_count': 1},
+            '$max': {'last_used': webhook_doc['received_at']}
         }
     )
-    
+    # Chart counts are written in the background, see RollupBuffer
+    if rollup_buffer.enabled:
+        rollup_buffer.add([webhook_doc])
+    else:
+        record_rollups(db, [webhook_doc])
+    return True, None
+
+def record_webhook(path_id, user_id, content_type, payload, headers=None, ip_address=None,
+                   durability=None):
+    """Record a webhook request, with the path's durability tier
+
+    Returns:
+        tuple: (webhook_id, error_message); no id when the webhook was not
+            accepted, e.g. because the ingest queue is full
+    """
     # Store webhook data
     webhook_doc = {
+        '_id': ObjectId(),
         'path_id': path_id,
         'user_id': user_id,
         'received_at': datetime.now(timezone.utc),
@@ -90,27 +580,42 @@ def record_webhook(path_id, user_id, content_type, payload, headers=None, ip_add
         'ip_address': ip_address  # Add IP address field
     }
     
-    # Ensure indexes
-    db.webhook_data.create_index('path_id')
-    db.webhook_data.create_index('user_id')
-    db.webhook_data.create_index('received_at')
-    
-    result = db.webhook_data.insert_one(webhook_doc)
-    return str(result.inserted_id)
+    accepted, error = store_webhook(webhook_doc, durability=durability)
+    if not accepted:
+        return None, error
+    return str(webhook_doc['_id']), None
+
+def reconcile_webhook_counts(db, params=None, report=None):
+    """Reset every path's webhook_count to its actual number of webhooks
+
+    Counts come from one $group over the stored webhooks and are written back
+    with bulk updates. Also usable as a job handler.
+
+    Returns:
+        dict: Number of paths whose count was corrected
+    """
+    counts = {
+        row['_id']: row['count'] for row in webhook_storage.aggregate(db, [
+            {'$group': {'_id': '$path_id', 'count': {'$sum': 1}}}
+        ])
+    }
+
+    updates = []
+    for path in db.paths.find({}, {'webhook_count': 1}):
+        actual_count = counts.get(path['_id'], 0)
+        if path.get('webhook_count') != actual_count:
+            updates.append(UpdateOne(
+                {'_id': path['_id']},
+                {'$set': {'webhook_count': actual_count}}
+            ))
+
+    for start in range(0, len(updates), JOB_BATCH_SIZE):
+        db.paths.bulk_write(updates[start:start + JOB_BATCH_SIZE], ordered=False)
+        if report:
+            report({'updated': min(start + JOB_BATCH_SIZE, len(updates))})
+
+    return {'updated': len(updates)}
 
 def update_webhook_counts():
     """Update webhook counts for all paths"""
-    db = current_app.db
-    
-    # Get all paths
-    paths = db.paths.find({})
-    
-    for path in paths:
-        # Count actual webhooks for this path
-        actual_count = db.webhook_data.count_documents({'path_id': path['_id']})
-        
-        # Update path with actual count
-        db.paths.update_one(
-            {'_id': path['_id']},
-            {'$set': {'webhook_count': actual_count}}
-        ) 
\ No newline at end of file
+    return reconcile_webhook_counts(current_app.db)
@@ -0,0 +1,189 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import PyMongoError
+from app.models.rollup import remove_rollups
+from app.models.storage import webhook_storage
+
+logger = logging.getLogger(__name__)
+
+def effective_retention(path, retention_days):
+    """Combine a path's retention overrides with the global retention
+
+    A path can only shorten the global maximum age, never extend it, since
+    the TTL index would delete its data anyway.
+
+    Returns:
+        dict: max_age_days and max_count, None when unlimited
+    """
+    overrides = path.get('retention') or {}
+    ages = [days for days in (overrides.get('max_age_days'), retention_days) if days]
+    return {
+        'max_age_days': min(ages) if ages else None,
+        'max_count': overrides.get('max_count') or None
+    }
+
+def _delete_in_batches(db, path_id, query, batch_size, pause, stopping):
+    """Delete a path's matching webhooks oldest first, batch_size at a time
+
+    The path's counter and chart rollups are decreased to match. Deleting
+    by _id from a time-series collection needs MongoDB 7.0, see
+    RetentionPruner.init_app.
+    """
+    removed = 0
+    while not stopping.is_set():
+        docs = list(webhook_storage.find(
+            db, {'path_id': path_id, **query}, {'_id': 1, 'received_at': 1},
+            sort=[('received_at', 1), ('_id', 1)], limit=batch_size
+        ))
+        if not docs:
+            break
+
+        ids = [doc['_id'] for doc in docs]
+        deleted_count = webhook_storage.delete_many(db, {'_id': {'$in': ids}})
+        db.webhook_payloads.delete_many({'_id': {'$in': ids}})
+        if deleted_count:
+            db.paths.update_one(
+                {'_id': path_id},
+                {'$inc': {'webhook_count': -deleted_count}}
+            )
+        # When some went concurrently (e.g. through the TTL index) it is
+        # not known which, their charts are left to the next backfill
+        if deleted_count == len(docs):
+            remove_rollups(db, [{**doc, 'path_id': path_id} for doc in docs])
+        removed += deleted_count
+
+        if len(ids) < batch_size:
+            break
+        # Give ingest room between batches
+        stopping.wait(pause)
+    return removed
+
+def prune_path(db, path, retention, now, batch_size=1000, pause=0.0, stopping=None):
+    """Apply a path's effective retention
+
+    Returns:
+        int: Number of webhooks deleted
+    """
+    stopping = stopping or threading.Event()
+    removed = 0
+
+    if retention['max_age_days']:
+        cutoff = now - timedelta(days=retention['max_age_days'])
+        removed += _delete_in_batches(
+            db, path['_id'], {'received_at': {'$lt': cutoff}},
+            batch_size, pause, stopping
+        )
+
+    # Ring buffer: drop everything older than the newest max_count webhooks
+    max_count = retention['max_count']
+    if max_count and path.get('webhook_count', 0) - removed > max_count:
+        boundary = next(
+            webhook_storage.find(
+                db, {'path_id': path['_id']}, {'received_at': 1},
+                sort=[('received_at', -1), ('_id', -1)], skip=max_count, limit=1
+            ),
+            None
+        )
+        if boundary:
+            removed += _delete_in_batches(db, path['_id'], {
+                '$or': [
+                    {'received_at': {'$lt': boundary['received_at']}},
+                    {'received_at': boundary['received_at'], '_id': {'$lte': boundary['_id']}}
+                ]
+            }, batch_size, pause, stopping)
+
+    return removed
+
+class RetentionPruner:
+    """Background thread enforcing webhook retention
+
+    Every ``interval`` seconds each path with a maximum age or count is
+    pruned in bounded batches, with a short pause between batches so
+    ingest never waits on a large delete.
+    """
+
+    def __init__(self):
+        self.db = None
+        self.retention_days = 0
+        self.interval = 0
+        self.batch_size = 1000
+        self.pause = 0.0
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        """Configure the pruner from the app config and start it"""
+        config = app.config
+        self.db = app.db
+        self.retention_days = config['RETENTION_DAYS']
+        self.interval = config['RETENTION_INTERVAL_S']
+        self.batch_size = config['RETENTION_BATCH_SIZE']
+        self.pause = config['RETENTION_BATCH_PAUSE_MS'] / 1000.0
+        if self.interval <= 0:
+            return
+
+        # Every pass would fail, refuse to start instead of never pruning
+        if not webhook_storage.deletes_by_filter and self.db.paths.find_one(
+            {'deleted_at': None, 'retention': {'$ne': None}}, {'_id': 1}
+        ):
+            raise RuntimeError(
+                "Per-path retention with WEBHOOK_STORAGE=timeseries needs MongoDB 7.0 "
+                "or later: remove the paths' retention overrides or use standard storage"
+            )
+
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name='webhook-retention-pruner',
+            daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def prune(self):
+        """Run one pruning pass over every path
+
+        Returns:
+            int: Number of webhooks deleted
+        """
+        # The time-series collection expires old webhooks by itself, only
+        # paths with their own limits are pruned there
+        if self.retention_days and not webhook_storage.timeseries:
+            query = {'deleted_at': None}
+        else:
+            query = {'deleted_at': None, '$or': [
+                {'retention.max_age_days': {'$gt': 0}},
+                {'retention.max_count': {'$gt': 0}}
+            ]}
+
+        now = datetime.now(timezone.utc)
+        removed = 0
+        for path in self.db.paths.find(query, {'retention': 1, 'webhook_count': 1}):
+            if self._stopping.is_set():
+                break
+            retention = effective_retention(path, self.retention_days)
+            removed += prune_path(
+                self.db, path, retention, now,
+                self.batch_size, self.pause, self._stopping
+            )
+        return removed
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                removed = self.prune()
+                if removed:
+                    logger.info("Retention pruned %d webhooks", removed)
+            except PyMongoError:
+                logger.exception("Retention pass failed")
+
+retention_pruner = RetentionPruner()
@@ -0,0 +1,274 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from app.models.storage import webhook_storage
+
+logger = logging.getLogger(__name__)
+
+# Bucket size and how long buckets are kept for each rollup resolution
+RESOLUTIONS = {
+    'minute': (timedelta(minutes=1), timedelta(days=2)),
+    'hour': (timedelta(hours=1), timedelta(days=90)),
+    'day': (timedelta(days=1), timedelta(days=800)),
+}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _as_utc(dt):
+    """Mongo hands back naive UTC datetimes, make them aware"""
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def bucket_start(dt, resolution):
+    """Truncate a datetime to the start of its bucket"""
+    step = RESOLUTIONS[resolution][0]
+    dt = _as_utc(dt)
+    return _EPOCH + ((dt - _EPOCH) // step) * step
+
+def count_rollups(docs, counts=None):
+    """Add webhook documents to per-bucket counts
+
+    Returns:
+        dict: (path_id, resolution, bucket) -> count
+    """
+    counts = {} if counts is None else counts
+    for doc in docs:
+        for resolution in RESOLUTIONS:
+            key = (doc['path_id'], resolution, bucket_start(doc['received_at'], resolution))
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def build_rollup_updates(docs):
+    """Coalesce webhook documents into one upserted $inc per bucket"""
+    return rollup_updates(count_rollups(docs))
+
+def rollup_updates(counts):
+    """One upserted $inc per bucket of count_rollups' counts"""
+    return [
+        UpdateOne(
+            {'path_id': path_id, 'resolution': resolution, 'bucket': bucket},
+            {
+                '$inc': {'count': count},
+                '$setOnInsert': {'expire_at': bucket + RESOLUTIONS[resolution][1]}
+            },
+            upsert=True
+        )
+        for (path_id, resolution, bucket), count in counts.items()
+    ]
+
+def record_rollups(db, docs):
+    """Count webhook documents into their per-minute/hour/day buckets"""
+    updates = build_rollup_updates(docs)
+    if updates:
+        db.webhook_rollups.bulk_write(updates, ordered=False)
+
+def remove_rollups(db, docs):
+    """Take deleted webhook documents out of their buckets
+
+    Buckets that expired in the meantime are not recreated.
+    """
+    updates = [
+        UpdateOne(
+            {'path_id': path_id, 'resolution': resolution, 'bucket': bucket},
+            {'$inc': {'count': -count}}
+        )
+        for (path_id, resolution, bucket), count in count_rollups(docs).items()
+    ]
+    if updates:
+        db.webhook_rollups.bulk_write(updates, ordered=False)
+
+class RollupBuffer:
+    """Write-behind rollup counts for webhooks written one at a time
+
+    In sync ingest mode the counts of each webhook are added up in memory
+    and written as one upserted $inc per bucket every ``interval`` seconds,
+    so storing a webhook takes no extra round trip for the charts (batched
+    ingest writes them with each batch instead). Counts not written yet
+    when a process dies are lost; ``flask backfill-rollups`` recounts them.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.db = None
+        self.interval = 1.0
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def init_app(self, app):
+        """Configure the buffer from the app config and start the flusher"""
+        config = app.config
+        self.db = app.db
+        self.interval = config['ROLLUP_FLUSH_INTERVAL_MS'] / 1000.0
+        self.enabled = self.interval > 0 and config['INGEST_MODE'] != 'batched'
+        if not self.enabled:
+            return
+
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name='rollup-flusher',
+            daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def add(self, docs):
+        """Count webhook documents into the next write"""
+        with self._lock:
+            count_rollups(docs, self._counts)
+
+    def flush(self):
+        """Write the buckets counted so far"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        if not counts:
+            return
+        try:
+            self.db.webhook_rollups.bulk_write(rollup_updates(counts), ordered=False)
+        except PyMongoError:
+            logger.exception("Failed to write %d rollup buckets", len(counts))
+
+    def stop(self, timeout=10.0):
+        if self._thread is None:
+            return
+        self.enabled = False
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.flush()
+
+rollup_buffer = RollupBuffer()
+
+def get_rollup_counts(db, path_ids, resolution, start, end):
+    """Read bucket counts for the given paths in one grouped aggregation
+
+    Returns:
+        dict: path_id -> {bucket timestamp in ms: count}
+    """
+    pipeline = [
+        {
+            '$match': {
+                'path_id': {'$in': list(path_ids)},
+                'resolution': resolution,
+                'bucket': {'$gte': bucket_start(start, resolution), '$lte': end}
+            }
+        },
+        {
+            '$group': {
+                '_id': '$path_id',
+                'buckets': {'$push': {'bucket': '$bucket', 'count': '$count'}}
+            }
+        }
+    ]
+
+    counts = {path_id: {} for path_id in path_ids}
+    for group in db.webhook_rollups.aggregate(pipeline):
+        counts[group['_id']] = {
+            _as_utc(bucket['bucket']).timestamp() * 1000: bucket['count']
+            for bucket in group['buckets']
+        }
+    return counts
+
+def get_rollup_series(db, path_ids, resolution, start, end):
+    """Gap-free chart series for the given paths
+
+    Returns:
+        dict: path_id -> (timestamps, counts)
+    """
+    counts = get_rollup_counts(db, path_ids, resolution, start, end)
+    return {
+        path_id: fill_series(path_counts, resolution, start, end)
+        for path_id, path_counts in counts.items()
+    }
+
+def fill_series(counts, resolution, start, end):
+    """Expand sparse bucket counts into a gap-free series
+
+    Args:
+        counts (dict): {bucket timestamp in ms: count}
+
+    Returns:
+        tuple: (timestamps, counts) with timestamps in milliseconds for JS
+    """
+    step = RESOLUTIONS[resolution][0]
+    timestamps = []
+    series = []
+    current = bucket_start(start, resolution)
+
+    while current <= end:
+        timestamp = current.timestamp() * 1000
+        timestamps.append(timestamp)
+        series.append(counts.get(timestamp, 0))
+        current += step
+
+    return timestamps, series
+
+def backfill_rollups(db, path_ids=None, batch_size=1000):
+    """Rebuild rollup buckets from the stored webhooks
+
+    Buckets are overwritten with the recounted value, so this is safe to run
+    repeatedly. Runs one path at a time to keep memory bounded.
+
+    Returns:
+        int: Number of buckets written
+    """
+    if path_ids is None:
+        path_ids = [path['_id'] for path in db.paths.find({'deleted_at': None}, {'_id': 1})]
+
+    written = 0
+    now = datetime.now(timezone.utc)
+    for path_id in path_ids:
+        for resolution, (step, retention) in RESOLUTIONS.items():
+            step_ms = int(step.total_seconds() * 1000)
+            pipeline = [
+                {
+                    '$match': {
+                        'path_id': path_id,
+                        'received_at': {'$gte': now - retention}
+                    }
+                },
+                {
+                    '$group': {
+                        # Truncate to the bucket with plain date arithmetic
+                        '_id': {
+                            '$subtract': [
+                                '$received_at',
+                                {'$mod': [{'$toLong': '$received_at'}, step_ms]}
+                            ]
+                        },
+                        'count': {'$sum': 1}
+                    }
+                }
+            ]
+
+            updates = []
+            for bucket in webhook_storage.aggregate(db, pipeline):
+                bucket_at = _as_utc(bucket['_id'])
+                updates.append(UpdateOne(
+                    {'path_id': path_id, 'resolution': resolution, 'bucket': bucket_at},
+                    {
+                        '$set': {
+                            'count': bucket['count'],
+                            'expire_at': bucket_at + retention
+                        }
+                    },
+                    upsert=True
+                ))
+                if len(updates) >= batch_size:
+                    db.webhook_rollups.bulk_write(updates, ordered=False)
+                    written += len(updates)
+                    updates = []
+
+            if updates:
+                db.webhook_rollups.bulk_write(updates, ordered=False)
+                written += len(updates)
+
+    return written
@@ -0,0 +1,118 @@
+import logging
+from bson import ObjectId
+from flask import current_app
+from app.models.user import get_user_by_base62
+from app.utils.base62 import normalize_base62_id
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class RouteTable:
+    """In-memory resolution of ``(base62_id, user_path)`` to user/path ids
+
+    Resolved routes and lookup misses are kept in separate bounded caches so
+    a flood of requests for unknown ids cannot evict the hot routes. Misses
+    are kept for a shorter TTL since they go stale as soon as a path is
+    created. Ids are keyed in their fixed-width form, so a user's legacy
+    and padded webhook URLs share entries.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._routes = TTLCache()
+        self._misses = TTLCache()
+        self._listeners = []
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config['ROUTE_CACHE_SIZE'] > 0
+        self._routes = TTLCache(config['ROUTE_CACHE_SIZE'], config['ROUTE_CACHE_TTL'])
+        self._misses = TTLCache(
+            config['ROUTE_CACHE_SIZE'],
+            config['ROUTE_CACHE_NEGATIVE_TTL']
+        )
+
+    def resolve(self, base62_id, user_path):
+        """Resolve a webhook URL to its route
+
+        Returns:
+            tuple: (route_dict, error_message)
+                - route_dict: user_id, email, path and path_id of the target
+                - error_message: Why the route could not be resolved
+        """
+        base62_id = normalize_base62_id(base62_id)
+        key = (base62_id, user_path)
+        if self.enabled:
+            route = self._routes.get(key)
+            if route is not None:
+                return route, None
+            miss = self._misses.get(key) or self._misses.get((base62_id, None))
+            if miss is not None:
+                return None, miss[0]
+
+        user, error = get_user_by_base62(base62_id)
+        if error:
+            self._remember_miss((base62_id, None), error, None)
+            return None, error
+
+        user_id = ObjectId(user['_id'])
+        path = current_app.db.paths.find_one(
+            {'user_id': user_id, 'path': user_path, 'deleted_at': None},
+            {'_id': 1, 'forward_targets': 1, 'durability': 1}
+        )
+        if not path:
+            self._remember_miss(key, "Path not found", user_id)
+            return None, "Path not found"
+
+        route = {
+            'user_id': user_id,
+            'email': user['email'],
+            'path': user_path,
+            'path_id': path['_id'],
+            'forward_targets': path.get('forward_targets') or [],
+            'durability': path.get('durability')
+        }
+        if self.enabled:
+            self._routes.set(key, route)
+        return route, None
+
+    def _remember_miss(self, key, error, user_id):
+        if self.enabled:
+            self._misses.set(key, (error, user_id))
+
+    def invalidate(self, user_id, user_path=None):
+        """Drop cached entries for a user's path (or all of the user's paths)
+
+        Registered listeners are notified so other processes can do the same.
+        """
+        self.apply_invalidation(user_id, user_path)
+        for listener in self._listeners:
+            try:
+                listener(user_id, user_path)
+            except Exception:
+                logger.exception("Route invalidation listener failed")
+
+    def apply_invalidation(self, user_id, user_path=None):
+        """Drop cached entries locally, without notifying listeners
+
+        This is the entry point for invalidations received from other
+        processes.
+        """
+        def matches(route_user_id, route_path):
+            return route_user_id == user_id and user_path in (None, route_path)
+
+        self._routes.pop_where(lambda k, route: matches(route['user_id'], k[1]))
+        self._misses.pop_where(lambda k, miss: matches(miss[1], k[1]))
+
+    def add_invalidation_listener(self, listener):
+        """Register ``listener(user_id, user_path)`` to be called on invalidation
+
+        Used to broadcast invalidations to other worker processes.
+        """
+        self._listeners.append(listener)
+
+    def clear(self):
+        self._routes.clear()
+        self._misses.clear()
+
+route_table = RouteTable()
@@ -0,0 +1,134 @@
+import json
+import re
+from collections import deque
+
+# Nesting below this depth is not indexed
+SEARCH_MAX_DEPTH = 8
+
+# Scalar payload values that can be indexed and matched
+_SCALARS = (str, int, float, bool, type(None))
+
+def flatten_payload(payload, max_fields, max_value_length):
+    """Scalar leaves of a JSON payload as ``{'k': key path, 'v': value}`` items
+
+    Key paths are dotted like MongoDB's (``order.id``); array elements share
+    their array's path. Shallow keys are taken first, at most ``max_fields``
+    distinct items are returned and strings are cut to ``max_value_length``.
+    """
+    fields = []
+    seen = set()
+    queue = deque([('', payload, 0)])
+    while queue and len(fields) < max_fields:
+        key, value, depth = queue.popleft()
+        if isinstance(value, dict):
+            if depth < SEARCH_MAX_DEPTH:
+                queue.extend(
+                    (f'{key}.{child}' if key else str(child), child_value, depth + 1)
+                    for child, child_value in value.items()
+                )
+        elif isinstance(value, list):
+            if depth < SEARCH_MAX_DEPTH:
+                queue.extend((key, item, depth + 1) for item in value)
+        elif key and isinstance(value, _SCALARS):
+            if isinstance(value, str):
+                value = value[:max_value_length]
+            marker = (key, type(value), value)
+            if marker not in seen:
+                seen.add(marker)
+                fields.append({'k': key, 'v': value})
+    return fields
+
+def add_search_fields(webhook_doc, config):
+    """Add the indexed search fields to a webhook document before it is stored
+
+    ``search_fields`` holds a bounded set of flattened payload values (see
+    flatten_payload) and ``search_text`` the start of the raw body, for the
+    text index. Both are left out of list responses.
+    """
+    payload = webhook_doc.get('payload')
+
+    max_fields = config['SEARCH_MAX_FIELDS']
+    if max_fields > 0 and isinstance(payload, (dict, list)):
+        fields = flatten_payload(payload, max_fields, config['SEARCH_MAX_VALUE_LENGTH'])
+        if fields:
+            webhook_doc['search_fields'] = fields
+
+    text_bytes = config['SEARCH_TEXT_BYTES']
+    if text_bytes > 0 and payload is not None:
+        if isinstance(payload, str):
+            text = payload
+        else:
+            text = json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=str)
+        webhook_doc['search_text'] = text.encode('utf-8')[:text_bytes].decode('utf-8', 'ignore')
+    return webhook_doc
+
+def _match_values(value, max_value_length):
+    """Values a query string matches: itself and the JSON scalar it spells"""
+    values = [value[:max_value_length]]
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        return values
+    if not isinstance(parsed, str) and isinstance(parsed, _SCALARS):
+        values.append(parsed)
+    return values
+
+def build_search_query(path_id, args, config):
+    """Translate search parameters into a webhook_data filter
+
+    Every filter starts with ``path_id`` so it runs on one of the path's
+    indexes (see app.schema). Supported parameters:
+
+        from, to: received_at range, ISO 8601 (datetimes already parsed)
+        content_type: Content type prefix, e.g. application/json
+        ip: Exact client IP
+        q: Words to look for in the raw body (text index)
+        payload.<key path>: Payload value, e.g. payload.order.id=42
+
+    Args:
+        args (dict): Parameter name -> value
+
+    Returns:
+        tuple: (query, error_message)
+    """
+    query = {'path_id': path_id}
+
+    received_at = {}
+    if args.get('from') is not None:
+        received_at['$gte'] = args['from']
+    if args.get('to') is not None:
+        received_at['$lte'] = args['to']
+    if received_at:
+        query['received_at'] = received_at
+
+    if args.get('content_type'):
+        query['content_type'] = {'$regex': '^' + re.escape(args['content_type'])}
+    if args.get('ip'):
+        query['ip_address'] = args['ip']
+
+    if args.get('q'):
+        if config['SEARCH_TEXT_BYTES'] <= 0:
+            return None, "Text search is disabled"
+        # Time-series collections cannot have text indexes
+        if config['WEBHOOK_STORAGE'] == 'timeseries':
+            return None, "Text search is not available with time-series storage"
+        query['$text'] = {'$search': args['q']}
+
+    predicates = []
+    max_value_length = config['SEARCH_MAX_VALUE_LENGTH']
+    for name, value in args.items():
+        if not name.startswith('payload.'):
+            continue
+        key = name[len('payload.'):]
+        if not key:
+            return None, "Missing payload key"
+        predicates.append({'$elemMatch': {
+            'k': key,
+            'v': {'$in': _match_values(value, max_value_length)}
+        }})
+    if predicates:
+        if config['SEARCH_MAX_FIELDS'] <= 0:
+            return None, "Payload search is disabled"
+        query['search_fields'] = {'$all': predicates}
+
+    return query, None
@@ -0,0 +1,426 @@
+import heapq
+import itertools
+import logging
+import time
+from datetime import datetime, timezone
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import CollectionInvalid, OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Storage backends, see Config.WEBHOOK_STORAGE
+STANDARD = 'standard'
+TIMESERIES = 'timeseries'
+
+# The regular collection webhooks are kept in by the standard backend
+LEGACY_COLLECTION = 'webhook_data'
+
+# Fields kept in the time-series metaField; together they identify a series
+META_FIELDS = ('path_id', 'user_id')
+
+# Progress of `flask storage migrate`, one document in storage_migrations
+MIGRATION_ID = 'webhook_data_timeseries'
+MIGRATION_BATCH_SIZE = 1000
+
+# How long the migration watermark is reused before it is read again
+MIGRATION_STATE_TTL = 5.0
+
+# Turns time-series documents back into webhook_data ones in pipelines
+_FLATTEN_META = [
+    {'$set': {field: f'$meta.{field}' for field in META_FIELDS}},
+    {'$unset': 'meta'},
+]
+
+def to_timeseries(doc):
+    """A webhook document as stored in the time-series collection"""
+    stored = {key: value for key, value in doc.items() if key not in META_FIELDS}
+    stored['meta'] = {field: doc[field] for field in META_FIELDS if field in doc}
+    return stored
+
+def from_timeseries(doc):
+    """A time-series document as the webhook_data document it stands for"""
+    meta = doc.pop('meta', None)
+    if meta:
+        doc.update(meta)
+    return doc
+
+def _timeseries_key(key):
+    return f'meta.{key}' if key in META_FIELDS else key
+
+def timeseries_query(query):
+    """Rewrite a webhook_data filter for the time-series collection"""
+    translated = {}
+    for key, value in query.items():
+        if key in ('$and', '$or', '$nor'):
+            value = [timeseries_query(clause) for clause in value]
+        translated[_timeseries_key(key)] = value
+    return translated
+
+def server_version(db):
+    """The MongoDB server version as a (major, minor) tuple"""
+    return tuple(db.client.server_info()['versionArray'][:2])
+
+def merge_sorted(cursors, sort):
+    """Merge cursors that share a sort order, dropping repeated documents
+
+    ``sort`` is a list of (field, direction) ending with ``_id`` and using
+    one direction throughout, so a document present in two cursors comes
+    out twice in a row.
+    """
+    fields = [field for field, _ in sort]
+    reverse = sort[0][1] == DESCENDING
+    last_id = None
+    for doc in heapq.merge(
+        *cursors, key=lambda d: tuple(d.get(field) for field in fields), reverse=reverse
+    ):
+        if doc['_id'] == last_id:
+            continue
+        last_id = doc['_id']
+        yield doc
+
+class WebhookStorage:
+    """Where webhook documents are kept, see Config.WEBHOOK_STORAGE
+
+    With the standard backend this is a thin layer over webhook_data. With
+    the time-series backend webhooks go to a time-series collection with
+    ``received_at`` as timeField and path_id/user_id under the ``meta``
+    metaField; filters, projections and documents are translated both ways,
+    so callers keep using webhook_data's field names.
+
+    During a cutover (WEBHOOK_DUAL_READ) reads also cover the webhook_data
+    documents after the migration watermark, i.e. those not copied yet. The
+    watermark is cached briefly; a stale one only makes reads look at
+    documents that are in both collections, and those are read once.
+    """
+
+    def __init__(self):
+        self.backend = STANDARD
+        self.collection_name = LEGACY_COLLECTION
+        self.granularity = 'seconds'
+        self.dual_read = False
+        self.expire_after = 0
+        self.filtered_deletes = True
+        self._watermark = (None, 0.0)  # (migrated_until, read_at)
+
+    def init_app(self, app):
+        """Configure the backend and create the time-series collection"""
+        config = app.config
+        self.backend = config['WEBHOOK_STORAGE']
+        if self.backend not in (STANDARD, TIMESERIES):
+            raise ValueError(f"Unknown WEBHOOK_STORAGE: {self.backend}")
+        self.collection_name = LEGACY_COLLECTION
+        if self.timeseries:
+            self.collection_name = config['WEBHOOK_TIMESERIES_COLLECTION']
+        self.granularity = config['WEBHOOK_TIMESERIES_GRANULARITY']
+        self.dual_read = self.timeseries and config['WEBHOOK_DUAL_READ']
+        # Expiry replaces the pruner's global retention, see app.models.retention
+        self.expire_after = config['RETENTION_DAYS'] * 86400
+        self._watermark = (None, 0.0)
+        if not self.timeseries:
+            return
+
+        # Inserting into a missing collection would create a regular one
+        try:
+            self.ensure_collection(app.db)
+            self.filtered_deletes = server_version(app.db) >= (7, 0)
+        except PyMongoError as e:
+            app.logger.warning(f"Could not create {self.collection_name}: {e}")
+
+    @property
+    def deletes_by_filter(self):
+        """Whether webhooks can be deleted by _id or received_at; before
+        MongoDB 7.0 a time-series collection only deletes by ``meta``"""
+        return not self.timeseries or self.filtered_deletes
+
+    @property
+    def timeseries(self):
+        return self.backend == TIMESERIES
+
+    @property
+    def reads_legacy(self):
+        """Whether webhook_data may still hold webhooks that are read"""
+        return not self.timeseries or self.dual_read
+
+    def ensure_collection(self, db):
+        """Create the time-series collection, or update its expiry"""
+        name = self.collection_name
+        info = next(db.list_collections(filter={'name': name}), None)
+        if info is None:
+            options = {'timeseries': {
+                'timeField': 'received_at',
+                'metaField': 'meta',
+                'granularity': self.granularity,
+            }}
+            if self.expire_after:
+                options['expireAfterSeconds'] = self.expire_after
+            try:
+                db.create_collection(name, **options)
+            except CollectionInvalid:
+                pass  # Created by another process in the meantime
+        elif info.get('type') != 'timeseries':
+            logger.warning("%s exists and is not a time-series collection", name)
+        elif info.get('options', {}).get('expireAfterSeconds') != (self.expire_after or None):
+            db.command('collMod', name, expireAfterSeconds=self.expire_after or 'off')
+
+    def collection(self, db):
+        """The collection new webhooks are written to"""
+        return db[self.collection_name]
+
+    def migrated_until(self, db):
+        """The last webhook_data _id copied to the time-series collection"""
+        value, read_at = self._watermark
+        now = time.monotonic()
+        if now - read_at > MIGRATION_STATE_TTL:
+            state = db.storage_migrations.find_one({'_id': MIGRATION_ID}, {'migrated_until': 1})
+            value = (state or {}).get('migrated_until')
+            self._watermark = (value, now)
+        return value
+
+    def _sources(self, db):
+        """(collection, is_timeseries, extra filter) for every collection read"""
+        if not self.timeseries:
+            return [(db[LEGACY_COLLECTION], False, None)]
+        sources = [(db[self.collection_name], True, None)]
+        if self.dual_read:
+            migrated_until = self.migrated_until(db)
+            pending = {'_id': {'$gt': migrated_until}} if migrated_until else None
+            sources.append((db[LEGACY_COLLECTION], False, pending))
+        return sources
+
+    @staticmethod
+    def _query(query, is_timeseries, extra=None):
+        if is_timeseries:
+            query = timeseries_query(query)
+        if extra:
+            query = {'$and': [query, extra]} if query else extra
+        return query
+
+    @staticmethod
+    def _projection(projection, is_timeseries):
+        if not projection or not is_timeseries:
+            return projection
+        return {_timeseries_key(key): value for key, value in projection.items()}
+
+    def find(self, db, query, projection=None, sort=None, skip=0, limit=0,
+             batch_size=0, allow_disk_use=False):
+        """Find webhooks, as ``collection.find(...).sort().skip().limit()``
+
+        Returns the cursor itself with the standard backend, otherwise an
+        iterator over documents in webhook_data's shape. When more than one
+        collection is read, ``sort`` must end with ``_id``.
+        """
+        def open_cursor(collection, is_timeseries, extra, cursor_limit):
+            cursor = collection.find(
+                self._query(query, is_timeseries, extra),
+                self._projection(projection, is_timeseries)
+            )
+            if sort:
+                cursor = cursor.sort([(_timeseries_key(f) if is_timeseries else f, d) for f, d in sort])
+            if batch_size:
+                cursor = cursor.batch_size(batch_size)
+            if allow_disk_use:
+                cursor = cursor.allow_disk_use(True)
+            if cursor_limit:
+                cursor = cursor.limit(cursor_limit)
+            return cursor
+
+        sources = self._sources(db)
+        if len(sources) == 1:
+            collection, is_timeseries, extra = sources[0]
+            cursor = open_cursor(collection, is_timeseries, extra, limit)
+            if skip:
+                cursor = cursor.skip(skip)
+            return map(from_timeseries, cursor) if is_timeseries else cursor
+
+        # Each collection can hold the whole page, the merge cuts it down;
+        # it compares the sort fields, so they have to be returned
+        if sort and projection and any(projection.values()):
+            projection = {**projection, **{field: 1 for field, _ in sort}}
+        cursors = []
+        for collection, is_timeseries, extra in sources:
+            cursor = open_cursor(collection, is_timeseries, extra, skip + limit if limit else 0)
+            cursors.append(map(from_timeseries, cursor) if is_timeseries else cursor)
+        docs = merge_sorted(cursors, sort) if sort else (doc for c in cursors for doc in c)
+        return itertools.islice(docs, skip, skip + limit if limit else None)
+
+    def find_one(self, db, query, projection=None):
+        for collection, is_timeseries, extra in self._sources(db):
+            doc = collection.find_one(
+                self._query(query, is_timeseries, extra),
+                self._projection(projection, is_timeseries)
+            )
+            if doc is not None:
+                return from_timeseries(doc) if is_timeseries else doc
+        return None
+
+    def count(self, db, query):
+        return sum(
+            collection.count_documents(self._query(query, is_timeseries, extra))
+            for collection, is_timeseries, extra in self._sources(db)
+        )
+
+    def aggregate(self, db, pipeline, **kwargs):
+        """Run a webhook_data pipeline
+
+        A leading ``$match`` is translated and kept first so it can use the
+        indexes; later stages see documents in webhook_data's shape.
+        """
+        sources = self._sources(db)
+        collection, is_timeseries, _ = sources[0]
+        if not is_timeseries:
+            return collection.aggregate(pipeline, **kwargs)
+
+        match = {}
+        if pipeline and '$match' in pipeline[0]:
+            match, pipeline = pipeline[0]['$match'], pipeline[1:]
+        stages = [{'$match': timeseries_query(match)}] if match else []
+        stages += _FLATTEN_META
+        for legacy, _, extra in sources[1:]:
+            stages.append({'$unionWith': {
+                'coll': legacy.name,
+                'pipeline': [{'$match': self._query(match, False, extra)}],
+            }})
+        return collection.aggregate(stages + pipeline, **kwargs)
+
+    def latest_lookup(self, db, limit, projection, as_field):
+        """``$lookup`` stage joining a path (by its _id) with its ``limit``
+        latest webhooks, for pipelines over paths"""
+        def latest(path_field, extra=None):
+            match = {'$expr': {'$eq': [f'${path_field}', '$$path_id']}}
+            return [
+                {'$match': {'$and': [match, extra]} if extra else match},
+                {'$sort': {'received_at': -1, '_id': -1}},
+                {'$limit': limit},
+            ]
+
+        sources = self._sources(db)
+        collection, is_timeseries, _ = sources[0]
+        if is_timeseries:
+            pipeline = latest('meta.path_id') + _FLATTEN_META
+            for legacy, _, extra in sources[1:]:
+                pipeline += [
+                    {'$unionWith': {'coll': legacy.name, 'pipeline': latest('path_id', extra)}},
+                    {'$sort': {'received_at': -1, '_id': -1}},
+                    {'$limit': limit},
+                ]
+        else:
+            pipeline = latest('path_id')
+        return {'$lookup': {
+            'from': collection.name,
+            'let': {'path_id': '$_id'},
+            'pipeline': pipeline + [{'$project': projection}],
+            'as': as_field,
+        }}
+
+    def insert_one(self, db, doc):
+        if self.timeseries:
+            self.collection(db).insert_one(to_timeseries(doc))
+        else:
+            db[LEGACY_COLLECTION].insert_one(doc)
+
+    def insert_many(self, db, docs, ordered=True):
+        if self.timeseries:
+            self.collection(db).insert_many([to_timeseries(doc) for doc in docs], ordered=ordered)
+        else:
+            db[LEGACY_COLLECTION].insert_many(docs, ordered=ordered)
+
+    def delete_many(self, db, query):
+        """Delete matching webhooks wherever they are stored
+
+        Time-series collections only accept filters on ``meta`` before
+        MongoDB 7.0.
+
+        Returns:
+            int: Number of documents deleted
+        """
+        deleted = 0
+        if self.timeseries:
+            deleted += self.collection(db).delete_many(timeseries_query(query)).deleted_count
+        if self.reads_legacy:
+            deleted += db[LEGACY_COLLECTION].delete_many(query).deleted_count
+        return deleted
+
+    def stats(self, db):
+        """Storage and index size of the collections holding webhooks"""
+        names = [self.collection_name]
+        if self.timeseries and self.dual_read:
+            names.append(LEGACY_COLLECTION)
+        stats = {}
+        for name in names:
+            try:
+                result = db.command({'collStats': name})
+            except OperationFailure:
+                continue  # Not created yet
+            stats[name] = {
+                'count': result.get('count'),
+                'size': result.get('size'),
+                'storage_size': result.get('storageSize'),
+                'index_size': result.get('totalIndexSize'),
+            }
+        return stats
+
+def migration_status(db):
+    """The stored migration progress, None before the first run"""
+    return db.storage_migrations.find_one({'_id': MIGRATION_ID})
+
+def migrate_to_timeseries(db, params, report):
+    """Job handler: copy webhook_data into the time-series collection
+
+    Documents are copied in _id order, ``batch_size`` at a time, and the
+    last copied _id is stored as the dual-read watermark after each batch.
+    A resumed run starts after the watermark and skips documents a
+    previous run copied without recording them, so it can run repeatedly,
+    e.g. once before and once after every process writes to the new
+    collection.
+
+    Returns:
+        dict: Number of documents copied by this run
+
+    Raises:
+        ValueError: If the time-series backend is not configured
+    """
+    if not webhook_storage.timeseries:
+        raise ValueError("WEBHOOK_STORAGE is not timeseries")
+    batch_size = params.get('batch_size', MIGRATION_BATCH_SIZE)
+    webhook_storage.ensure_collection(db)
+    target = webhook_storage.collection(db)
+
+    state = migration_status(db) or {}
+    migrated_until = state.get('migrated_until')
+    copied = 0
+    while True:
+        query = {'_id': {'$gt': migrated_until}} if migrated_until else {}
+        docs = list(db[LEGACY_COLLECTION].find(query).sort('_id', ASCENDING).limit(batch_size))
+        if not docs:
+            break
+
+        # The received_at bounds let the lookup skip unrelated buckets
+        received = [doc['received_at'] for doc in docs]
+        present = {doc['_id'] for doc in target.find({
+            '_id': {'$in': [doc['_id'] for doc in docs]},
+            'received_at': {'$gte': min(received), '$lte': max(received)},
+        }, {'_id': 1})}
+        new_docs = [to_timeseries(doc) for doc in docs if doc['_id'] not in present]
+        if new_docs:
+            target.insert_many(new_docs, ordered=False)
+        copied += len(new_docs)
+
+        migrated_until = docs[-1]['_id']
+        db.storage_migrations.update_one({'_id': MIGRATION_ID}, {
+            '$set': {
+                'migrated_until': migrated_until,
+                'updated_at': datetime.now(timezone.utc),
+            },
+            '$inc': {'copied': len(new_docs)},
+            '$unset': {'completed_at': ''},
+        }, upsert=True)
+        report({'copied': copied})
+
+    db.storage_migrations.update_one(
+        {'_id': MIGRATION_ID},
+        {'$set': {'completed_at': datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    return {'copied': copied}
+
+webhook_storage = WebhookStorage()
@@ -1,8 +1,10 @@
 from datetime import datetime, timezone
 import pyotp
 import secrets
+from bson import ObjectId
 from flask import current_app
 from app.utils.base62 import objectid_to_base62, base62_to_objectid, is_valid_base62
+from app.utils.auth import invalidate_principal
 
 def generate_secret_key():
     """Generate a random secret key for TOTP"""
@@ -19,8 +21,11 @@ def create_user(email):
     # Generate secret key for TOTP
     secret_key = generate_secret_key()
     
-    # Create user document
+    # Create user document, its base62_id is derived from the ObjectId
+    user_id = ObjectId()
     user = {
+        '_id': user_id,
+        'base62_id': objectid_to_base62(user_id),
         'email': email,
         'secret_key': secret_key,
         'created_at': datetime.now(timezone.utc),
@@ -28,23 +33,8 @@ def create_user(email):
     }
     
     # Insert into database
-    db.users.create_index('email', unique=True)
-    result = db.users.insert_one(user)
-    
-    # Add base62_id field based on the generated ObjectId
-    base62_id = objectid_to_base62(result.inserted_id)
-    
-    # Update the document with the base62_id
-    db.users.update_one(
-        {'_id': result.inserted_id},
-        {'$set': {'base62_id': base62_id}}
-    )
-    
-    # Add base62_id to the user dict for the response
-    user['base62_id'] = base62_id
-    user['_id'] = str(result.inserted_id)
-
-    db.users.create_index('base62_id', unique=True)
+    db.users.insert_one(user)
+    user['_id'] = str(user_id)
     
     return user, None
 
@@ -75,6 +65,9 @@ def verify_totp_codes(email, code1, code2):
         {'$set': {'last_login': datetime.now(timezone.utc)}}
     )
     
+    # Make sure cached sessions pick up the updated user
+    invalidate_principal(email)
+    
     return user, None
 
 def get_user_by_base62(base62_id):
@@ -0,0 +1,18 @@
+from flask import Blueprint, current_app
+from bson import ObjectId
+from app.utils.response import api_response
+from app.utils.auth import require_auth
+from app.models.job import get_job
+
+job_bp = Blueprint('job', __name__)
+
+@job_bp.route('/<job_id>', methods=['GET'])
+@require_auth
+def get_job_status(current_user, job_id):
+    """Get the status and progress of one of the user's background jobs"""
+    job, error = get_job(current_app.db, job_id, ObjectId(current_user['_id']))
+    
+    if error:
+        return api_response(False, None, error), 404
+    
+    return api_response(True, job)
@@ -0,0 +1,20 @@
+import hmac
+from flask import Blueprint, Response, request, current_app
+from app.utils.response import api_response
+from app.utils.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    """Expose this process's metrics in the Prometheus text format"""
+    if not current_app.config['METRICS_ENABLED']:
+        return api_response(False, None, "Metrics are disabled"), 404
+
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        provided = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(provided.encode(), token.encode()):
+            return api_response(False, None, "Invalid metrics token"), 401
+
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -1,23 +1,123 @@
-from flask import Blueprint, request, current_app
+from flask import Blueprint, Response, request, current_app, stream_with_context
 from bson import ObjectId
 from app.utils.response import api_response
 from app.utils.auth import require_auth
 from app.models.path import (
     create_path,
     get_user_paths,
+    get_user_paths_summary,
     delete_path,
-    objectid_to_base62
+    update_path_settings,
+    LIST_PROJECTION,
+    WEBHOOK_FIELDS,
+    PATH_FIELDS,
+    DURABILITY_TIERS,
+    present_payload,
+    load_payload,
+    iter_full_payloads
 )
+from app.models.rollup import RESOLUTIONS, get_rollup_series
+from app.models.search import build_search_query
+from app.models.forward import get_deliveries
+from app.models.storage import webhook_storage
+from app.utils.pagination import keyset_query, keyset_page
+from app.utils.fields import parse_fields, build_projection
+from app.utils.export import iter_csv, iter_ndjson, gzip_stream, parse_datetime
+from app.utils.metrics import metrics
+from app.utils.http_pool import HostPolicy
 from datetime import datetime, timezone, timedelta
-from pymongo import DESCENDING
+from urllib.parse import urlsplit
 
 path_bp = Blueprint('path', __name__)
 
+# Chart ranges accepted as <number><unit>, e.g. 60m, 24h, 30d
+CHART_RANGE_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+CHART_MAX_POINTS = 1500
+
+def parse_chart_range(value):
+    """Parse a chart range such as '24h' into a timedelta, None if invalid"""
+    if not value or value[-1] not in CHART_RANGE_UNITS or not value[:-1].isdigit():
+        return None
+    amount = int(value[:-1])
+    if amount <= 0:
+        return None
+    return timedelta(**{CHART_RANGE_UNITS[value[-1]]: amount})
+
+def default_chart_resolution(span):
+    """Pick the coarsest resolution that still gives a useful chart"""
+    if span <= timedelta(hours=6):
+        return 'minute'
+    if span <= timedelta(days=7):
+        return 'hour'
+    return 'day'
+
+def parse_chart_args(args):
+    """Read and validate the range/resolution chart query parameters
+
+    Returns:
+        tuple: (span, resolution, error_message)
+    """
+    span = parse_chart_range(args.get('range', '1h'))
+    if span is None:
+        return None, None, "Invalid range"
+
+    resolution = args.get('resolution') or default_chart_resolution(span)
+    if resolution not in RESOLUTIONS:
+        return None, None, "Invalid resolution"
+
+    if span / RESOLUTIONS[resolution][0] > CHART_MAX_POINTS:
+        return None, None, "Too many points, use a coarser resolution"
+
+    return span, resolution, None
+
 @path_bp.route('/', methods=['GET'])
 @require_auth
 def list_paths(current_user):
-    """List all paths for the authenticated user"""
-    paths = get_user_paths(ObjectId(current_user['_id']))
+    """List all paths for the authenticated user
+
+    Query parameters:
+        fields: Comma-separated fields to return (default: all)
+    """
+    fields, error = parse_fields(request.args.get('fields'), PATH_FIELDS)
+    if error:
+        return api_response(False, None, error), 400
+
+    paths = get_user_paths(ObjectId(current_user['_id']), current_user['base62_id'], fields)
+    return api_response(True, paths)
+
+# Upper bound on the latest events returned per path by the summary
+SUMMARY_MAX_EVENTS = 20
+
+@path_bp.route('/summary', methods=['GET'])
+@require_auth
+def list_paths_summary(current_user):
+    """List all paths with counts, sparkline series and optionally the latest events
+
+    Query parameters:
+        range: Sparkline time span ending now (default 1h)
+        resolution: minute, hour or day (default depends on range)
+        events: Number of latest events to include per path (default 0)
+    """
+    span, resolution, error = parse_chart_args(request.args)
+    if error:
+        return api_response(False, None, error), 400
+
+    try:
+        events = min(max(int(request.args.get('events', 0)), 0), SUMMARY_MAX_EVENTS)
+    except ValueError:
+        return api_response(False, None, "Invalid events count"), 400
+
+    timer = metrics.stages('whtesting_read_stage_seconds', endpoint='summary')
+    end_date = datetime.now(timezone.utc)
+    paths = get_user_paths_summary(
+        ObjectId(current_user['_id']),
+        current_user['base62_id'],
+        resolution,
+        end_date - span,
+        end_date,
+        events
+    )
+    timer.mark('aggregate')
     return api_response(True, paths)
 
 @path_bp.route('/', methods=['POST'])
@@ -46,149 +146,468 @@ def add_path(current_user):
     
     return api_response(True, path_doc), 201
 
+def parse_retention(value):
+    """Validate a path's retention overrides
+
+    Returns:
+        tuple: (retention_dict or None to clear it, error_message)
+    """
+    if value is None:
+        return None, None
+    if not isinstance(value, dict):
+        return None, "Retention must be an object"
+
+    retention = {}
+    for field in ('max_age_days', 'max_count'):
+        limit = value.get(field)
+        if limit is None:
+            continue
+        if isinstance(limit, bool) or not isinstance(limit, int) or limit <= 0:
+            return None, f"{field} must be a positive integer"
+        retention[field] = limit
+    return retention or None, None
+
+def parse_forward_targets(value, config):
+    """Validate a path's forwarding targets
+
+    Each target is ``{'url': ..., 'concurrency': ...}``; concurrency is the
+    number of requests the target's host gets at once (the highest of its
+    targets) and defaults to FORWARD_CONCURRENCY. The host must be allowed by FORWARD_ALLOWED_HOSTS;
+    the forwarder checks it again when it connects.
+
+    Returns:
+        tuple: (list of targets or None to clear them, error_message)
+    """
+    if value is None:
+        return None, None
+    if not isinstance(value, list):
+        return None, "forward_targets must be a list"
+    if len(value) > config['FORWARD_MAX_TARGETS']:
+        return None, f"At most {config['FORWARD_MAX_TARGETS']} forward targets are allowed"
+
+    policy = HostPolicy(config['FORWARD_ALLOWED_HOSTS'])
+    targets = []
+    for target in value:
+        if not isinstance(target, dict) or not isinstance(target.get('url'), str):
+            return None, "Each forward target needs a url"
+        try:
+            parts = urlsplit(target['url'])
+            parts.port
+        except ValueError:
+            return None, f"Invalid forward url: {target['url']}"
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            return None, f"Invalid forward url: {target['url']}"
+        error = policy.check(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        if error:
+            return None, error
+
+        concurrency = target.get('concurrency', config['FORWARD_CONCURRENCY'])
+        if (isinstance(concurrency, bool) or not isinstance(concurrency, int)
+                or not 1 <= concurrency <= config['FORWARD_MAX_CONCURRENCY']):
+            return None, f"concurrency must be between 1 and {config['FORWARD_MAX_CONCURRENCY']}"
+        targets.append({'url': target['url'], 'concurrency': concurrency})
+    return targets or None, None
+
+@path_bp.route('/<path_id>', methods=['PUT'])
+@require_auth
+def update_path(current_user, path_id):
+    """Update a path's description, retention overrides, forwarding targets
+    and durability tier"""
+    data = request.get_json(silent=True)
+    
+    if not isinstance(data, dict):
+        return api_response(False, None, "Invalid request body"), 400
+    
+    settings = {}
+    if 'description' in data:
+        settings['description'] = data['description']
+    if 'retention' in data:
+        retention, error = parse_retention(data['retention'])
+        if error:
+            return api_response(False, None, error), 400
+        if retention and not webhook_storage.deletes_by_filter:
+            return api_response(False, None, "Retention overrides need MongoDB 7.0 with time-series storage"), 400
+        settings['retention'] = retention
+    if 'forward_targets' in data:
+        targets, error = parse_forward_targets(data['forward_targets'], current_app.config)
+        if error:
+            return api_response(False, None, error), 400
+        settings['forward_targets'] = targets
+    if 'durability' in data:
+        if data['durability'] is not None and data['durability'] not in DURABILITY_TIERS:
+            return api_response(False, None, f"durability must be one of {', '.join(DURABILITY_TIERS)}"), 400
+        settings['durability'] = data['durability']
+    
+    path, error = update_path_settings(
+        ObjectId(current_user['_id']), current_user['base62_id'], path_id, settings
+    )
+    
+    if error:
+        return api_response(False, None, error), 404
+    
+    return api_response(True, path)
+
 @path_bp.route('/<path_id>', methods=['DELETE'])
 @require_auth
 def remove_path(current_user, path_id):
-    """Delete a path and its webhook data"""
-    success, error = delete_path(ObjectId(current_user['_id']), path_id)
+    """Delete a path, its webhook data is removed by a background job"""
+    job_id, error = delete_path(ObjectId(current_user['_id']), path_id)
     
-    if not success:
+    if error:
         return api_response(False, None, error), 404
     
-    return api_response(True, None)
+    return api_response(True, {'job_id': job_id}), 202
 
 @path_bp.route('/<path_id>/data/', methods=['GET'])
 @require_auth
 def get_path_data(current_user, path_id):
-    """Get webhook data for a specific path"""
+    """Get webhook data for a specific path, newest first
+
+    Query parameters:
+        limit: Page size (max 100)
+        cursor: Opaque next/prev token from a previous page (preferred)
+        skip: Offset, used only when no cursor is given
+        estimated: Use the stored webhook_count as total (default true)
+        fields: Comma-separated fields to return (default: all, with large
+            payloads as a preview); _id and received_at are always included
+    """
     try:
         path_obj_id = ObjectId(path_id)
     except:
         return api_response(False, None, "Invalid path ID"), 400
 
+    fields, error = parse_fields(request.args.get('fields'), WEBHOOK_FIELDS)
+    if error:
+        return api_response(False, None, error), 400
+    # The cursor tokens are built from _id and received_at
+    projection = LIST_PROJECTION if fields is None else build_projection(
+        fields, WEBHOOK_FIELDS, always=('_id', 'received_at')
+    )
+
+    timer = metrics.stages('whtesting_read_stage_seconds', endpoint='data')
+
     # Verify path belongs to user
     path = current_app.db.paths.find_one({
         '_id': path_obj_id,
-        'user_id': ObjectId(current_user['_id'])
-    })
+        'user_id': ObjectId(current_user['_id']),
+        'deleted_at': None
+    }, {'path': 1, 'webhook_count': 1})
+    timer.mark('path')
     
     if not path:
         return api_response(False, None, "Path not found or unauthorized"), 404
 
-    # Add base62_id to path data
-    path['base'] = objectid_to_base62(ObjectId(current_user['_id']))
-
     # Get query parameters
     limit = min(int(request.args.get('limit', 10)), 100)  # Max 100 records
     skip = int(request.args.get('skip', 0))
+    cursor_token = request.args.get('cursor')
+    estimated = request.args.get('estimated', 'true').lower() != 'false'
     
-    # Get data count
-    total_count = current_app.db.webhook_data.count_documents({
-        'path_id': path_obj_id
-    })
+    # The stored counter is kept up to date by ingest; an exact count has
+    # to scan the path's index entries
+    if estimated:
+        total_count = path.get('webhook_count', 0)
+    else:
+        total_count = webhook_storage.count(current_app.db, {
+            'path_id': path_obj_id
+        })
+        timer.mark('count')
 
-    # Get webhook data
-    data = list(current_app.db.webhook_data.find(
-        {'path_id': path_obj_id}
-    ).sort(
-        'received_at', DESCENDING
-    ).skip(skip).limit(limit))
+    # Get webhook data, by cursor when given, otherwise by offset
+    try:
+        query, sort, direction = keyset_query({'path_id': path_obj_id}, cursor_token)
+    except ValueError as e:
+        return api_response(False, None, str(e)), 400
+
+    cursor = webhook_storage.find(
+        current_app.db, query, projection, sort=sort,
+        skip=0 if cursor_token else skip, limit=limit + 1
+    )
+    data, next_cursor, prev_cursor = keyset_page(
+        cursor, limit, direction, bool(cursor_token)
+    )
+    timer.mark('query')
 
-    # Convert ObjectIds to strings for JSON serialization
+    # ObjectIds and dates are encoded by the app's JSON provider
     for item in data:
-        item['_id'] = str(item['_id'])
-        item['path_id'] = str(item['path_id'])
-        item['user_id'] = str(item['user_id'])
-        if isinstance(item['received_at'], datetime):
-            item['received_at'] = item['received_at'].isoformat()
+        present_payload(item)
 
     response_data = {
         'path': path['path'],
         'total_count': total_count,
+        'count_estimated': estimated,
         'limit': limit,
         'skip': skip,
+        'next': next_cursor,
+        'prev': prev_cursor,
         'data': data
     }
 
-    return api_response(True, response_data)
+    # Encoded here rather than by Flask so the stage covers the JSON encoding
+    response = current_app.json.response(api_response(True, response_data))
+    timer.mark('serialize')
+    return response
+
+@path_bp.route('/<path_id>/data/<webhook_id>/payload', methods=['GET'])
+@require_auth
+def get_webhook_payload(current_user, path_id, webhook_id):
+    """Get the full payload of a webhook listed with a payload_ref"""
+    try:
+        path_obj_id = ObjectId(path_id)
+        webhook_obj_id = ObjectId(webhook_id)
+    except:
+        return api_response(False, None, "Invalid ID"), 400
+
+    # Verify path belongs to user
+    path = current_app.db.paths.find_one({
+        '_id': path_obj_id,
+        'user_id': ObjectId(current_user['_id']),
+        'deleted_at': None
+    }, {'_id': 1})
+    
+    if not path:
+        return api_response(False, None, "Path not found or unauthorized"), 404
+
+    webhook = webhook_storage.find_one(current_app.db, {
+        '_id': webhook_obj_id,
+        'path_id': path_obj_id
+    })
+    if not webhook:
+        return api_response(False, None, "Webhook not found"), 404
+
+    try:
+        payload = load_payload(current_app.db, webhook)
+    except ValueError as e:
+        return api_response(False, None, str(e)), 404
+
+    return api_response(True, {
+        '_id': webhook_id,
+        'content_type': webhook.get('content_type'),
+        'payload': payload
+    })
+
+# Upper bound on the number of deliveries listed at once
+DELIVERIES_MAX_LIMIT = 200
+
+@path_bp.route('/<path_id>/deliveries', methods=['GET'])
+@require_auth
+def list_path_deliveries(current_user, path_id):
+    """Get the latest forwarding deliveries of a path's webhooks"""
+    try:
+        path_obj_id = ObjectId(path_id)
+        webhook_obj_id = ObjectId(request.args['webhook_id']) if 'webhook_id' in request.args else None
+    except:
+        return api_response(False, None, "Invalid ID"), 400
+
+    limit = min(max(request.args.get('limit', 50, type=int), 1), DELIVERIES_MAX_LIMIT)
+
+    # Verify path belongs to user
+    path = current_app.db.paths.find_one({
+        '_id': path_obj_id,
+        'user_id': ObjectId(current_user['_id']),
+        'deleted_at': None
+    }, {'_id': 1})
+    
+    if not path:
+        return api_response(False, None, "Path not found or unauthorized"), 404
+
+    return api_response(True, get_deliveries(current_app.db, path_obj_id, limit, webhook_obj_id))
+
+# Upper bound on the page size of searches
+SEARCH_MAX_LIMIT = 100
+
+@path_bp.route('/<path_id>/search', methods=['GET'])
+@require_auth
+def search_path_data(current_user, path_id):
+    """Search a path's webhooks, newest first
+
+    Query parameters:
+        from, to: ISO 8601 bounds on received_at
+        content_type: Content type prefix
+        ip: Client IP
+        q: Words in the raw body
+        payload.<key path>: Payload value, e.g. payload.order.id=42 (repeatable
+            with different keys, all must match)
+        limit: Page size (max 100)
+        cursor: Opaque next/prev token from a previous page
+        fields: Comma-separated fields to return, as for /data/
+    """
+    try:
+        path_obj_id = ObjectId(path_id)
+    except:
+        return api_response(False, None, "Invalid path ID"), 400
+
+    fields, error = parse_fields(request.args.get('fields'), WEBHOOK_FIELDS)
+    if error:
+        return api_response(False, None, error), 400
+    projection = LIST_PROJECTION if fields is None else build_projection(
+        fields, WEBHOOK_FIELDS, always=('_id', 'received_at')
+    )
+
+    args = request.args.to_dict()
+    try:
+        for bound in ('from', 'to'):
+            if args.get(bound):
+                args[bound] = parse_datetime(args[bound])
+    except ValueError:
+        return api_response(False, None, "Invalid date, use ISO 8601"), 400
+    try:
+        limit = min(int(args.get('limit', 10)), SEARCH_MAX_LIMIT)
+    except ValueError:
+        return api_response(False, None, "Invalid limit"), 400
+
+    search_query, error = build_search_query(path_obj_id, args, current_app.config)
+    if error:
+        return api_response(False, None, error), 400
+
+    timer = metrics.stages('whtesting_read_stage_seconds', endpoint='search')
+
+    # Verify path belongs to user
+    path = current_app.db.paths.find_one({
+        '_id': path_obj_id,
+        'user_id': ObjectId(current_user['_id']),
+        'deleted_at': None
+    }, {'_id': 1})
+    timer.mark('path')
+    
+    if not path:
+        return api_response(False, None, "Path not found or unauthorized"), 404
+
+    cursor_token = args.get('cursor')
+    try:
+        query, sort, direction = keyset_query(search_query, cursor_token)
+    except ValueError as e:
+        return api_response(False, None, str(e)), 400
+
+    # Text matches are sorted after the index lookup
+    cursor = webhook_storage.find(
+        current_app.db, query, projection, sort=sort, limit=limit + 1,
+        allow_disk_use='$text' in search_query
+    )
+    data, next_cursor, prev_cursor = keyset_page(
+        cursor, limit, direction, bool(cursor_token)
+    )
+    timer.mark('query')
+
+    for item in data:
+        present_payload(item)
+
+    return api_response(True, {
+        'limit': limit,
+        'next': next_cursor,
+        'prev': prev_cursor,
+        'data': data
+    })
+
+# Export formats: (row encoder, mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv', 'csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson'),
+}
+
+# Documents fetched per round trip while exporting
+EXPORT_BATCH_SIZE = 1000
+
+@path_bp.route('/<path_id>/export', methods=['GET'])
+@require_auth
+def export_path_data(current_user, path_id):
+    """Stream all webhook data of a path, newest first
+
+    Query parameters:
+        format: csv (default) or ndjson
+        gzip: Compress the response on the fly (default false)
+        from, to: ISO 8601 bounds on received_at
+    """
+    try:
+        path_obj_id = ObjectId(path_id)
+    except:
+        return api_response(False, None, "Invalid path ID"), 400
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return api_response(False, None, "Invalid format"), 400
+    encode_rows, mimetype, extension = EXPORT_FORMATS[export_format]
+
+    query = {'path_id': path_obj_id}
+    try:
+        received_at = {}
+        if request.args.get('from'):
+            received_at['$gte'] = parse_datetime(request.args['from'])
+        if request.args.get('to'):
+            received_at['$lte'] = parse_datetime(request.args['to'])
+    except ValueError:
+        return api_response(False, None, "Invalid date, use ISO 8601"), 400
+    if received_at:
+        query['received_at'] = received_at
+
+    # Verify path belongs to user
+    path = current_app.db.paths.find_one({
+        '_id': path_obj_id,
+        'user_id': ObjectId(current_user['_id']),
+        'deleted_at': None
+    }, {'path': 1})
+    
+    if not path:
+        return api_response(False, None, "Path not found or unauthorized"), 404
+
+    cursor = webhook_storage.find(
+        current_app.db, query, {'search_fields': 0, 'search_text': 0},
+        sort=[('received_at', -1), ('_id', -1)], batch_size=EXPORT_BATCH_SIZE
+    )
+
+    body = encode_rows(iter_full_payloads(current_app.db, cursor))
+    headers = {
+        'Content-Disposition': f'attachment; filename="webhook-data-{path_obj_id}.{extension}"',
+        'X-Accel-Buffering': 'no'  # Let nginx pass chunks through as they come
+    }
+    if request.args.get('gzip', 'false').lower() == 'true':
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
 
 @path_bp.route('/<path_id>/chart/', methods=['GET'])
 @require_auth
 def get_path_chart_data(current_user, path_id):
-    """Get webhook data for charts with 1-minute intervals for last 8 hours"""
+    """Get webhook counts for charts, read from pre-aggregated rollups
+
+    Query parameters:
+        range: Time span ending now, e.g. 60m, 24h, 30d (default 1h)
+        resolution: minute, hour or day (default depends on range)
+    """
     try:
         path_obj_id = ObjectId(path_id)
     except:
         return api_response(False, None, "Invalid path ID"), 400
 
+    span, resolution, error = parse_chart_args(request.args)
+    if error:
+        return api_response(False, None, error), 400
+
+    timer = metrics.stages('whtesting_read_stage_seconds', endpoint='chart')
+
     # Verify path belongs to user
     path = current_app.db.paths.find_one({
         '_id': path_obj_id,
-        'user_id': ObjectId(current_user['_id'])
-    })
+        'user_id': ObjectId(current_user['_id']),
+        'deleted_at': None
+    }, {'_id': 1})
+    timer.mark('path')
     
     if not path:
         return api_response(False, None, "Path not found or unauthorized"), 404
 
-    # Get data for last hour (60 minutes)
     end_date = datetime.now(timezone.utc)
-    start_date = end_date - timedelta(minutes=60)
-    
-    # Aggregate webhook counts by minute
-    pipeline = [
-        {
-            '$match': {
-                'path_id': path_obj_id,
-                'received_at': {
-                    '$gte': start_date,
-                    '$lte': end_date
-                }
-            }
-        },
-        {
-            '$group': {
-                '_id': {
-                    'year': {'$year': '$received_at'},
-                    'month': {'$month': '$received_at'},
-                    'day': {'$dayOfMonth': '$received_at'},
-                    'hour': {'$hour': '$received_at'},
-                    'minute': {'$minute': '$received_at'}
-                },
-                'count': {'$sum': 1}
-            }
-        },
-        {
-            '$sort': {'_id': 1}
-        }
-    ]
-    
-    results = list(current_app.db.webhook_data.aggregate(pipeline))
-    
-    # Fill in missing minutes with zero counts
-    timestamps = []
-    counts = []
-    current_time = start_date.replace(second=0, microsecond=0)
-    
-    while current_time <= end_date:
-        # Create a matching _id structure for comparison
-        current_id = {
-            'year': current_time.year,
-            'month': current_time.month,
-            'day': current_time.day,
-            'hour': current_time.hour,
-            'minute': current_time.minute
-        }
-        
-        # Find matching count or use 0
-        count = next((r['count'] for r in results if r['_id'] == current_id), 0)
-        
-        timestamps.append(current_time.timestamp() * 1000)  # Convert to milliseconds for JS
-        counts.append(count)
-        
-        # Increment by 1 minute
-        current_time += timedelta(minutes=1)
+    start_date = end_date - span
+
+    timestamps, series = get_rollup_series(
+        current_app.db, [path_obj_id], resolution, start_date, end_date
+    )[path_obj_id]
+    timer.mark('rollups')
 
     return api_response(True, {
         'timestamps': timestamps,
-        'counts': counts
-    }) 
\ No newline at end of file
+        'counts': series,
+        'resolution': resolution
+    })
@@ -1,13 +1,51 @@
-from flask import Blueprint, request, current_app
+import math
+from flask import Blueprint, request, g
 from bson import ObjectId
-from app.models.user import get_user_by_base62
-from app.models.path import record_webhook
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.models.route import route_table
+from app.models.path import store_webhook
 from app.utils.response import api_response
 from datetime import datetime, timezone
-from app.utils.websocket import socketio
+from app.utils.websocket import emit_webhook_update
+from app.models.forward import forwarder, forward_headers
+from app.utils.metrics import metrics
+from app.utils.ratelimit import ingest_limits
+from app.utils.base62 import normalize_base62_id
 
 webhook_bp = Blueprint('webhook', __name__)
 
+# Error messages of the admission control rejections
+REJECTION_ERRORS = {413: "Payload too large", 429: "Too many requests"}
+
+@webhook_bp.before_request
+def admit_webhook():
+    """Reject webhooks over the rate, concurrency or size limits before
+    any lookup or parsing, see app.utils.ratelimit"""
+    args = request.view_args or {}
+    base62_id = args.get('base62_id')
+    status, retry_after = ingest_limits.admit(
+        base62_id and normalize_base62_id(base62_id), args.get('user_path'),
+        request.content_length
+    )
+    if status is None:
+        g.ingest_admitted = True
+        return None
+
+    response = api_response(False, None, REJECTION_ERRORS[status])
+    headers = {'Retry-After': str(math.ceil(retry_after))} if retry_after else {}
+    return response, status, headers
+
+@webhook_bp.teardown_request
+def release_webhook(exc):
+    if g.pop('ingest_admitted', False):
+        ingest_limits.release()
+
+@webhook_bp.errorhandler(RequestEntityTooLarge)
+def body_too_large(e):
+    """A body without Content-Length went over INGEST_MAX_BODY_BYTES while read"""
+    ingest_limits.reject('body_size', 413)
+    return api_response(False, None, REJECTION_ERRORS[413]), 413
+
 def get_client_ip():
     """
     Get the original client IP address using various headers and fallbacks.
@@ -33,22 +71,18 @@ def get_client_ip():
 @webhook_bp.route('/<base62_id>/<path:user_path>', methods=['POST'])
 def handle_webhook(base62_id, user_path):
     """Handle webhook request for a specific path"""
-    # Validate and fetch user
-    user, error = get_user_by_base62(base62_id)
+    timer = metrics.stages('whtesting_webhook_stage_seconds')
+    
+    # Resolve the user and path (served from the route table when cached)
+    route, error = route_table.resolve(base62_id, user_path)
+    timer.mark('resolve')
     if error:
         return api_response(False, None, error), 404
     
-    # Find the path
-    path = current_app.db.paths.find_one({
-        'user_id': ObjectId(user['_id']),
-        'path': user_path
-    })
-    
-    if not path:
-        return api_response(False, None, "Path not found"), 404
-    
-    # Get request data
+    # Get request data; forwarding needs the raw body, so it is read (and
+    # cached for the parsers) first
     content_type = request.headers.get('Content-Type', '')
+    body = request.get_data(cache=True) if route['forward_targets'] else None
     
     if 'application/json' in content_type:
         payload = request.get_json(silent=True) or {}
@@ -59,46 +93,45 @@ def handle_webhook(base62_id, user_path):
 
     # Get the client's IP address
     client_ip = get_client_ip()
+    timer.mark('parse')
     
     # Prepare webhook update data
     update_data = {
-        'path_id': path['_id'],
-        'user_id': ObjectId(user['_id']),
+        'path_id': route['path_id'],
+        'user_id': route['user_id'],
         'received_at': datetime.now(timezone.utc),
         'content_type': content_type,
         'payload': payload,
         'ip_address': client_ip
     }
 
-    # Store the webhook data
-    current_app.db.webhook_data.insert_one({
-        '_id': ObjectId(), # Generate ID for the webhook
+    # Store the webhook data and update the path's counters
+    webhook_id = ObjectId() # Generate ID for the webhook
+    accepted, error = store_webhook({
+        '_id': webhook_id,
         **update_data
-    })
-    
-    # Update path's webhook count and last_used timestamp
-    current_app.db.paths.update_one(
-        {'_id': path['_id']},
-        {
-            '$inc': {'webhook_count': 1},
-            '$set': {'last_used': datetime.now(timezone.utc)}
-        }
-    )
+    }, body_size=request.content_length, durability=route['durability'])
+    timer.mark('store')
+
+    if not accepted:
+        return api_response(False, None, error), 503
 
-    # Log the emission attempt
-    current_app.logger.info(f"Emitting webhook_update to user {user['email']}")
-    current_app.logger.info(f"Event data: {update_data}")
+    # Hand the webhook to the forwarding workers, delivery happens later
+    if route['forward_targets']:
+        forwarder.submit(
+            update_data | {'_id': webhook_id},
+            route['forward_targets'],
+            body,
+            forward_headers(request.headers.items(), client_ip, webhook_id)
+        )
 
+    update_data['_id'] = str(webhook_id)
     update_data['path_id'] = str(update_data['path_id'])
     update_data['user_id'] = str(update_data['user_id'])
     update_data['received_at'] = update_data['received_at'].isoformat()
 
-    # Emit using socketio directly
-    socketio.emit(
-        'webhook_update',
-        update_data,
-        room=user['email'],
-        namespace='/'
-    )
+    # Queue the live update, it goes out with the user's next batch
+    emit_webhook_update(route['email'], update_data, request.content_length)
+    timer.mark('emit')
     
     return api_response(True, update_data) 
\ No newline at end of file
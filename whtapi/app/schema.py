@@ -0,0 +1,216 @@
+import logging
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Name of the received_at TTL index backing the retention pruner
+RETENTION_TTL_INDEX = 'received_at_ttl'
+
+# Indexes replaced by a declared one with a different key, dropped by
+# ensure_indexes when found
+RETIRED_INDEXES = {
+    # Superseded by the key with deleted_at, so a path can be created again
+    # while the deletion of its previous incarnation is pending
+    'paths': ['user_id_1_path_1'],
+}
+
+# Index options that must match for an existing index to count as declared
+_COMPARED_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression')
+
+def declared_indexes(config):
+    """Every index the app relies on, by collection
+
+    Returns:
+        dict: collection name -> list of IndexModel
+    """
+    indexes = {
+        'users': [
+            IndexModel('email', unique=True),
+            IndexModel('base62_id', unique=True),
+        ],
+        'paths': [
+            # Route resolution and, through its prefix, listing a user's paths;
+            # unique among live paths, deleted ones keep their deleted_at
+            IndexModel(
+                [('user_id', ASCENDING), ('path', ASCENDING), ('deleted_at', ASCENDING)],
+                unique=True
+            ),
+        ],
+        'webhook_data': [
+            # Paging, exports, retention and deletion of a path's webhooks
+            IndexModel([
+                ('path_id', ASCENDING),
+                ('received_at', DESCENDING),
+                ('_id', DESCENDING)
+            ]),
+            # Search by client IP and by payload value, see app.models.search
+            IndexModel([
+                ('path_id', ASCENDING),
+                ('ip_address', ASCENDING),
+                ('received_at', DESCENDING),
+                ('_id', DESCENDING)
+            ]),
+            IndexModel([
+                ('path_id', ASCENDING),
+                ('search_fields.k', ASCENDING),
+                ('search_fields.v', ASCENDING),
+                ('received_at', DESCENDING)
+            ]),
+            # Raw body search; no language so JSON tokens are kept as they are
+            IndexModel(
+                [('path_id', ASCENDING), ('search_text', TEXT)],
+                default_language='none'
+            ),
+            # Live updates missed while a client was disconnected, see
+            # app.utils.websocket.ReplayBuffer
+            IndexModel([('user_id', ASCENDING), ('_id', ASCENDING)]),
+        ],
+        'webhook_payloads': [
+            IndexModel('path_id'),
+        ],
+        'webhook_rollups': [
+            IndexModel(
+                [('path_id', ASCENDING), ('resolution', ASCENDING), ('bucket', ASCENDING)],
+                unique=True
+            ),
+            IndexModel('expire_at', expireAfterSeconds=0),
+        ],
+        'webhook_deliveries': [
+            IndexModel([('path_id', ASCENDING), ('created_at', DESCENDING)]),
+            IndexModel('webhook_id'),
+            # The delivery log is kept for a week
+            IndexModel('created_at', expireAfterSeconds=7 * 86400),
+        ],
+        'jobs': [
+            IndexModel([('status', ASCENDING), ('lease_until', ASCENDING), ('created_at', ASCENDING)]),
+            IndexModel([('user_id', ASCENDING), ('created_at', ASCENDING)]),
+            # Finished jobs are kept for a week for status queries
+            IndexModel('finished_at', expireAfterSeconds=7 * 86400),
+        ],
+    }
+
+    # Time-series backend, see app.models.storage; expiry is a collection
+    # option there rather than a TTL index. The search indexes are the same
+    # as webhook_data's, except for text search which it cannot have
+    if config['WEBHOOK_STORAGE'] == 'timeseries':
+        indexes[config['WEBHOOK_TIMESERIES_COLLECTION']] = [
+            IndexModel([('meta.path_id', ASCENDING), ('received_at', DESCENDING)]),
+            IndexModel([('meta.user_id', ASCENDING), ('received_at', DESCENDING)]),
+            IndexModel([
+                ('meta.path_id', ASCENDING),
+                ('ip_address', ASCENDING),
+                ('received_at', DESCENDING)
+            ]),
+            IndexModel([
+                ('meta.path_id', ASCENDING),
+                ('search_fields.k', ASCENDING),
+                ('search_fields.v', ASCENDING),
+                ('received_at', DESCENDING)
+            ]),
+        ]
+
+    # TTL backstop for the retention pruner, see app.models.retention
+    if config['RETENTION_DAYS'] > 0:
+        expire_after = (config['RETENTION_DAYS'] + config['RETENTION_GRACE_DAYS']) * 86400
+        for name in ('webhook_data', 'webhook_payloads'):
+            indexes[name].append(IndexModel(
+                'received_at',
+                name=RETENTION_TTL_INDEX,
+                expireAfterSeconds=expire_after
+            ))
+
+    return indexes
+
+def _key(spec):
+    key = spec['key'].items() if isinstance(spec['key'], dict) else spec['key']
+    normalized = []
+    for field, direction in key:
+        # The server lists the text fields of a text index as _fts/_ftsx,
+        # compare text indexes by their other fields only
+        if direction == TEXT or field == '_fts':
+            field, direction = '_fts', TEXT
+        elif field == '_ftsx':
+            continue
+        elif isinstance(direction, (int, float)):
+            direction = int(direction)
+        normalized.append((field, direction))
+    return normalized
+
+def _options(spec, ignore=()):
+    return {
+        option: spec[option] for option in _COMPARED_OPTIONS
+        if option in spec and option not in ignore
+    }
+
+def check_indexes(db, config):
+    """Compare the database's indexes with the declared ones
+
+    Returns:
+        dict: collection name -> {'missing', 'changed', 'extra'} lists of
+            index names, only for collections that differ
+    """
+    report = {}
+    for name, models in declared_indexes(config).items():
+        existing = db[name].index_information()
+        declared = {model.document['name']: model.document for model in models}
+
+        missing, changed = [], []
+        for index_name, spec in declared.items():
+            current = existing.get(index_name)
+            if current is None:
+                missing.append(index_name)
+            elif _key(current) != _key(spec) or _options(current) != _options(spec):
+                changed.append(index_name)
+        extra = [index_name for index_name in existing
+                 if index_name != '_id_' and index_name not in declared]
+
+        if missing or changed or extra:
+            report[name] = {'missing': missing, 'changed': changed, 'extra': extra}
+    return report
+
+def ensure_indexes(db, config, drop_extra=False):
+    """Create missing indexes and fix changed TTLs
+
+    Undeclared indexes are only reported, unless ``drop_extra`` is set,
+    they are RETIRED_INDEXES or they have the same key as a declared index
+    (which they would clash with). Other option changes cannot be made in place and are left for
+    an operator to resolve.
+
+    Returns:
+        dict: The check_indexes report from before the changes
+    """
+    report = check_indexes(db, config)
+    declared = declared_indexes(config)
+
+    for name, differences in report.items():
+        collection = db[name]
+        existing = collection.index_information()
+        models = {model.document['name']: model for model in declared[name]}
+        declared_keys = [_key(model.document) for model in models.values()]
+
+        for index_name in differences['extra']:
+            # The retention TTL index is ours even when retention is off
+            superseded = _key(existing[index_name]) in declared_keys
+            retired = index_name in RETIRED_INDEXES.get(name, ())
+            if drop_extra or superseded or retired or index_name == RETENTION_TTL_INDEX:
+                collection.drop_index(index_name)
+            else:
+                logger.warning("Undeclared index %s.%s", name, index_name)
+
+        for index_name in differences['changed']:
+            spec = models[index_name].document
+            current = existing[index_name]
+            ttl_only = _key(current) == _key(spec) and \
+                _options(current, ['expireAfterSeconds']) == _options(spec, ['expireAfterSeconds'])
+            if ttl_only and 'expireAfterSeconds' in spec:
+                db.command('collMod', name, index={
+                    'name': index_name,
+                    'expireAfterSeconds': spec['expireAfterSeconds']
+                })
+            else:
+                logger.warning("Index %s.%s differs from its declaration", name, index_name)
+
+        if differences['missing']:
+            collection.create_indexes([models[i] for i in differences['missing']])
+
+    return report
@@ -1,9 +1,70 @@
 from datetime import datetime, timedelta
+import hashlib
+import time
 import jwt
 from flask import current_app
 from functools import wraps
 from flask import request
 from app.utils.response import api_response
+from app.utils.cache import TTLCache
+
+# Verified principals keyed by token digest: (payload, slim user document)
+_principal_cache = TTLCache()
+
+# Only the user fields routes actually need; require_auth's current_user
+# has these and _id, routes needing more load the user themselves
+PRINCIPAL_PROJECTION = {'email': 1, 'base62_id': 1}
+
+def configure_auth_cache(app):
+    """Size the verified-principal cache from the app config"""
+    _principal_cache.maxsize = app.config['AUTH_CACHE_SIZE']
+    _principal_cache.ttl = app.config['AUTH_CACHE_TTL']
+    _principal_cache.clear()
+
+def invalidate_principal(email):
+    """Forget every cached token of a user so the next request re-verifies
+
+    Only this process's cache is cleared; other processes keep their entry
+    for up to AUTH_CACHE_TTL.
+    """
+    _principal_cache.pop_where(lambda digest, entry: entry[1]['email'] == email)
+
+def _verify_token(token):
+    """Decode a token and load its user, going through the principal cache
+
+    Raises:
+        jwt.InvalidTokenError: If the token is invalid or expired
+        ValueError: If the user no longer exists
+    """
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    cached = _principal_cache.get(digest)
+    if cached is not None:
+        return cached
+
+    payload = jwt.decode(
+        token,
+        current_app.config['JWT_SECRET_KEY'],
+        algorithms=['HS256']
+    )
+
+    user = current_app.db.users.find_one(
+        {'email': payload['email']},
+        PRINCIPAL_PROJECTION
+    )
+    if not user:
+        raise ValueError("User not found")
+
+    # Convert ObjectId to string
+    user['_id'] = str(user['_id'])
+
+    # Never keep a principal past its token's expiry
+    ttl = _principal_cache.ttl
+    if 'exp' in payload:
+        ttl = min(ttl, payload['exp'] - time.time())
+    if _principal_cache.maxsize > 0 and ttl > 0:
+        _principal_cache.set(digest, (payload, user), ttl=ttl)
+
+    return payload, user
 
 def generate_token(email):
     """Generate a JWT token for the user"""
@@ -34,27 +95,13 @@ def require_auth(f):
         token = auth_header.split(' ')[1]
         
         try:
-            # Decode token
-            payload = jwt.decode(
-                token,
-                current_app.config['JWT_SECRET_KEY'],
-                algorithms=['HS256']
-            )
-            
-            # Get user
-            user = current_app.db.users.find_one({'email': payload['email']})
-            if not user:
-                raise ValueError("User not found")
-            
-            # Convert ObjectId to string
-            user['_id'] = str(user['_id'])
-            
-            # Pass user to route
-            return f(current_user=user, *args, **kwargs)
-            
+            payload, user = _verify_token(token)
         except jwt.ExpiredSignatureError:
             return api_response(False, None, "Token has expired"), 401
         except (jwt.InvalidTokenError, ValueError) as e:
             return api_response(False, None, str(e)), 401
+        
+        # Pass user to route
+        return f(current_user=dict(user), *args, **kwargs)
             
     return decorated 
\ No newline at end of file
@@ -1,13 +1,28 @@
+import re
 from bson import ObjectId
 
 ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
 ALPHABET_DICT = {char: index for index, char in enumerate(ALPHABET)}
 
+# Width of an encoded ObjectId: 62^17 is the smallest power above 2^96
+OBJECTID_WIDTH = 17
+
+# Two digits at a time: every pair of characters and its value
+_PAIR_BASE = len(ALPHABET) ** 2
+_PAIRS = [a + b for a in ALPHABET for b in ALPHABET]
+_PAIR_VALUES = {pair: value for value, pair in enumerate(_PAIRS)}
+
+# Ids are coded as 8 high and 9 low digits, so the digit arithmetic works
+# on small ints instead of the full 96-bit value
+_LOW_BASE = len(ALPHABET) ** 9
+
+_BASE62_RE = re.compile(r'[0-9A-Za-z]*')
+
 def encode_base62(num):
     """Encode a number in Base62"""
     if num == 0:
         return ALPHABET[0]
-    
+
     arr = []
     base = len(ALPHABET)
     while num:
@@ -25,40 +40,85 @@ def decode_base62(string):
     return num
 
 def objectid_to_base62(object_id):
-    """Convert MongoDB ObjectId to Base62 string"""
-    # Convert ObjectId to integer using its timestamp + machine + pid + counter
-    num = int(str(object_id), 16)
-    return encode_base62(num)
+    """Convert MongoDB ObjectId to its fixed-width (17 character) Base62 string
+
+    The value is read from the ObjectId's 12 bytes and encoded two digits at
+    a time; shorter values are padded with leading zeros, so encoded ids sort
+    like the ObjectIds.
+    """
+    pairs = _PAIRS
+    high, low = divmod(int.from_bytes(object_id.binary, 'big'), _LOW_BASE)
+    high, h4 = divmod(high, _PAIR_BASE)
+    high, h3 = divmod(high, _PAIR_BASE)
+    h1, h2 = divmod(high, _PAIR_BASE)
+    low, l4 = divmod(low, _PAIR_BASE)
+    low, l3 = divmod(low, _PAIR_BASE)
+    low, l2 = divmod(low, _PAIR_BASE)
+    digit, l1 = divmod(low, _PAIR_BASE)
+    return ''.join((
+        pairs[h1], pairs[h2], pairs[h3], pairs[h4],
+        ALPHABET[digit], pairs[l1], pairs[l2], pairs[l3], pairs[l4]
+    ))
 
 def base62_to_objectid(base62_str):
     """Convert Base62 string back to MongoDB ObjectId
-    
+
+    Ids issued before the encoding was fixed-width have no leading zeros;
+    they decode to the same ObjectId.
+
     Args:
         base62_str (str): The Base62 encoded string
-        
+
     Returns:
         ObjectId: MongoDB ObjectId
-        
+
     Raises:
         ValueError: If the input string is invalid Base62 or can't be converted to ObjectId
     """
+    if not base62_str or len(base62_str) > OBJECTID_WIDTH:
+        raise ValueError("Invalid Base62 string or cannot convert to ObjectId: bad length")
+
+    s = base62_str.rjust(OBJECTID_WIDTH, '0')
+    values = _PAIR_VALUES
+    base = _PAIR_BASE
     try:
-        # Decode base62 string to number
-        num = decode_base62(base62_str)
-        # Convert number to hexadecimal string
-        hex_str = hex(num)[2:].rjust(24, '0')
-        # Create ObjectId from hex string
-        return ObjectId(hex_str)
-    except (ValueError, KeyError) as e:
+        high = ((values[s[0:2]] * base + values[s[2:4]]) * base + values[s[4:6]]) * base + values[s[6:8]]
+        low = ALPHABET_DICT[s[8]]
+        for i in (9, 11, 13, 15):
+            low = low * base + values[s[i:i + 2]]
+        return ObjectId((high * _LOW_BASE + low).to_bytes(12, 'big'))
+    except (KeyError, OverflowError) as e:
         raise ValueError(f"Invalid Base62 string or cannot convert to ObjectId: {e}")
 
+def normalize_base62_id(base62_str):
+    """Fixed-width form of an encoded ObjectId
+
+    Legacy and padded spellings of an id give the same string, so it can key
+    caches; anything longer than an id is returned unchanged.
+    """
+    return base62_str.rjust(OBJECTID_WIDTH, '0')
+
+def objectids_to_base62(object_ids):
+    """Encode a list of ObjectIds, see objectid_to_base62"""
+    encode = objectid_to_base62
+    return [encode(object_id) for object_id in object_ids]
+
+def base62_to_objectids(base62_strs):
+    """Decode a list of Base62 strings, see base62_to_objectid
+
+    Raises:
+        ValueError: If any of the strings is invalid
+    """
+    decode = base62_to_objectid
+    return [decode(base62_str) for base62_str in base62_strs]
+
 def is_valid_base62(string):
     """Check if a string is valid Base62
-    
+
     Args:
         string (str): String to validate
-        
+
     Returns:
         bool: True if string is valid Base62, False otherwise
     """
-    return all(char in ALPHABET_DICT for char in string) 
\ No newline at end of file
+    return _BASE62_RE.fullmatch(string) is not None
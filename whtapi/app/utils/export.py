@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+
+# Same columns as the console's utils/export.js
+CSV_HEADERS = ['Received At (UTC)', 'Content Type', 'IP Address', 'Payload']
+
+# Rows are buffered into chunks of roughly this size before being yielded
+CHUNK_SIZE = 64 * 1024
+
+def _iso(dt):
+    """Format like JavaScript's Date.toISOString()"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.') + f'{dt.microsecond // 1000:03d}Z'
+
+def _json(value):
+    """Compact JSON like JavaScript's JSON.stringify()"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False, default=str)
+
+def _chunked(lines):
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def iter_csv(docs):
+    """Stream webhook documents as semicolon separated CSV"""
+    def lines():
+        out = io.StringIO()
+        writer = csv.writer(out, delimiter=';', lineterminator='\n')
+        writer.writerow(CSV_HEADERS)
+        for doc in docs:
+            writer.writerow([
+                _iso(doc['received_at']),
+                doc.get('content_type'),
+                doc.get('ip_address'),
+                _json(doc.get('payload'))
+            ])
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        yield out.getvalue()
+
+    return _chunked(lines())
+
+def iter_ndjson(docs):
+    """Stream webhook documents as newline delimited JSON"""
+    def lines():
+        for doc in docs:
+            yield _json({
+                '_id': str(doc['_id']),
+                'path_id': str(doc['path_id']),
+                'received_at': _iso(doc['received_at']),
+                'content_type': doc.get('content_type'),
+                'ip_address': doc.get('ip_address'),
+                'payload': doc.get('payload')
+            }) + '\n'
+
+    return _chunked(lines())
+
+def gzip_stream(chunks):
+    """Gzip a stream of text chunks on the fly"""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def parse_datetime(value):
+    """Parse an ISO 8601 query parameter into an aware UTC datetime
+
+    Raises:
+        ValueError: If the value is not a valid ISO 8601 datetime
+    """
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
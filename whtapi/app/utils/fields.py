@@ -0,0 +1,30 @@
+def parse_fields(value, field_map):
+    """Parse a comma-separated ``fields=`` query parameter
+
+    Args:
+        value (str): The parameter, None when it was not given
+        field_map (dict): Field names a response may ask for
+
+    Returns:
+        tuple: (set of field names or None for the endpoint's default, error_message)
+    """
+    if value is None:
+        return None, None
+
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = sorted(fields - field_map.keys())
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}"
+    return fields, None
+
+def build_projection(fields, field_map, always=('_id',)):
+    """Mongo inclusion projection of the stored fields behind ``fields``
+
+    Args:
+        field_map (dict): Response field name -> stored fields it is built from
+        always (tuple): Stored fields every response needs
+    """
+    projection = dict.fromkeys(always, 1)
+    for name in fields:
+        projection.update(dict.fromkeys(field_map[name], 1))
+    return projection
@@ -0,0 +1,244 @@
+import http.client
+import ipaddress
+import queue
+import socket
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+# Errors meaning a kept-alive connection was closed by the server in the
+# meantime; the request is retried once on a fresh connection
+_STALE_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+class TargetNotAllowed(OSError):
+    """The target resolves to an address the HostPolicy does not allow"""
+
+class HostPolicy:
+    """Which hosts outgoing requests may connect to
+
+    ``allowed`` is a comma-separated list of host names (``*.example.com``
+    matches subdomains) and networks in CIDR notation. A host is allowed
+    when its name is listed or every address it resolves to is in a listed
+    network. With an empty list only public addresses are allowed, so
+    loopback, private, link-local (cloud metadata) and other internal
+    addresses need to be listed explicitly.
+    """
+
+    def __init__(self, allowed=''):
+        self.names = []
+        self.networks = []
+        for entry in (part.strip().lower() for part in allowed.split(',')):
+            if not entry:
+                continue
+            try:
+                self.networks.append(ipaddress.ip_network(entry, strict=False))
+            except ValueError:
+                self.names.append(entry)
+
+    def allows_name(self, host):
+        host = host.lower().rstrip('.')
+        return any(
+            host == name or (name.startswith('*.') and host.endswith(name[1:]))
+            for name in self.names
+        )
+
+    def allows_address(self, address):
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        if self.names or self.networks:
+            return any(ip in network for network in self.networks)
+        return ip.is_global
+
+    def check(self, host, port):
+        """Resolve a host and check it
+
+        Returns:
+            str: Why the host is not allowed, None when it is
+        """
+        if self.allows_name(host):
+            return None
+        try:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except (OSError, UnicodeError):
+            return f"Cannot resolve {host}"
+        if not all(self.allows_address(info[4][0]) for info in infos):
+            return f"{host} is not an allowed forward target"
+        return None
+
+    def create_connection(self, address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT,
+                          source_address=None):
+        """socket.create_connection that only connects to allowed addresses
+
+        The name is resolved once and the checked address is the one
+        connected to, so a DNS answer changing in between doesn't matter.
+        """
+        host, port = address
+        if self.allows_name(host):
+            return socket.create_connection(address, timeout, source_address)
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        if not all(self.allows_address(info[4][0]) for info in infos):
+            raise TargetNotAllowed(f"{host} is not an allowed forward target")
+        error = None
+        for info in infos:
+            try:
+                return socket.create_connection(info[4][:2], timeout, source_address)
+            except OSError as e:
+                error = e
+        raise error
+
+class HTTPConnectionPool:
+    """Keep-alive HTTP(S) connections to one host
+
+    At most ``maxsize`` requests are in flight at a time; ``acquire`` takes a
+    slot without waiting so callers can put work for a busy target aside.
+    Idle connections are reused newest first.
+    """
+
+    def __init__(self, scheme, host, port, maxsize=2, timeout=10.0, policy=None):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.policy = policy
+        self.in_use = 0
+        self.closed = False
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        return (self.scheme, self.host, self.port)
+
+    def acquire(self):
+        """Take a request slot, False if all of them are in use"""
+        with self._lock:
+            if self.in_use >= self.maxsize:
+                return False
+            self.in_use += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def _new_connection(self):
+        if self.scheme == 'https':
+            connection = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        else:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        if self.policy is not None:
+            connection._create_connection = self.policy.create_connection
+        return connection
+
+    def request(self, method, url, body=None, headers=None):
+        """Send a request over a pooled connection, within an acquired slot
+
+        Returns:
+            tuple: (status, response body)
+
+        Raises:
+            OSError, http.client.HTTPException: If the request failed
+        """
+        try:
+            connection, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            connection, reused = self._new_connection(), False
+
+        try:
+            status, data, will_close = self._send(connection, method, url, body, headers)
+        except _STALE_ERRORS:
+            connection.close()
+            if not reused:
+                raise
+            connection = self._new_connection()
+            try:
+                status, data, will_close = self._send(connection, method, url, body, headers)
+            except Exception:
+                connection.close()
+                raise
+        except Exception:
+            connection.close()
+            raise
+
+        if will_close or self.closed:
+            connection.close()
+        else:
+            self._idle.put(connection)
+        return status, data
+
+    def _send(self, connection, method, url, body, headers):
+        connection.request(method, url, body=body, headers=headers or {})
+        response = connection.getresponse()
+        data = response.read()
+        return response.status, data, response.will_close
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+class PoolManager:
+    """One HTTPConnectionPool per target host, at most ``maxpools`` of them
+
+    Targets on the same scheme, host and port share a pool and its limit,
+    which is the highest concurrency any of them asked for. The least
+    recently used idle pool is closed when a new one would exceed
+    ``maxpools``. With a ``policy`` (HostPolicy), connections are only made
+    to the addresses it allows.
+    """
+
+    def __init__(self, timeout=10.0, policy=None, maxpools=256):
+        self.timeout = timeout
+        self.policy = policy
+        self.maxpools = maxpools
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pool_for(self, url, maxsize):
+        """Pool for a URL's host with at least ``maxsize`` slots
+
+        Returns:
+            tuple: (pool, request target, i.e. path and query)
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        evicted = []
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                evicted = self._evict(len(self._pools) + 1 - self.maxpools)
+                pool = self._pools[key] = HTTPConnectionPool(
+                    scheme, parts.hostname, port, maxsize, self.timeout, self.policy
+                )
+            else:
+                self._pools.move_to_end(key)
+                pool.maxsize = max(pool.maxsize, maxsize)
+        for old in evicted:
+            old.close()
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        return pool, target
+
+    def _evict(self, count):
+        """Take up to ``count`` idle pools out, least recently used first"""
+        evicted = []
+        for key, pool in list(self._pools.items()):
+            if len(evicted) >= count:
+                break
+            if pool.in_use == 0:
+                evicted.append(self._pools.pop(key))
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), OrderedDict()
+        for pool in pools:
+            pool.close()
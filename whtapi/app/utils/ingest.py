@@ -0,0 +1,171 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from pymongo.errors import PyMongoError
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Put on the queue by stop() so the flusher stops waiting for a full batch
+_WAKEUP = object()
+
+class IngestQueue:
+    """Write-behind buffer for incoming webhooks.
+
+    Accepted webhook documents are put on a bounded in-process queue and a
+    background flusher hands them to ``writer(db, docs)`` in batches, either
+    every ``flush_interval_ms`` or as soon as ``flush_max_docs`` are waiting.
+
+    The webhooks were already acknowledged, so a batch whose write fails
+    with a database error is retried ``flush_retries`` times with doubling
+    pauses before it is given up and counted in
+    ``whtesting_ingest_dropped_total``. While it is retried the queue fills
+    up and new webhooks are answered with a 503.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.db = None
+        self.writer = None
+        self.flush_interval = 0.05
+        self.flush_max_docs = 500
+        self.enqueue_timeout = 0.0
+        self.flush_retries = 3
+        self.retry_backoff = 0.2
+        self._queue = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def init_app(self, app, writer):
+        """Configure the queue from the app config and start the flusher"""
+        config = app.config
+        self.enabled = config['INGEST_MODE'] == 'batched'
+        if not self.enabled:
+            return
+
+        self.db = app.db
+        self.writer = writer
+        self.flush_interval = config['INGEST_FLUSH_INTERVAL_MS'] / 1000.0
+        self.flush_max_docs = config['INGEST_FLUSH_MAX_DOCS']
+        self.enqueue_timeout = config['INGEST_ENQUEUE_TIMEOUT_MS'] / 1000.0
+        self.flush_retries = config['INGEST_FLUSH_RETRIES']
+        self.retry_backoff = config['INGEST_FLUSH_RETRY_BACKOFF_MS'] / 1000.0
+        self._queue = queue.Queue(maxsize=config['INGEST_QUEUE_SIZE'])
+        self._stopping.clear()
+
+        self._thread = threading.Thread(
+            target=self._run,
+            name='webhook-ingest-flusher',
+            daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def submit(self, webhook_doc):
+        """Queue a webhook document for writing
+
+        Blocks for at most ``enqueue_timeout`` seconds when the queue is full.
+
+        Returns:
+            bool: True if the document was accepted, False if the queue is
+                full (the caller should answer with a 503)
+        """
+        try:
+            if self.enqueue_timeout > 0:
+                self._queue.put(webhook_doc, timeout=self.enqueue_timeout)
+            else:
+                self._queue.put_nowait(webhook_doc)
+            return True
+        except queue.Full:
+            logger.warning("Ingest queue full, rejecting webhook")
+            return False
+
+    def pending(self):
+        """Number of documents waiting to be flushed"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stop(self, timeout=10.0):
+        """Stop accepting work and drain everything still queued"""
+        if not self.enabled or self._thread is None:
+            return
+        self.enabled = False
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_WAKEUP)
+        except queue.Full:
+            pass  # The flusher is not waiting then
+        self._thread.join(timeout)
+        # Anything left over (e.g. the flusher died) is written synchronously
+        self._flush(self._take_all())
+        self._thread = None
+
+    def _take_all(self):
+        batch = []
+        while True:
+            try:
+                doc = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if doc is not _WAKEUP:
+                batch.append(doc)
+
+    def _collect(self):
+        """Wait for the first document, then gather until size or time limit"""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        if first is _WAKEUP:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_max_docs:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                doc = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if doc is _WAKEUP:
+                break
+            batch.append(doc)
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+        self._flush(self._take_all())
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        for attempt in range(self.flush_retries + 1):
+            try:
+                self.writer(self.db, batch)
+                return
+            except PyMongoError:
+                if attempt < self.flush_retries:
+                    delay = self.retry_backoff * 2 ** attempt
+                    logger.warning("Failed to flush %d queued webhooks, retrying in %.2fs",
+                                   len(batch), delay, exc_info=True)
+                    time.sleep(delay)
+                    continue
+                logger.exception("Dropped %d queued webhooks after %d attempts",
+                                 len(batch), attempt + 1)
+            except Exception:
+                logger.exception("Dropped %d queued webhooks", len(batch))
+            metrics.inc('whtesting_ingest_dropped_total', len(batch))
+            return
+
+ingest_queue = IngestQueue()
+
+metrics.gauge('whtesting_ingest_queue_pending', 'Webhooks waiting to be written in batched mode',
+              ingest_queue.pending)
+metrics.describe('whtesting_ingest_dropped_total', 'counter',
+                 'Accepted webhooks lost because their batch could not be written')
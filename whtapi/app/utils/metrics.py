@@ -0,0 +1,216 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow queries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+class Histogram:
+    """Cumulative-bucket histogram, rendered the Prometheus way"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class StageTimer:
+    """Records the time spent in consecutive stages of one request"""
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.last = time.perf_counter()
+
+    def mark(self, stage):
+        """Record the time since the previous mark as ``stage``"""
+        now = time.perf_counter()
+        self.registry.observe(self.name, now - self.last, stage=stage, **self.labels)
+        self.last = now
+
+class MetricsRegistry:
+    """In-process counters, histograms and gauges
+
+    Recording is a dict lookup and a few additions under a lock, cheap
+    enough to leave on. Each process keeps its own values; the text
+    rendered by ``render`` is the Prometheus exposition format.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name, help_text, read):
+        """Register a gauge whose value is read from ``read()`` at render time"""
+        self.describe(name, 'gauge', help_text)
+        self._gauges[name] = read
+
+    def stages(self, name, **labels):
+        """Start timing the stages of a request, see StageTimer"""
+        return StageTimer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """Render every metric in the Prometheus text format"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (h.buckets, list(h.counts), h.sum, h.count)
+                for key, h in self._histograms.items()
+            }
+
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            help_kind, help_text = self._help.get(name, (kind, name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {help_kind}')
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{_format_labels(labels, ("le", bound))} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, ("le", "+Inf"))} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        for name, read in sorted(self._gauges.items()):
+            try:
+                value = read()
+            except Exception:
+                logger.exception("Failed to read gauge %s", name)
+                continue
+            header(name, 'gauge')
+            lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo listener recording latency per command and collection"""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._collections = {}
+
+    def started(self, event):
+        # Only the started event carries the command document
+        if event.command_name == 'getMore':
+            collection = event.command.get('collection')
+        else:
+            collection = event.command.get(event.command_name)
+        if isinstance(collection, str):
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _collection(self, event):
+        return self._collections.pop((event.connection_id, event.request_id), '')
+
+    def succeeded(self, event):
+        self.registry.observe(
+            'whtesting_mongo_command_seconds',
+            event.duration_micros / 1e6,
+            command=event.command_name,
+            collection=self._collection(event)
+        )
+
+    def failed(self, event):
+        self.registry.inc(
+            'whtesting_mongo_command_failures_total',
+            command=event.command_name,
+            collection=self._collection(event)
+        )
+
+metrics.describe('whtesting_http_request_seconds', 'histogram', 'HTTP request latency by endpoint')
+metrics.describe('whtesting_webhook_stage_seconds', 'histogram', 'Time spent in each stage of webhook ingest')
+metrics.describe('whtesting_read_stage_seconds', 'histogram', 'Time spent in each stage of read endpoints')
+metrics.describe('whtesting_mongo_command_seconds', 'histogram', 'MongoDB command latency by command and collection')
+metrics.describe('whtesting_mongo_command_failures_total', 'counter', 'Failed MongoDB commands')
+
+def configure_metrics(app):
+    """Time every request by endpoint (no-op when METRICS_ENABLED is off)
+
+    Returns:
+        list: pymongo event listeners to pass to MongoClient
+    """
+    metrics.enabled = app.config['METRICS_ENABLED']
+    if not metrics.enabled:
+        return []
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            metrics.observe(
+                'whtesting_http_request_seconds',
+                time.perf_counter() - started,
+                endpoint=request.endpoint or 'unknown',
+                method=request.method,
+                status=response.status_code
+            )
+        return response
+
+    return [MongoCommandMetrics(metrics)]
@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+# Direction markers stored in cursor tokens
+NEXT = 'n'
+PREV = 'p'
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def encode_cursor(doc, direction=NEXT):
+    """Build an opaque cursor token pointing at a document's sort position"""
+    received_at = doc['received_at']
+    if received_at.tzinfo is None:
+        received_at = received_at.replace(tzinfo=timezone.utc)
+    raw = json.dumps({
+        't': (received_at - _EPOCH) // timedelta(milliseconds=1),
+        'i': str(doc['_id']),
+        'd': direction
+    }, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor token
+
+    Returns:
+        tuple: (received_at, object_id, direction)
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        received_at = _EPOCH + timedelta(milliseconds=int(data['t']))
+        direction = data['d']
+        if direction not in (NEXT, PREV):
+            raise ValueError(direction)
+        return received_at, ObjectId(data['i']), direction
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def keyset_query(base_query, token):
+    """Build the filter and sort for one page of a newest-first listing
+
+    Pages are ordered by ``(received_at, _id)`` descending. A ``next`` token
+    continues after the last document of a page, a ``prev`` token goes back
+    before the first one (that page is read ascending and must be reversed).
+
+    Returns:
+        tuple: (query, sort, direction)
+    """
+    if not token:
+        return base_query, [('received_at', DESCENDING), ('_id', DESCENDING)], NEXT
+
+    received_at, object_id, direction = decode_cursor(token)
+    op = '$lt' if direction == NEXT else '$gt'
+    query = {
+        **base_query,
+        '$or': [
+            {'received_at': {op: received_at}},
+            {'received_at': received_at, '_id': {op: object_id}}
+        ]
+    }
+    order = DESCENDING if direction == NEXT else ASCENDING
+    return query, [('received_at', order), ('_id', order)], direction
+
+def keyset_page(cursor, limit, direction, has_cursor):
+    """Read one page from a cursor built with ``keyset_query``
+
+    The cursor must be limited to ``limit + 1`` documents so we can tell
+    whether there is another page.
+
+    Returns:
+        tuple: (items, next_token, prev_token)
+    """
+    items = list(cursor)
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    if direction == PREV:
+        items.reverse()
+        next_token = encode_cursor(items[-1], NEXT) if items else None
+        prev_token = encode_cursor(items[0], PREV) if items and has_more else None
+    else:
+        next_token = encode_cursor(items[-1], NEXT) if items and has_more else None
+        prev_token = encode_cursor(items[0], PREV) if items and has_cursor else None
+
+    return items, next_token, prev_token
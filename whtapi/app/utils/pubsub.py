@@ -0,0 +1,203 @@
+import json
+import logging
+import pickle
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from bson import Binary, ObjectId
+from pymongo import CursorType, MongoClient
+from pymongo.errors import CollectionInvalid, PyMongoError
+from socketio import KafkaManager, KombuManager, Manager, PubSubManager, RedisManager, ZmqManager
+
+logger = logging.getLogger(__name__)
+
+class BoundedManager(Manager):
+    """Socket.IO client manager that bounds the live updates queued per connection
+
+    Engine.IO queues every packet of a connection until it is written, with
+    no limit, so one slow client would hold every batch sent to it. A
+    connection that still has more than ``max_backlog`` packets waiting is
+    skipped for the ``bounded_events``; the events it did not get are added
+    to the ``missed`` count of the next batch it is sent, so the console
+    knows to refetch. Only this process's own connections are checked, each
+    process delivers to its clients itself.
+    """
+    bounded_events = ('webhook_update_batch',)
+
+    def __init__(self):
+        super().__init__()
+        self.max_backlog = 20
+        self._missed = {}
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None, callback=None, **kwargs):
+        if event not in self.bounded_events or callback or self.max_backlog <= 0 \
+                or namespace not in self.rooms:
+            return super().emit(event, data, namespace, room=room, skip_sid=skip_sid,
+                                callback=callback, **kwargs)
+
+        skip = skip_sid if isinstance(skip_sid, list) else [skip_sid]
+        sockets = self.server.eio.sockets
+        behind, catching_up = [], []
+        for sid, eio_sid in list(self.get_participants(namespace, room)):
+            if sid in skip:
+                continue
+            socket = sockets.get(eio_sid)
+            if socket is not None and socket.queue.qsize() > self.max_backlog:
+                self._missed[sid] = self._missed.get(sid, 0) + data['missed'] + len(data['events'])
+                behind.append(sid)
+            elif sid in self._missed:
+                catching_up.append(sid)
+
+        for sid in catching_up:
+            super().emit(event, {**data, 'missed': data['missed'] + self._missed.pop(sid)},
+                         namespace, room=sid)
+        return super().emit(event, data, namespace, room=room,
+                            skip_sid=skip + behind + catching_up)
+
+    def disconnect(self, sid, namespace, **kwargs):
+        self._missed.pop(sid, None)
+        return super().disconnect(sid, namespace, **kwargs)
+
+class RelayMixin:
+    """Application messages between processes over a Socket.IO pub/sub manager
+
+    Processes exchange their own messages (e.g. cache invalidations) with
+    ``publish_message``/``subscribe`` on the channel Socket.IO already uses;
+    python-socketio ignores methods it does not know, and they are taken
+    out of the stream before it sees them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._handlers = {}
+
+    def subscribe(self, method, handler):
+        """Call ``handler(data)`` for ``method`` messages from other processes"""
+        self._handlers[method] = handler
+
+    def publish_message(self, method, data):
+        """Send an application message to every other process"""
+        self._publish({'method': method, 'data': data, 'host_id': self.host_id})
+
+    def _dispatch(self, message):
+        """Run application message handlers, True if the message was consumed"""
+        handler = self._handlers.get(message.get('method'))
+        if handler is None:
+            return False
+        if message.get('host_id') != self.host_id:
+            try:
+                handler(message.get('data'))
+            except Exception:
+                logger.exception("Relay handler for %s failed", message['method'])
+        return True
+
+    def _listen(self):
+        for message in super()._listen():
+            if self._dispatch(_decode(message)):
+                continue
+            yield message
+
+def _decode(message):
+    """A pub/sub message as the dict it was published as, decoded the way
+    python-socketio does; {} when it is not one"""
+    if isinstance(message, dict):
+        return message
+    for loads in (pickle.loads, json.loads):
+        try:
+            data = loads(message)
+        except Exception:
+            continue
+        if isinstance(data, dict):
+            return data
+    return {}
+
+def queue_manager(url, channel):
+    """Relaying BoundedManager for a message queue URL, with the backend
+    Flask-SocketIO would pick for it (redis://, kafka://, zmq, anything else
+    through kombu)"""
+    if url.startswith(('redis://', 'rediss://')):
+        backend = RedisManager
+    elif url.startswith('kafka://'):
+        backend = KafkaManager
+    elif url.startswith('zmq'):
+        backend = ZmqManager
+    else:
+        backend = KombuManager
+    manager_class = type(f'Relay{backend.__name__}', (RelayMixin, backend, BoundedManager), {})
+    return manager_class(url, channel=channel)
+
+class MongoManager(RelayMixin, PubSubManager, BoundedManager):
+    """Socket.IO client manager that relays messages through MongoDB
+
+    Every message is appended to a capped collection and each process tails
+    it with an awaitable tailable cursor, so an emit made in any worker
+    reaches the clients connected to every other worker. The emitting
+    worker delivers to its own clients directly and ignores its own
+    messages when they come back, so each client gets every event once.
+
+    Besides the Socket.IO methods, processes can exchange their own messages
+    with ``publish_message``/``subscribe`` (see RelayMixin); they are
+    dispatched while tailing.
+    """
+    name = 'mongodb'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None,
+                 capped_size=16 * 1024 * 1024, poll_interval=0.5):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.mongo = MongoClient(url)
+        db = self.mongo.get_default_database()
+        name = f'{channel}_messages'
+        try:
+            db.create_collection(name, capped=True, size=capped_size)
+        except CollectionInvalid:
+            pass  # Created by another process
+        self.collection = db[name]
+        self.poll_interval = poll_interval
+        self.dedupe_window = 10000
+
+    def _publish(self, data):
+        self.collection.insert_one({
+            'ts': datetime.now(timezone.utc),
+            'msg': Binary(pickle.dumps(data))
+        })
+
+    def _latest_id(self):
+        latest = self.collection.find_one({}, {'_id': 1}, sort=[('$natural', -1)])
+        return latest['_id'] if latest else None
+
+    def _listen(self):
+        # Only relay messages published after this process started
+        start_id = self._latest_id()
+        seen = deque(maxlen=self.dedupe_window)
+        seen_ids = set()
+        while True:
+            query = {'_id': {'$gt': start_id}} if start_id else {}
+            try:
+                cursor = self.collection.find(
+                    query,
+                    cursor_type=CursorType.TAILABLE_AWAIT
+                )
+                # Each getMore waits server-side for new messages
+                while cursor.alive:
+                    for doc in cursor:
+                        if doc['_id'] in seen_ids:
+                            continue
+                        if len(seen) == seen.maxlen:
+                            seen_ids.discard(seen[0])
+                        seen.append(doc['_id'])
+                        seen_ids.add(doc['_id'])
+
+                        message = pickle.loads(doc['msg'])
+                        if not self._dispatch(message):
+                            yield message
+            except PyMongoError:
+                logger.exception("Socket.IO relay cursor failed, retrying")
+
+            # Ids from different processes are only ordered to the second, so
+            # resume a little early and rely on the seen ids to skip repeats
+            if seen:
+                start_id = ObjectId.from_datetime(
+                    seen[-1].generation_time - timedelta(seconds=2)
+                )
+            # The cursor dies right away on an empty collection, don't spin
+            time.sleep(self.poll_interval)
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from flask.wrappers import Request
+from app.utils.metrics import metrics
+
+class TokenBucketLimiter:
+    """In-memory token buckets, one per key
+
+    A key can spend ``burst`` requests at once and gets ``rate`` back per
+    second. The ``maxsize`` most recently used keys are tracked; a key that
+    is evicted starts over with a full bucket, as an idle one would.
+    """
+
+    def __init__(self, rate, burst, maxsize=10000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def allow(self, key, now=None):
+        """Take a token for key
+
+        Returns:
+            float: 0 when allowed, otherwise seconds until a token is available
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, key):
+        """Give back a token ``allow`` took for a request rejected later on"""
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is not None:
+                tokens, updated_at = entry
+                self._buckets[key] = (min(self.burst, tokens + 1), updated_at)
+
+    def __len__(self):
+        return len(self._buckets)
+
+class IngestLimits:
+    """Admission control for the webhook endpoint
+
+    Checked before a webhook's route is resolved or its body read, so
+    rejections never reach MongoDB: a token bucket per base62 id and one
+    per path, a cap on requests in flight in this process, and a body size
+    limit. All limits are per process.
+    """
+
+    def __init__(self):
+        self.max_body_bytes = 0
+        self.max_inflight = 0
+        self.per_id = None
+        self.per_path = None
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.max_body_bytes = config['INGEST_MAX_BODY_BYTES']
+        self.max_inflight = config['INGEST_MAX_INFLIGHT']
+        self.per_id = self.per_path = None
+        if config['INGEST_RATE_PER_ID'] > 0:
+            self.per_id = TokenBucketLimiter(
+                config['INGEST_RATE_PER_ID'], config['INGEST_BURST_PER_ID'],
+                config['INGEST_RATE_MAX_KEYS']
+            )
+        if config['INGEST_RATE_PER_PATH'] > 0:
+            self.per_path = TokenBucketLimiter(
+                config['INGEST_RATE_PER_PATH'], config['INGEST_BURST_PER_PATH'],
+                config['INGEST_RATE_MAX_KEYS']
+            )
+        # Bodies sent without a Content-Length are cut off as they are read
+        app.request_class = IngestRequest
+
+    def admit(self, base62_id, user_path, content_length):
+        """Decide whether a webhook request may go on
+
+        Takes an in-flight slot when it does; release it with ``release``.
+        A request rejected by a later check gets its earlier tokens back, so
+        it only counts against the limit that turned it away.
+
+        Returns:
+            tuple: (None, None) when admitted, otherwise (status, retry_after)
+        """
+        if self.max_body_bytes and content_length and content_length > self.max_body_bytes:
+            return self.reject('body_size', 413)
+
+        path_key = (base62_id, user_path)
+        if self.per_id is not None:
+            wait = self.per_id.allow(base62_id)
+            if wait:
+                return self.reject('rate_id', 429, wait)
+        if self.per_path is not None:
+            wait = self.per_path.allow(path_key)
+            if wait:
+                self._refund(base62_id)
+                return self.reject('rate_path', 429, wait)
+
+        with self._lock:
+            admitted = not self.max_inflight or self.inflight < self.max_inflight
+            if admitted:
+                self.inflight += 1
+        if not admitted:
+            self._refund(base62_id, path_key)
+            return self.reject('concurrency', 429, 1)
+        return None, None
+
+    def _refund(self, base62_id, path_key=None):
+        if self.per_id is not None:
+            self.per_id.refund(base62_id)
+        if self.per_path is not None and path_key is not None:
+            self.per_path.refund(path_key)
+
+    def release(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def reject(self, reason, status, retry_after=None):
+        metrics.inc('whtesting_ingest_rejected_total', reason=reason)
+        return status, retry_after
+
+class IngestRequest(Request):
+    """Request whose body is capped at INGEST_MAX_BODY_BYTES on the webhook
+    endpoint, also when it is streamed without a Content-Length"""
+
+    @property
+    def max_content_length(self):
+        if self.blueprint == 'webhook' and current_app.config['INGEST_MAX_BODY_BYTES']:
+            return current_app.config['INGEST_MAX_BODY_BYTES']
+        return super().max_content_length
+
+ingest_limits = IngestLimits()
+
+metrics.describe('whtesting_ingest_rejected_total', 'counter',
+                 'Webhook requests rejected before processing, by reason')
+metrics.gauge('whtesting_ingest_inflight', 'Webhook requests being processed',
+              lambda: ingest_limits.inflight)
@@ -0,0 +1,54 @@
+import json
+from datetime import date
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the json module is the fallback
+    orjson = None
+
+def bson_default(obj):
+    """Encode the BSON types found in documents read from MongoDB
+
+    ObjectIds become their hex string and datetimes their ISO 8601 form, the
+    same values the routes used to convert by hand. RawBSONDocuments are
+    decoded field by field as they are encoded.
+    """
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, RawBSONDocument):
+        return dict(obj.items())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj):
+    """Serialize to compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=bson_default)
+    return json.dumps(
+        obj, default=bson_default, separators=(',', ':'), ensure_ascii=False
+    ).encode('utf-8')
+
+class BSONJSONProvider(JSONProvider):
+    """Flask JSON provider that encodes MongoDB documents in a single pass
+
+    Route handlers can return documents as read, with ObjectId and datetime
+    values, instead of converting every item before the response is built.
+    Keys keep their insertion order. Request bodies are still parsed with
+    the json module, which accepts the same inputs as before.
+    """
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
@@ -2,7 +2,17 @@ from flask_socketio import SocketIO, emit, join_room, leave_room
 import jwt
 from functools import wraps
 from flask import current_app
+import json
 import logging
+import threading
+import time
+from collections import deque
+from datetime import timezone
+from bson import ObjectId
+from app.models.path import get_webhooks_since
+from app.utils.cache import TTLCache
+from app.utils.pubsub import BoundedManager, MongoManager, queue_manager
+from app.utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -15,29 +25,106 @@ socketio = SocketIO(
 )
 
 def configure_socketio(app):
-    """Configure SocketIO with app's CORS settings"""
+    """Configure SocketIO with app's CORS settings and message queue
+
+    Returns:
+        RelayMixin: The message queue's client manager when
+            SOCKETIO_MESSAGE_QUEUE is set (so other per-process state can be
+            shared through it), None otherwise
+    """
     cors_origins = app.config['CORS_ORIGINS']
     
     # If CORS_ORIGINS is a string, convert it to list
     if isinstance(cors_origins, str):
         cors_origins = [origin.strip() for origin in cors_origins.split(',')]
     
+    options, relay = _message_queue_options(app)
+    
     # Update SocketIO CORS settings
     socketio.init_app(
         app,
         cors_allowed_origins=cors_origins,
         path='/ws/socket.io',
-        async_mode='gevent'
+        async_mode='gevent',
+        **options
     )
+    _start_relay(relay)
+    emit_scheduler.init_app(app)
+    replay_buffer.init_app(app)
+    return relay
+
+def configure_socketio_emitter(app):
+    """Configure SocketIO to only emit, for processes that serve no clients
+
+    Live updates are published to SOCKETIO_MESSAGE_QUEUE and delivered by
+    the processes the clients are connected to.
+
+    Returns:
+        RelayMixin: The message queue's client manager, as for
+            configure_socketio
+    """
+    options, relay = _message_queue_options(app)
+    if not app.config['SOCKETIO_MESSAGE_QUEUE']:
+        logger.warning("SOCKETIO_MESSAGE_QUEUE is not set, live updates from this process reach no client")
+    
+    # Without an app no server is attached; the manager still listens, for
+    # application messages such as route invalidations
+    socketio.init_app(None, async_mode='gevent', **options)
+    _start_relay(relay)
+    emit_scheduler.init_app(app)
+    replay_buffer.init_app(app)
+    return relay
+
+def _message_queue_options(app):
+    """SocketIO options for SOCKETIO_MESSAGE_QUEUE
+
+    Every client manager bounds the live updates queued per connection,
+    see BoundedManager.
+
+    Returns:
+        tuple: (options, relay)
+    """
+    # With more than one process, emits must go through a message queue to
+    # reach clients connected to the other processes
+    relay = None
+    message_queue = app.config['SOCKETIO_MESSAGE_QUEUE']
+    if message_queue == 'mongodb':
+        manager = relay = MongoManager(app.config['MONGO_URI'], channel=app.config['SOCKETIO_CHANNEL'])
+    elif message_queue:
+        # redis://, amqp://, kafka://, ... with the python-socketio backends
+        manager = relay = queue_manager(message_queue, app.config['SOCKETIO_CHANNEL'])
+    else:
+        manager = BoundedManager()
+    manager.max_backlog = app.config['EMIT_MAX_CLIENT_BACKLOG']
+    return {'client_manager': manager}, relay
+
+def _start_relay(relay):
+    # python-socketio only starts listening on the first client connection;
+    # start now so application messages (route invalidations) also reach
+    # processes without clients
+    if relay is not None and not socketio.server.manager_initialized:
+        socketio.server.manager_initialized = True
+        relay.initialize()
+
+# Socket.IO clients connected to this process
+connected_clients = 0
 
 @socketio.on('connect')
 def handle_connect():
+    global connected_clients
     logger.info("Client attempting to connect")
+    connected_clients += 1
     return True
 
 @socketio.on('authenticate')
-def handle_authenticate(token):  # Simplified authentication handler
+def handle_authenticate(data):  # Simplified authentication handler
+    """Join the user's room; ``data`` is the token, or a dict with the
+    token and the ``last_event_id`` a reconnecting client has seen"""
     logger.info("Authentication attempt received")
+    if isinstance(data, dict):
+        token, last_event_id = data.get('token'), data.get('last_event_id')
+    else:
+        token, last_event_id = data, None
     try:
         # Verify token
         payload = jwt.decode(
@@ -56,7 +143,6 @@ def handle_authenticate(token):  # Simplified authentication handler
             'status': 'success',
             'email': user_email
         })
-        return True
     except Exception as e:
         logger.error(f"Socket authentication failed: {str(e)}")
         emit('authenticated', {
@@ -65,12 +151,250 @@ def handle_authenticate(token):  # Simplified authentication handler
         })
         return False
 
+    # Send what the client missed while it was disconnected, or tell it to
+    # refetch when that is no longer available
+    if last_event_id:
+        events = replay_missed_events(user_email, last_event_id)
+        if events is None:
+            metrics.inc('whtesting_replay_total', source='resync')
+            emit('webhook_update_batch', {'events': [], 'missed': 0, 'resync': True})
+        elif events:
+            emit('webhook_update_batch', {'events': events, 'missed': 0, 'replayed': True})
+    return True
+
 @socketio.on('disconnect')
 def handle_disconnect():
+    global connected_clients
     logger.info("Client disconnected")
+    connected_clients -= 1
+
+class EmitScheduler:
+    """Coalesces live webhook updates into periodic per-room batches
+
+    Instead of one ``webhook_update`` per webhook, events queue up per room
+    and go out as a single ``webhook_update_batch`` every ``interval``
+    seconds. Each room keeps at most ``max_pending`` events; when a slow or
+    bursty room overflows, the oldest events are dropped and the next batch
+    reports how many were missed so the client can refetch. Large payloads
+    are left out of the event and can be fetched through the API.
+
+    This bounds what waits for a batch; once emitted, the client manager
+    bounds what is queued for each connection (see BoundedManager), so a
+    slow tab only misses events instead of filling the process's buffers.
+    """
+
+    def __init__(self):
+        self.interval = 0.05
+        self.max_pending = 200
+        self.max_payload_bytes = 16 * 1024
+        self._pending = {}
+        self._missed = {}
+        self._lock = threading.Lock()
+        self._task = None
+
+    def init_app(self, app):
+        config = app.config
+        self.interval = config['EMIT_INTERVAL_MS'] / 1000.0
+        self.max_pending = config['EMIT_MAX_PENDING']
+        self.max_payload_bytes = config['EMIT_MAX_PAYLOAD_BYTES']
+        if self.interval > 0 and self._task is None:
+            self._task = socketio.start_background_task(self._run)
+
+    def schedule(self, room, event, payload_size=None):
+        """Queue an event for the room's next batch
+
+        Args:
+            payload_size (int): Size of the payload as received, measured
+                from the payload when unknown
+
+        Returns:
+            dict: The event as it will be sent
+        """
+        event = self._trim_payload(event, payload_size)
+        if self.interval <= 0:
+            socketio.emit('webhook_update_batch', {'events': [event], 'missed': 0}, room=room)
+            return event
+
+        with self._lock:
+            pending = self._pending.get(room)
+            if pending is None:
+                pending = self._pending[room] = deque(maxlen=self.max_pending)
+            if len(pending) == pending.maxlen:
+                self._missed[room] = self._missed.get(room, 0) + 1
+            pending.append(event)
+        return event
+
+    def pending(self):
+        """Number of events waiting to be emitted across all rooms"""
+        with self._lock:
+            return sum(len(events) for events in self._pending.values())
+
+    def pending_ids(self, room):
+        """Ids of the events waiting for the room's next batch"""
+        with self._lock:
+            return {event['_id'] for event in self._pending.get(room, ())}
+
+    def _trim_payload(self, event, size=None):
+        if size is None:
+            payload = event.get('payload')
+            if isinstance(payload, str):
+                size = len(payload.encode('utf-8'))
+            else:
+                size = len(json.dumps(payload, default=str))
+        if size <= self.max_payload_bytes:
+            return event
+        return {**event, 'payload': None, 'payload_truncated': True, 'payload_size': size}
+
+    def flush(self):
+        """Emit one batch per room with pending events"""
+        with self._lock:
+            batches = [
+                (room, list(events), self._missed.pop(room, 0))
+                for room, events in self._pending.items()
+            ]
+            self._pending = {}
+
+        for room, events, missed in batches:
+            socketio.emit(
+                'webhook_update_batch',
+                {'events': events, 'missed': missed},
+                room=room,
+                namespace='/'
+            )
+
+    def _run(self):
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to emit webhook update batches")
+
+emit_scheduler = EmitScheduler()
+
+class ReplayBuffer:
+    """The last live updates of each user, for clients that reconnect
+
+    Keeps the newest ``size`` events per user for ``max_age`` seconds, in
+    the order they were emitted; users with no recent events are dropped.
+    The buffer only sees the events emitted by this process, so it is off
+    when a message queue is set (other processes emit too) and replays then
+    come from webhook_data.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.size = 500
+        self.max_age = 300.0
+        self.max_events = 1000
+        self._buffers = TTLCache(10000, self.max_age)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.size = config['REPLAY_BUFFER_SIZE']
+        self.max_age = config['REPLAY_MAX_AGE_S']
+        self.max_events = config['REPLAY_MAX_EVENTS']
+        self.enabled = self.size > 0 and not config['SOCKETIO_MESSAGE_QUEUE']
+        self._buffers = TTLCache(config['REPLAY_MAX_USERS'], self.max_age)
+
+    def record(self, room, event):
+        """Remember an event emitted to the room"""
+        if not self.enabled:
+            return
+        with self._lock:
+            events = self._buffers.get(room)
+            if events is None:
+                events = deque(maxlen=self.size)
+            events.append((time.monotonic(), event))
+            # Setting it again restarts the room's expiry
+            self._buffers.set(room, events)
+
+    def since(self, room, last_event_id):
+        """Events emitted to the room after ``last_event_id``
+
+        Returns:
+            list: The events, oldest first, or None when that event is no
+                longer (or was never) in the buffer
+        """
+        if not self.enabled:
+            return None
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            events = self._buffers.get(room)
+            if not events:
+                return None
+            while events and events[0][0] < cutoff:
+                events.popleft()
+            entries = [event for _, event in events]
+
+        # Clients are usually only a few events behind, look from the end
+        for i in range(len(entries) - 1, -1, -1):
+            if entries[i]['_id'] == last_event_id:
+                return entries[i + 1:]
+        return None
+
+replay_buffer = ReplayBuffer()
+
+metrics.gauge('whtesting_socketio_clients', 'Socket.IO clients connected to this process',
+              lambda: connected_clients)
+metrics.gauge('whtesting_pending_emits', 'Live updates waiting for the next batch',
+              emit_scheduler.pending)
+metrics.describe('whtesting_replay_total', 'counter', 'Reconnect replays by source (buffer, query) and resyncs')
+
+def emit_webhook_update(user_email, data, payload_size=None):
+    """Queue a webhook update for the user's next live update batch
+
+    Args:
+        payload_size (int): Size of the received body when known, so the
+            payload is not serialized again to measure it
+    """
+    logger.debug(f"Scheduling webhook update for user: {user_email}")
+    replay_buffer.record(user_email, emit_scheduler.schedule(user_email, data, payload_size))
+
+def _stored_events(user_email, last_event_id):
+    """Events after ``last_event_id`` read back from webhook_data, None
+    when the id is invalid or more than REPLAY_MAX_EVENTS follow it"""
+    try:
+        after_id = ObjectId(last_event_id)
+    except Exception:
+        return None
+
+    db = current_app.db
+    user = db.users.find_one({'email': user_email}, {'_id': 1})
+    if not user:
+        return None
+    docs = get_webhooks_since(db, user['_id'], after_id, replay_buffer.max_events)
+    if len(docs) > replay_buffer.max_events:
+        return None
+
+    events = []
+    for doc in docs:
+        doc['_id'] = str(doc['_id'])
+        doc['path_id'] = str(doc['path_id'])
+        doc['user_id'] = str(doc['user_id'])
+        doc['received_at'] = doc['received_at'].replace(tzinfo=timezone.utc).isoformat()
+        events.append(emit_scheduler._trim_payload(doc))
+    return events
+
+def replay_missed_events(user_email, last_event_id):
+    """Live updates a reconnecting client missed since ``last_event_id``
+
+    Served from the replay buffer, or with one indexed query when the gap
+    is not buffered. Events still waiting for the room's next batch are
+    left out, the client gets them with it.
+
+    Returns:
+        list: The events, oldest first, or None when the client must resync
+    """
+    events = replay_buffer.since(user_email, last_event_id)
+    source = 'buffer'
+    if events is None:
+        events = _stored_events(user_email, last_event_id)
+        source = 'query'
+    if events is None:
+        return None
 
-def emit_webhook_update(user_email, data):
-    """Emit webhook update to specific user"""
-    logger.info(f"Emitting webhook update to user: {user_email}")
-    logger.debug(f"Webhook data: {data}")
-    socketio.emit('webhook_update', data, room=user_email) 
\ No newline at end of file
+    metrics.inc('whtesting_replay_total', source=source)
+    pending = emit_scheduler.pending_ids(user_email)
+    return [event for event in events if event['_id'] not in pending]
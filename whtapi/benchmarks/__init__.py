@@ -0,0 +1,9 @@
+"""Load and latency benchmarks for the API
+
+Run from the whtapi directory::
+
+    python -m benchmarks run --mongomock --output results.json
+    python -m benchmarks compare baseline.json results.json
+
+See ``python -m benchmarks run --help`` for the scenario options.
+"""
@@ -0,0 +1,145 @@
+from gevent import monkey
+monkey.patch_all()
+
+import argparse
+import logging
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Run the benchmark scenarios')
+    run.add_argument('--mongomock', action='store_true',
+                     help='Use an in-memory mongomock database instead of MONGO_URI')
+    run.add_argument('--http', action='store_true',
+                     help='Go through a local HTTP server instead of the test client')
+    run.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                     help='Config override, e.g. INGEST_MODE=batched (repeatable)')
+    run.add_argument('--requests', type=int, default=2000, help='Webhooks sent by the ingest scenario')
+    run.add_argument('--concurrency', type=int, default=20)
+    run.add_argument('--payload-bytes', type=int, nargs='+', default=[256],
+                     help='Payload sizes, one ingest scenario per size')
+    run.add_argument('--reads', type=int, default=500, help='Requests of the data and chart scenarios')
+    run.add_argument('--exports', type=int, default=20, help='Full exports of the export scenario')
+    run.add_argument('--subscribers', type=int, default=5, help='Socket.IO clients of the emit scenario')
+    run.add_argument('--emits', type=int, default=200, help='Webhooks sent by the emit scenario')
+    run.add_argument('--output', default='benchmark-results.json')
+
+    compare = commands.add_parser('compare', help='Compare two result files')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    return parser.parse_args(argv)
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def start_mongomock():
+    import mongomock
+    import mongomock.collection
+
+    # mongomock raises when $max compares against a null last_used,
+    # MongoDB treats null as the lowest value
+    def max_updater(doc, field_name, value):
+        current = doc.get(field_name)
+        if current is None or (value is not None and value > current):
+            doc[field_name] = value
+    mongomock.collection._updaters['$max'] = max_updater
+
+    os.environ['MONGO_URI'] = 'mongodb://localhost:27017/whtesting_bench'
+    mongomock.patch(servers=(('localhost', 27017),)).start()
+
+def run(args):
+    overrides = dict(item.split('=', 1) for item in args.env)
+    # Keep background maintenance out of the measurements unless asked for
+    overrides.setdefault('RETENTION_INTERVAL_S', '0')
+    # The ingest scenarios send far more than a sender is allowed per path
+    overrides.setdefault('INGEST_RATE_PER_ID', '0')
+    overrides.setdefault('INGEST_RATE_PER_PATH', '0')
+    os.environ.update(overrides)
+    if args.mongomock:
+        start_mongomock()
+
+    # Config is read at import time, so import the app after the overrides
+    from app import create_app
+    from app.schema import check_indexes
+    from app.models.storage import webhook_storage
+    from benchmarks import runner
+    from benchmarks.report import write_results
+
+    app = create_app()
+    # Socket.IO logs every event at INFO, which would dominate the timings
+    for name in ('socketio.server', 'engineio.server'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    bench = runner.Bench(app, use_http=args.http)
+    scenarios = {}
+    try:
+        for size in args.payload_bytes:
+            name = f'ingest_{size}b'
+            print(f"Running {name}...", flush=True)
+            scenarios[name] = runner.run_ingest(bench, args.requests, args.concurrency, size)
+        runner.wait_for_ingest()
+
+        print("Running data...", flush=True)
+        scenarios['data'] = runner.run_data(bench, args.reads, args.concurrency)
+        print("Running chart...", flush=True)
+        scenarios['chart'] = runner.run_chart(bench, args.reads, args.concurrency)
+        print("Running export...", flush=True)
+        scenarios['export'] = runner.run_export(bench, args.exports, min(args.concurrency, args.exports))
+        print("Running emit...", flush=True)
+        scenarios['emit'] = runner.run_emit_latency(
+            bench, args.emits, args.subscribers, args.concurrency, args.payload_bytes[0]
+        )
+    finally:
+        bench.stop()
+
+    with app.app_context():
+        index_report = check_indexes(app.db, app.config)
+        # Compare runs with --env WEBHOOK_STORAGE=timeseries and without;
+        # mongomock has no storage sizes
+        storage = {} if args.mongomock else webhook_storage.stats(app.db)
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'backend': 'mongomock' if args.mongomock else 'mongodb',
+            'transport': 'http' if args.http else 'test_client',
+            'config': overrides,
+            'concurrency': args.concurrency,
+            'index_differences': index_report,
+        },
+        'storage': storage,
+        'scenarios': scenarios,
+    }
+    write_results(results, args.output)
+
+    for name, summary in scenarios.items():
+        print(f"{name:<14} {summary['throughput_rps']:>9} req/s  "
+              f"p50 {summary['p50_ms']} ms  p95 {summary['p95_ms']} ms  "
+              f"p99 {summary['p99_ms']} ms  errors {summary['errors']}")
+    for name, stats in storage.items():
+        print(f"{name:<14} {stats['count']} docs  {stats['storage_size']} bytes on disk  "
+              f"{stats['index_size']} bytes of indexes")
+    print(f"Results written to {args.output}")
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command == 'compare':
+        from benchmarks.report import compare
+        compare(args.old, args.new)
+    else:
+        run(args)
+
+if __name__ == '__main__':
+    main()
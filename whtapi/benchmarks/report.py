@@ -0,0 +1,66 @@
+import json
+import math
+
+# Latency percentiles reported for every scenario
+PERCENTILES = (50, 95, 99)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+def summarize(latencies, errors, duration):
+    """Throughput and latency percentiles (in ms) of one scenario"""
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(latencies) / duration, 1) if duration else None,
+    }
+    for pct in PERCENTILES:
+        value = percentile(latencies, pct)
+        summary[f'p{pct}_ms'] = round(value * 1000, 2) if value is not None else None
+    return summary
+
+def write_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+def _change(old, new):
+    if old is None or new is None:
+        return ''
+    if old == 0:
+        return ''
+    return f'{(new - old) / old * 100:+.1f}%'
+
+def compare(old_path, new_path):
+    """Print the metrics of two result files side by side"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    print(f"{'scenario':<12} {'metric':<16} {'old':>10} {'new':>10} {'change':>9}")
+    metrics = ['throughput_rps'] + [f'p{pct}_ms' for pct in PERCENTILES]
+    for name, new_summary in new['scenarios'].items():
+        old_summary = old['scenarios'].get(name)
+        if old_summary is None:
+            continue
+        for metric in metrics:
+            old_value = old_summary.get(metric)
+            new_value = new_summary.get(metric)
+            print(f"{name:<12} {metric:<16} {str(old_value):>10} {str(new_value):>10} "
+                  f"{_change(old_value, new_value):>9}")
+
+    # Storage of the webhook collections, by role so the two backends line up
+    old_storage = list(old.get('storage', {}).values())
+    new_storage = list(new.get('storage', {}).values())
+    for old_stats, new_stats in zip(old_storage, new_storage):
+        for metric in ('storage_size', 'index_size'):
+            old_value = old_stats.get(metric)
+            new_value = new_stats.get(metric)
+            print(f"{'storage':<12} {metric:<16} {str(old_value):>10} {str(new_value):>10} "
+                  f"{_change(old_value, new_value):>9}")
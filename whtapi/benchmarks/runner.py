@@ -0,0 +1,228 @@
+import http.client
+import itertools
+import json
+import time
+import gevent
+from gevent.pywsgi import WSGIServer
+from benchmarks.report import summarize
+
+class TestClientTransport:
+    """Requests go straight to the WSGI app through Flask's test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, url, body=None, headers=None):
+        response = self.client.open(url, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json()
+
+    def stream(self, method, url, headers=None):
+        """Read a streamed response to the end, returns its status"""
+        response = self.client.open(url, method=method, headers=headers)
+        response.get_data()
+        return response.status_code
+
+class HTTPTransport:
+    """Requests go over a keep-alive HTTP connection to a local server"""
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port)
+
+    def request(self, method, url, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        self.connection.request(method, url, body=data, headers=headers)
+        response = self.connection.getresponse()
+        raw = response.read()
+        try:
+            return response.status, json.loads(raw)
+        except ValueError:
+            return response.status, None
+
+    def stream(self, method, url, headers=None):
+        """Read a streamed response to the end, returns its status"""
+        self.connection.request(method, url, headers=headers or {})
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+class Bench:
+    """A benchmark user with one path, and the transports to drive it"""
+
+    def __init__(self, app, use_http=False):
+        from app.utils.auth import generate_token
+
+        self.app = app
+        self.server = None
+        if use_http:
+            self.server = WSGIServer(('127.0.0.1', 0), app, log=None)
+            self.server.start()
+
+        client = app.test_client()
+        email = f'bench-{time.time_ns()}@example.com'
+        user = client.post('/api/auth/signup', json={'email': email}).get_json()['data']
+        with app.app_context():
+            self.token = generate_token(email)
+        self.headers = {'Authorization': f'Bearer {self.token}'}
+        self.base62_id = user['base62_id']
+
+        path = client.post('/api/paths/', json={'path': 'bench'}, headers=self.headers)
+        self.path_id = path.get_json()['data']['_id']
+        self.webhook_url = f'/api/webhook/{self.base62_id}/bench'
+
+    def transport(self):
+        if self.server is not None:
+            return HTTPTransport(self.server.server_port)
+        return TestClientTransport(self.app)
+
+    def stop(self):
+        if self.server is not None:
+            self.server.stop()
+
+def drive(bench, requests, concurrency, make_request):
+    """Run ``requests`` calls of ``make_request(transport, i)`` on ``concurrency`` greenlets
+
+    ``make_request`` returns True on success.
+
+    Returns:
+        dict: Scenario summary
+    """
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+
+    def worker():
+        nonlocal errors
+        transport = bench.transport()
+        state = {}
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            start = time.perf_counter()
+            ok = make_request(transport, i, state)
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    gevent.joinall([gevent.spawn(worker) for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+def run_ingest(bench, requests, concurrency, payload_bytes):
+    """POST webhooks of roughly ``payload_bytes`` each"""
+    payload = {'data': 'x' * payload_bytes}
+
+    def make_request(transport, i, state):
+        status, _ = transport.request('POST', bench.webhook_url, payload)
+        return status == 200
+
+    return drive(bench, requests, concurrency, make_request)
+
+def run_data(bench, requests, concurrency, limit=50):
+    """Page through /data/ with cursors, starting over at the last page"""
+    url = f'/api/paths/{bench.path_id}/data/?limit={limit}'
+
+    def make_request(transport, i, state):
+        cursor = state.get('next')
+        status, body = transport.request(
+            'GET', url + (f'&cursor={cursor}' if cursor else ''), headers=bench.headers
+        )
+        if status != 200:
+            return False
+        state['next'] = body['data']['next']
+        return True
+
+    return drive(bench, requests, concurrency, make_request)
+
+def run_chart(bench, requests, concurrency, chart_range='24h'):
+    """Fetch a path's chart"""
+    url = f'/api/paths/{bench.path_id}/chart/?range={chart_range}'
+
+    def make_request(transport, i, state):
+        status, _ = transport.request('GET', url, headers=bench.headers)
+        return status == 200
+
+    return drive(bench, requests, concurrency, make_request)
+
+def run_export(bench, requests, concurrency):
+    """Stream a path's full export"""
+    url = f'/api/paths/{bench.path_id}/export?format=ndjson'
+
+    def make_request(transport, i, state):
+        status = transport.stream('GET', url, headers=bench.headers)
+        return status == 200
+
+    return drive(bench, requests, concurrency, make_request)
+
+def run_emit_latency(bench, requests, subscribers, concurrency, payload_bytes, timeout=10.0):
+    """Time from sending a webhook to each subscriber receiving its live update"""
+    from app.utils.websocket import socketio
+
+    clients = []
+    for _ in range(subscribers):
+        client = socketio.test_client(bench.app)
+        client.emit('authenticate', bench.token)
+        client.get_received()
+        clients.append(client)
+
+    # The update can arrive before the sender has read its response, so
+    # arrivals are matched with send times at the end
+    sent_at = {}
+    arrivals = []
+    expected = requests * subscribers
+    sending = True
+
+    def poll():
+        deadline = None
+        while len(arrivals) < expected:
+            if not sending:
+                deadline = deadline or time.perf_counter() + timeout
+                if time.perf_counter() > deadline:
+                    return
+            for client in clients:
+                for message in client.get_received():
+                    if message['name'] != 'webhook_update_batch':
+                        continue
+                    now = time.perf_counter()
+                    for event in message['args'][0]['events']:
+                        arrivals.append((event['_id'], now))
+            gevent.sleep(0.001)
+
+    poller = gevent.spawn(poll)
+    payload = {'data': 'x' * payload_bytes}
+
+    def make_request(transport, i, state):
+        start = time.perf_counter()
+        status, body = transport.request('POST', bench.webhook_url, payload)
+        if status != 200:
+            return False
+        sent_at[body['data']['_id']] = start
+        return True
+
+    start = time.perf_counter()
+    drive(bench, requests, concurrency, make_request)
+    sending = False
+    poller.join()
+    duration = time.perf_counter() - start
+
+    for client in clients:
+        client.disconnect()
+
+    latencies = [now - sent_at[event_id] for event_id, now in arrivals if event_id in sent_at]
+    summary = summarize(latencies, expected - len(latencies), duration)
+    summary['subscribers'] = subscribers
+    return summary
+
+def wait_for_ingest(timeout=30.0):
+    """Let the batched ingest queue drain before reading the data back"""
+    from app.utils.ingest import ingest_queue
+
+    deadline = time.monotonic() + timeout
+    while ingest_queue.pending() and time.monotonic() < deadline:
+        gevent.sleep(0.01)
+    # The flusher may still be writing its last batch
+    gevent.sleep(ingest_queue.flush_interval * 2)
@@ -7,12 +7,168 @@ class Config:
     # MongoDB settings
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/whtesting')
     
+    # MongoClient connection pool, timeouts (0 leaves pymongo's default) and
+    # wire compression, e.g. zstd,snappy,zlib (empty disables it)
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 0))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 0))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 0))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 0))
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', '')
+    
     # JWT settings
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-this')
     JWT_ACCESS_TOKEN_EXPIRES = 24 * 3600  # 24 hours in seconds
     
+    # Verified token cache used by require_auth, 0 disables it. A principal
+    # is only invalidated in the process that changed the user (e.g. after a
+    # login), so other processes may use it for up to AUTH_CACHE_TTL
+    AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', 4096))
+    AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', 60))
+    
     # OTP settings
     OTP_WINDOW_SIZE = 6  # Allow 3 minutes (6 * 30 seconds)
     
+    # Ingest settings
+    # 'sync' writes each webhook inline, 'batched' queues them for a
+    # background flusher (write-behind)
+    INGEST_MODE = os.getenv('INGEST_MODE', 'sync')
+    INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 10000))
+    INGEST_FLUSH_INTERVAL_MS = int(os.getenv('INGEST_FLUSH_INTERVAL_MS', 50))
+    INGEST_FLUSH_MAX_DOCS = int(os.getenv('INGEST_FLUSH_MAX_DOCS', 500))
+    INGEST_ENQUEUE_TIMEOUT_MS = int(os.getenv('INGEST_ENQUEUE_TIMEOUT_MS', 100))
+    # A batch that fails to write is retried with doubling pauses
+    INGEST_FLUSH_RETRIES = int(os.getenv('INGEST_FLUSH_RETRIES', 3))
+    INGEST_FLUSH_RETRY_BACKOFF_MS = int(os.getenv('INGEST_FLUSH_RETRY_BACKOFF_MS', 200))
+    # In sync mode chart rollups are written in the background every
+    # ROLLUP_FLUSH_INTERVAL_MS, 0 writes them with each webhook
+    ROLLUP_FLUSH_INTERVAL_MS = int(os.getenv('ROLLUP_FLUSH_INTERVAL_MS', 1000))
+    
+    # Durability tier of paths that don't pick one: fire_and_forget,
+    # acknowledged or majority; empty uses the client's write concern
+    INGEST_DURABILITY = os.getenv('INGEST_DURABILITY', '')
+    
+    # Webhook admission control, per process (0 disables each limit): token
+    # buckets of INGEST_RATE_* requests per second with bursts of
+    # INGEST_BURST_*, per base62 id and per path (for the
+    # INGEST_RATE_MAX_KEYS most recent ones), a cap on requests in flight,
+    # and the largest body accepted
+    INGEST_RATE_PER_ID = float(os.getenv('INGEST_RATE_PER_ID', 100))
+    INGEST_BURST_PER_ID = int(os.getenv('INGEST_BURST_PER_ID', 200))
+    INGEST_RATE_PER_PATH = float(os.getenv('INGEST_RATE_PER_PATH', 50))
+    INGEST_BURST_PER_PATH = int(os.getenv('INGEST_BURST_PER_PATH', 100))
+    INGEST_RATE_MAX_KEYS = int(os.getenv('INGEST_RATE_MAX_KEYS', 100000))
+    INGEST_MAX_INFLIGHT = int(os.getenv('INGEST_MAX_INFLIGHT', 256))
+    INGEST_MAX_BODY_BYTES = int(os.getenv('INGEST_MAX_BODY_BYTES', 10 * 1024 * 1024))
+    
+    # Webhook route cache (base62 id + path -> user/path ids), 0 disables it.
+    # Changes reach other processes through SOCKETIO_MESSAGE_QUEUE; without
+    # one they serve a cached route for up to ROUTE_CACHE_TTL
+    ROUTE_CACHE_SIZE = int(os.getenv('ROUTE_CACHE_SIZE', 10000))
+    ROUTE_CACHE_TTL = float(os.getenv('ROUTE_CACHE_TTL', 300))
+    ROUTE_CACHE_NEGATIVE_TTL = float(os.getenv('ROUTE_CACHE_NEGATIVE_TTL', 10))
+    
+    # Socket.IO fan-out across worker processes: empty for a single worker,
+    # 'mongodb' to relay through a capped collection, or a redis:// / amqp://
+    # URL handled by python-socketio's backends. Cache invalidations travel
+    # the same way
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'socketio')
+    
+    # Live update batching: events are sent per user every EMIT_INTERVAL_MS
+    # (0 sends each one right away), at most EMIT_MAX_PENDING are held per
+    # user, and payloads above EMIT_MAX_PAYLOAD_BYTES are left out. A
+    # connection with more than EMIT_MAX_CLIENT_BACKLOG packets still
+    # unsent misses batches until it catches up (0 disables the check)
+    EMIT_INTERVAL_MS = int(os.getenv('EMIT_INTERVAL_MS', 50))
+    EMIT_MAX_PENDING = int(os.getenv('EMIT_MAX_PENDING', 200))
+    EMIT_MAX_PAYLOAD_BYTES = int(os.getenv('EMIT_MAX_PAYLOAD_BYTES', 16 * 1024))
+    EMIT_MAX_CLIENT_BACKLOG = int(os.getenv('EMIT_MAX_CLIENT_BACKLOG', 20))
+    
+    # Replay on reconnect: the last REPLAY_BUFFER_SIZE live updates of each
+    # user (up to REPLAY_MAX_USERS users) are kept for REPLAY_MAX_AGE_S and
+    # replayed from memory; older gaps of up to REPLAY_MAX_EVENTS updates are
+    # read back from webhook_data, larger ones make the client resync
+    REPLAY_BUFFER_SIZE = int(os.getenv('REPLAY_BUFFER_SIZE', 500))
+    REPLAY_MAX_AGE_S = float(os.getenv('REPLAY_MAX_AGE_S', 300))
+    REPLAY_MAX_USERS = int(os.getenv('REPLAY_MAX_USERS', 10000))
+    REPLAY_MAX_EVENTS = int(os.getenv('REPLAY_MAX_EVENTS', 1000))
+    
+    # Payload storage tiers: payloads above PAYLOAD_COMPRESS_THRESHOLD bytes
+    # are compressed (zlib, or zstd when zstandard is installed) and listed
+    # by their first PAYLOAD_PREVIEW_BYTES; above PAYLOAD_EXTERNAL_THRESHOLD
+    # they are kept out of webhook_data in webhook_payloads
+    PAYLOAD_COMPRESS_THRESHOLD = int(os.getenv('PAYLOAD_COMPRESS_THRESHOLD', 4 * 1024))
+    PAYLOAD_EXTERNAL_THRESHOLD = int(os.getenv('PAYLOAD_EXTERNAL_THRESHOLD', 256 * 1024))
+    PAYLOAD_PREVIEW_BYTES = int(os.getenv('PAYLOAD_PREVIEW_BYTES', 1024))
+    PAYLOAD_COMPRESSION = os.getenv('PAYLOAD_COMPRESSION', 'zlib')
+    
+    # Retention: webhooks older than RETENTION_DAYS are pruned (0 keeps them
+    # forever), paths can set a shorter max age and a max count. The pruner
+    # runs every RETENTION_INTERVAL_S (0 disables it in this process) and
+    # deletes RETENTION_BATCH_SIZE webhooks at a time; a TTL index removes
+    # anything left RETENTION_GRACE_DAYS past the global retention
+    RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 0))
+    RETENTION_GRACE_DAYS = int(os.getenv('RETENTION_GRACE_DAYS', 1))
+    RETENTION_INTERVAL_S = float(os.getenv('RETENTION_INTERVAL_S', 60))
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 1000))
+    RETENTION_BATCH_PAUSE_MS = int(os.getenv('RETENTION_BATCH_PAUSE_MS', 10))
+    
+    # Webhook storage backend: 'standard' keeps webhooks in webhook_data,
+    # 'timeseries' in the WEBHOOK_TIMESERIES_COLLECTION time-series
+    # collection (MongoDB 5.0+). With WEBHOOK_DUAL_READ, reads also cover
+    # the webhook_data documents not yet copied by `flask storage migrate`
+    WEBHOOK_STORAGE = os.getenv('WEBHOOK_STORAGE', 'standard')
+    WEBHOOK_TIMESERIES_COLLECTION = os.getenv('WEBHOOK_TIMESERIES_COLLECTION', 'webhook_events')
+    WEBHOOK_TIMESERIES_GRANULARITY = os.getenv('WEBHOOK_TIMESERIES_GRANULARITY', 'seconds')
+    WEBHOOK_DUAL_READ = os.getenv('WEBHOOK_DUAL_READ', 'false').lower() == 'true'
+    
+    # Search: up to SEARCH_MAX_FIELDS flattened payload values (strings cut
+    # to SEARCH_MAX_VALUE_LENGTH) and the first SEARCH_TEXT_BYTES of the body
+    # are indexed at ingest; 0 disables payload or text search
+    SEARCH_MAX_FIELDS = int(os.getenv('SEARCH_MAX_FIELDS', 32))
+    SEARCH_MAX_VALUE_LENGTH = int(os.getenv('SEARCH_MAX_VALUE_LENGTH', 128))
+    SEARCH_TEXT_BYTES = int(os.getenv('SEARCH_TEXT_BYTES', 2048))
+    
+    # Forwarding to the targets set on a path: FORWARD_WORKERS threads per
+    # process (0 disables it), at most FORWARD_QUEUE_BYTES of bodies waiting,
+    # FORWARD_MAX_ATTEMPTS tries FORWARD_BACKOFF_S * 2^n apart (capped at
+    # FORWARD_BACKOFF_MAX_S), and FORWARD_CONCURRENCY requests in flight per
+    # target host unless its targets set their own (up to
+    # FORWARD_MAX_CONCURRENCY), over at most FORWARD_MAX_POOLS host pools.
+    # Targets must be in FORWARD_ALLOWED_HOSTS (host names, *.domain
+    # wildcards and CIDR networks); when empty, only public addresses
+    # are allowed
+    FORWARD_WORKERS = int(os.getenv('FORWARD_WORKERS', 4))
+    FORWARD_QUEUE_BYTES = int(os.getenv('FORWARD_QUEUE_BYTES', 64 * 1024 * 1024))
+    FORWARD_MAX_POOLS = int(os.getenv('FORWARD_MAX_POOLS', 256))
+    FORWARD_TIMEOUT_S = float(os.getenv('FORWARD_TIMEOUT_S', 10))
+    FORWARD_MAX_ATTEMPTS = int(os.getenv('FORWARD_MAX_ATTEMPTS', 5))
+    FORWARD_BACKOFF_S = float(os.getenv('FORWARD_BACKOFF_S', 1))
+    FORWARD_BACKOFF_MAX_S = float(os.getenv('FORWARD_BACKOFF_MAX_S', 300))
+    FORWARD_CONCURRENCY = int(os.getenv('FORWARD_CONCURRENCY', 2))
+    FORWARD_MAX_CONCURRENCY = int(os.getenv('FORWARD_MAX_CONCURRENCY', 16))
+    FORWARD_MAX_TARGETS = int(os.getenv('FORWARD_MAX_TARGETS', 5))
+    FORWARD_ALLOWED_HOSTS = os.getenv('FORWARD_ALLOWED_HOSTS', '')
+    
+    # Background jobs: worker threads per process (0 leaves the jobs to
+    # other processes), how often idle workers look for jobs, how long a
+    # claimed job is leased before another worker may resume it, and how
+    # many times a failing job is tried
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 1))
+    JOB_POLL_INTERVAL_S = float(os.getenv('JOB_POLL_INTERVAL_S', 2))
+    JOB_LEASE_S = int(os.getenv('JOB_LEASE_S', 60))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    
+    # Build missing indexes when a process starts instead of leaving it to
+    # `flask indexes ensure`; every process then runs it on boot
+    ENSURE_INDEXES_ON_STARTUP = os.getenv('ENSURE_INDEXES_ON_STARTUP', 'false').lower() == 'true'
+    
+    # Prometheus metrics at /api/metrics, optionally behind a bearer token
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    
     # CORS settings
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:9000').split(',') 
\ No newline at end of file
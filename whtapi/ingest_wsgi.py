@@ -0,0 +1,12 @@
+from gevent import monkey
+monkey.patch_all()
+
+import os
+from gevent.pywsgi import WSGIServer
+from app import create_ingest_app
+
+app = create_ingest_app()
+
+if __name__ == '__main__':
+    # Development server; in production gunicorn runs 'app:create_ingest_app()'
+    WSGIServer(('0.0.0.0', int(os.getenv('INGEST_PORT', 5001))), app).serve_forever()
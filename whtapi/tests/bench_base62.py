@@ -0,0 +1,62 @@
+"""Microbenchmark of the ObjectId <-> Base62 codec
+
+Compares the codec in app.utils.base62 with the previous implementation
+(hex string and digit-by-digit loops). Not collected by pytest; run from
+whtapi/ with:
+
+    python -m tests.bench_base62 [--number N]
+"""
+import argparse
+import timeit
+from bson import ObjectId
+from app.utils.base62 import (
+    encode_base62,
+    decode_base62,
+    objectid_to_base62,
+    base62_to_objectid,
+    objectids_to_base62,
+    base62_to_objectids,
+    is_valid_base62,
+    ALPHABET_DICT
+)
+
+BATCH_SIZE = 100
+
+def legacy_objectid_to_base62(object_id):
+    return encode_base62(int(str(object_id), 16))
+
+def legacy_base62_to_objectid(base62_str):
+    return ObjectId(hex(decode_base62(base62_str))[2:].rjust(24, '0'))
+
+def legacy_is_valid_base62(string):
+    return all(char in ALPHABET_DICT for char in string)
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{label:<28} {seconds / number * 1e9:>10.0f} ns/op")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=100000, help='Calls per timing')
+    args = parser.parse_args()
+    number = args.number
+
+    object_id = ObjectId()
+    encoded = objectid_to_base62(object_id)
+    legacy = legacy_objectid_to_base62(object_id)
+    ids = [ObjectId() for _ in range(BATCH_SIZE)]
+    strings = objectids_to_base62(ids)
+
+    bench('encode (legacy)', lambda: legacy_objectid_to_base62(object_id), number)
+    bench('encode', lambda: objectid_to_base62(object_id), number)
+    bench('decode (legacy)', lambda: legacy_base62_to_objectid(legacy), number)
+    bench('decode', lambda: base62_to_objectid(encoded), number)
+    bench('validate (legacy)', lambda: legacy_is_valid_base62(encoded), number)
+    bench('validate', lambda: is_valid_base62(encoded), number)
+    batches = max(number // BATCH_SIZE, 1)
+    bench(f'encode x{BATCH_SIZE} (legacy)', lambda: [legacy_objectid_to_base62(i) for i in ids], batches)
+    bench(f'encode x{BATCH_SIZE}', lambda: objectids_to_base62(ids), batches)
+    bench(f'decode x{BATCH_SIZE}', lambda: base62_to_objectids(strings), batches)
+
+if __name__ == '__main__':
+    main()
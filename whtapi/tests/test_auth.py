@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+import jwt
+import pytest
+from bson import ObjectId
+from flask import Flask
+from app.utils import auth, cache
+from app.utils.auth import configure_auth_cache, invalidate_principal
+
+SECRET = 'test-secret'
+
+class Users:
+    def __init__(self):
+        self.user = {'_id': ObjectId(), 'email': 'a@example.com', 'base62_id': 'abc'}
+        self.lookups = 0
+
+    def find_one(self, query, projection=None):
+        self.lookups += 1
+        if query['email'] != self.user['email']:
+            return None
+        return {field: self.user[field] for field in ('_id', *projection)}
+
+@pytest.fixture
+def users():
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY=SECRET, AUTH_CACHE_SIZE=16, AUTH_CACHE_TTL=60)
+    app.db = SimpleNamespace(users=Users())
+    configure_auth_cache(app)
+    with app.app_context():
+        yield app.db.users
+
+def make_token(email='a@example.com', expires_in=3600):
+    return jwt.encode({'email': email, 'exp': int(time.time()) + expires_in}, SECRET, algorithm='HS256')
+
+def advance(monkeypatch, seconds):
+    now = time.monotonic() + seconds
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now)
+
+def test_verified_tokens_are_cached(users):
+    token = make_token()
+    payload, user = auth._verify_token(token)
+    assert payload['email'] == 'a@example.com'
+    assert user == {'_id': str(users.user['_id']), 'email': 'a@example.com', 'base62_id': 'abc'}
+    assert auth._verify_token(token) == (payload, user)
+    assert users.lookups == 1
+
+def test_cache_expiry_is_capped_by_the_token(users, monkeypatch):
+    short, long = make_token(expires_in=5), make_token(expires_in=3600)
+    auth._verify_token(short)
+    auth._verify_token(long)
+    assert users.lookups == 2
+
+    # Past the short token's expiry but within AUTH_CACHE_TTL
+    advance(monkeypatch, 10)
+    auth._verify_token(long)
+    assert users.lookups == 2
+    # The short token is still valid by the wall clock, so it is verified again
+    auth._verify_token(short)
+    assert users.lookups == 3
+
+def test_invalidation_reloads_the_user(users):
+    token = make_token()
+    auth._verify_token(token)
+    users.user['base62_id'] = 'def'
+    assert auth._verify_token(token)[1]['base62_id'] == 'abc'
+
+    invalidate_principal('a@example.com')
+    assert auth._verify_token(token)[1]['base62_id'] == 'def'
+    assert users.lookups == 2
+
+def test_unknown_users_are_rejected(users):
+    with pytest.raises(ValueError):
+        auth._verify_token(make_token(email='b@example.com'))
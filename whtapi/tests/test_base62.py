@@ -1,3 +1,4 @@
+import random
 import pytest
 from bson import ObjectId
 from app.utils.base62 import (
@@ -5,9 +6,24 @@ from app.utils.base62 import (
     decode_base62, 
     objectid_to_base62, 
     base62_to_objectid,
-    is_valid_base62
+    objectids_to_base62,
+    base62_to_objectids,
+    is_valid_base62,
+    normalize_base62_id,
+    OBJECTID_WIDTH
 )
 
+def random_objectids(count, seed=62):
+    # Random ids plus the extremes of the 96-bit range
+    rng = random.Random(seed)
+    ids = [ObjectId(bytes(12)), ObjectId(b'\xff' * 12), ObjectId(b'\x00' * 11 + b'\x01')]
+    ids += [ObjectId(rng.getrandbits(96).to_bytes(12, 'big')) for _ in range(count)]
+    return ids
+
+def legacy_objectid_to_base62(object_id):
+    # How ids were issued before the encoding was fixed-width
+    return encode_base62(int(str(object_id), 16))
+
 def test_base62_encoding_decoding():
     # Test basic encoding/decoding
     number = 12345
@@ -32,7 +48,37 @@ def test_valid_base62():
 def test_invalid_base62_conversion():
     # Test invalid Base62 string
     with pytest.raises(ValueError):
-        base62_to_objectid("invalid_base62") 
+        base62_to_objectid("invalid_base62")
+
+def test_fixed_width_round_trip():
+    for object_id in random_objectids(2000):
+        encoded = objectid_to_base62(object_id)
+        assert len(encoded) == OBJECTID_WIDTH
+        assert is_valid_base62(encoded)
+        assert base62_to_objectid(encoded) == object_id
+
+def test_encoding_preserves_order():
+    ids = sorted(random_objectids(500))
+    encoded = objectids_to_base62(ids)
+    assert encoded == sorted(encoded)
+
+def test_issued_ids_still_decode():
+    for object_id in random_objectids(2000):
+        legacy = legacy_objectid_to_base62(object_id)
+        assert base62_to_objectid(legacy) == object_id
+        assert objectid_to_base62(object_id) == legacy.rjust(OBJECTID_WIDTH, '0')
+        assert normalize_base62_id(legacy) == objectid_to_base62(object_id)
+
+def test_bulk_conversion():
+    ids = random_objectids(100)
+    assert base62_to_objectids(objectids_to_base62(ids)) == ids
+    with pytest.raises(ValueError):
+        base62_to_objectids(['1', 'not_base62'])
+
+def test_out_of_range_base62():
+    for value in ('', 'z' * OBJECTID_WIDTH, '1' * (OBJECTID_WIDTH + 1), 'abc\n'):
+        with pytest.raises(ValueError):
+            base62_to_objectid(value)
 
 # Converting ObjectId to Base62
 object_id = ObjectId()
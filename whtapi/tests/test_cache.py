@@ -0,0 +1,36 @@
+import time
+from app.utils.cache import TTLCache
+
+def test_get_and_set():
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert cache.get('missing') is None
+    assert cache.get('missing', 'default') == 'default'
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')  # 'b' is now least recently used
+    cache.set('c', 3)
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+def test_expiry():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+def test_pop_where():
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set(('u1', 'x'), 1)
+    cache.set(('u1', 'y'), 2)
+    cache.set(('u2', 'x'), 3)
+    cache.pop_where(lambda key, value: key[0] == 'u1')
+    assert cache.get(('u1', 'x')) is None
+    assert cache.get(('u1', 'y')) is None
+    assert cache.get(('u2', 'x')) == 3
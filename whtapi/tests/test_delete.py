@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+from app.models.path import delete_path_data, encode_payload, write_webhook_batch
+
+CONFIG = {'PAYLOAD_COMPRESS_THRESHOLD': 0}
+
+def matches(doc, query):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict) and '$in' in condition:
+            if value not in condition['$in']:
+                return False
+        elif isinstance(condition, dict) and '$ne' in condition:
+            if value == condition['$ne']:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+class Cursor(list):
+    def limit(self, count):
+        return Cursor(self[:count])
+
+class Collection:
+    """In-memory collection with the few operations the write path and the
+    delete_path_data job use"""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.bulk_writes = []
+
+    def find(self, query, projection=None):
+        return Cursor(doc for doc in self.docs if matches(doc, query))
+
+    def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+
+    def bulk_write(self, requests, ordered=True):
+        self.bulk_writes.extend(requests)
+
+    def delete_many(self, query):
+        kept = [doc for doc in self.docs if not matches(doc, query)]
+        deleted, self.docs = len(self.docs) - len(kept), kept
+        return type('DeleteResult', (), {'deleted_count': deleted})
+
+    def delete_one(self, query):
+        for doc in self.docs:
+            if matches(doc, query):
+                self.docs.remove(doc)
+                return
+
+class Database:
+    def __init__(self, paths):
+        self.paths = Collection(paths)
+        self.webhook_data = Collection()
+        self.webhook_payloads = Collection()
+        self.webhook_rollups = Collection()
+        self.webhook_deliveries = Collection()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+def make_entry(path_id):
+    return encode_payload({
+        '_id': ObjectId(),
+        'path_id': path_id,
+        'user_id': ObjectId(),
+        'received_at': datetime.now(timezone.utc),
+        'payload': {'a': 1}
+    }, CONFIG)
+
+def test_webhook_queued_before_delete_is_dropped():
+    live, deleted = ObjectId(), ObjectId()
+    db = Database([
+        {'_id': live, 'deleted_at': None},
+        {'_id': deleted, 'deleted_at': None},
+    ])
+    kept, late = make_entry(live), make_entry(deleted)
+
+    # delete_path marks the path while the webhook is still queued
+    db.paths.docs[1]['deleted_at'] = datetime.now(timezone.utc)
+    write_webhook_batch(db, [kept, late])
+
+    assert [doc['_id'] for doc in db.webhook_data.docs] == [kept.doc['_id']]
+    assert [update._filter['_id'] for update in db.paths.bulk_writes] == [live]
+    assert len(db.webhook_rollups.bulk_writes) == 3  # minute, hour and day of the live path
+
+    write_webhook_batch(db, [make_entry(ObjectId())])  # path already removed
+    assert len(db.webhook_data.docs) == 1
+
+def test_delete_job_removes_the_marked_path_last():
+    live, deleted = ObjectId(), ObjectId()
+    db = Database([
+        {'_id': live, 'deleted_at': None},
+        {'_id': deleted, 'deleted_at': datetime.now(timezone.utc)},
+    ])
+    db.webhook_data.docs = [{'_id': ObjectId(), 'path_id': deleted} for _ in range(3)]
+
+    result = delete_path_data(db, {'path_id': deleted, 'batch_size': 2}, lambda progress: None)
+    assert result == {'deleted': 3}
+    assert db.webhook_data.docs == []
+    assert [path['_id'] for path in db.paths.docs] == [live]
+
+    # A live path is never removed by the job
+    delete_path_data(db, {'path_id': live}, lambda progress: None)
+    assert [path['_id'] for path in db.paths.docs] == [live]
@@ -0,0 +1,23 @@
+from pymongo import MongoClient
+from app import mongo_client_options
+from app.models.path import durability_db
+from config import Config
+
+def test_tier_handles():
+    db = MongoClient(connect=False).whtesting
+    fast = durability_db(db, 'fire_and_forget')
+    assert fast.webhook_data.write_concern.document == {'w': 0}
+    assert not fast.paths.write_concern.acknowledged
+    assert durability_db(db, 'majority').webhook_data.write_concern.document == {'w': 'majority', 'j': True}
+    assert durability_db(db, 'fire_and_forget') is fast
+    assert durability_db(db, None) is db
+    assert durability_db(db, 'unknown') is db
+
+def test_client_options():
+    config = {name: getattr(Config, name) for name in dir(Config) if name.startswith('MONGO_')}
+    assert mongo_client_options(config) == {'maxPoolSize': 100, 'minPoolSize': 0}
+    config.update(MONGO_SOCKET_TIMEOUT_MS=5000, MONGO_COMPRESSORS='zlib')
+    options = mongo_client_options(config)
+    assert options['socketTimeoutMS'] == 5000
+    client = MongoClient(connect=False, **options)
+    assert client.options.pool_options.socket_timeout == 5
@@ -0,0 +1,17 @@
+from app.models.path import WEBHOOK_FIELDS
+from app.utils.fields import parse_fields, build_projection
+
+def test_default_when_not_given():
+    assert parse_fields(None, WEBHOOK_FIELDS) == (None, None)
+
+def test_unknown_fields_are_rejected():
+    fields, error = parse_fields('received_at,payload_z,secret', WEBHOOK_FIELDS)
+    assert fields is None
+    assert error == "Unknown fields: payload_z, secret"
+
+def test_projection_includes_required_and_backing_fields():
+    fields, _ = parse_fields(' ip_address, ,payload', WEBHOOK_FIELDS)
+    projection = build_projection(fields, WEBHOOK_FIELDS, always=('_id', 'received_at'))
+    assert projection['_id'] == projection['received_at'] == projection['ip_address'] == 1
+    assert 'payload_codec' in projection and 'payload_preview' in projection
+    assert 'payload_z' not in projection and 'content_type' not in projection
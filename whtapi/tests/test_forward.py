@@ -0,0 +1,184 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bson import ObjectId
+import pytest
+from app.models.forward import DELIVERED, FAILED, PENDING, Forwarder, forward_headers
+from app.routes.path import parse_forward_targets
+from app.utils.http_pool import HostPolicy, PoolManager
+
+CONFIG = {
+    'FORWARD_MAX_TARGETS': 2, 'FORWARD_CONCURRENCY': 2, 'FORWARD_MAX_CONCURRENCY': 4,
+    'FORWARD_ALLOWED_HOSTS': 'a.example'
+}
+
+class TargetHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append((self.path, self.client_address, body))
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def target():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TargetHandler)
+    server.received = []
+    server.status = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+class DeliveryLog:
+    """Collects the updates the forwarder writes to webhook_deliveries"""
+
+    def __init__(self):
+        self.updates = []
+
+    def update_one(self, query, update, upsert=False):
+        self.updates.append(update)
+
+class Database:
+    def __init__(self):
+        self.webhook_deliveries = DeliveryLog()
+
+def make_delivery(url):
+    return {
+        '_id': ObjectId(), 'webhook_id': ObjectId(), 'path_id': ObjectId(),
+        'user_id': ObjectId(), 'url': url, 'concurrency': 1, 'body': b'{"a":1}',
+        'headers': {'Content-Type': 'application/json'}, 'attempts': 0,
+        'created_at': None
+    }
+
+def test_pool_reuses_connections(target):
+    url = f'http://127.0.0.1:{target.server_port}/hooks?x=1'
+    pool, path = PoolManager().pool_for(url, 1)
+    assert path == '/hooks?x=1'
+    assert pool.acquire()
+    assert not pool.acquire()
+    assert pool.request('POST', path, b'one') == (200, b'ok')
+    assert pool.request('POST', path, b'two') == (200, b'ok')
+    pool.release()
+    assert [body for _, _, body in target.received] == [b'one', b'two']
+    assert target.received[0][1] == target.received[1][1]  # same client socket
+
+def test_attempt_retries_then_delivers(target):
+    forwarder = Forwarder()
+    forwarder.db = Database()
+    forwarder.max_attempts = 2
+    forwarder.backoff = 60
+    url = f'http://127.0.0.1:{target.server_port}/'
+    delivery = make_delivery(url)
+    pool, path = forwarder.pools.pool_for(url, 1)
+
+    target.status = 503
+    assert forwarder.attempt(delivery, pool, path) == PENDING
+    assert forwarder.pending() == 1
+    target.status = 200
+    assert forwarder.attempt(delivery, pool, path) == DELIVERED
+    updates = forwarder.db.webhook_deliveries.updates
+    assert [u['$set']['status_code'] for u in updates] == [503, 200]
+    assert updates[1]['$set']['attempts'] == 2
+
+def test_attempt_gives_up():
+    forwarder = Forwarder()
+    forwarder.db = Database()
+    forwarder.max_attempts = 1
+    url = 'http://127.0.0.1:1/'
+    pool, path = forwarder.pools.pool_for(url, 1)
+    assert forwarder.attempt(make_delivery(url), pool, path) == FAILED
+    assert forwarder.db.webhook_deliveries.updates[0]['$set']['error']
+    assert forwarder.pending() == 0
+
+def test_forward_headers():
+    headers = forward_headers(
+        [('Host', 'wht.example'), ('Content-Type', 'text/plain'), ('X-Forwarded-For', '10.0.0.1')],
+        '203.0.113.7', 'abc'
+    )
+    assert headers == {
+        'Content-Type': 'text/plain',
+        'X-Forwarded-For': '203.0.113.7',
+        'X-Whtesting-Webhook-Id': 'abc'
+    }
+
+def test_parse_forward_targets():
+    assert parse_forward_targets(None, CONFIG) == (None, None)
+    assert parse_forward_targets([{'url': 'https://a.example/h'}], CONFIG) == (
+        [{'url': 'https://a.example/h', 'concurrency': 2}], None
+    )
+    assert parse_forward_targets([{'url': 'ftp://a.example'}], CONFIG)[1]
+    assert parse_forward_targets([{'url': 'http://a.example', 'concurrency': 5}], CONFIG)[1]
+    assert parse_forward_targets([{'url': 'http://a.example'}] * 3, CONFIG)[1]
+
+def test_disallowed_targets_are_rejected():
+    config = {**CONFIG, 'FORWARD_ALLOWED_HOSTS': ''}
+    for url in ('http://169.254.169.254/latest/meta-data', 'http://127.0.0.1:8080/',
+                'http://[::ffff:10.0.0.1]/', 'http://2130706433/'):
+        assert parse_forward_targets([{'url': url}], config)[1]
+    config['FORWARD_ALLOWED_HOSTS'] = '127.0.0.0/8, *.internal.example'
+    assert not parse_forward_targets([{'url': 'http://127.0.0.1:8080/'}], config)[1]
+    assert not parse_forward_targets([{'url': 'http://hooks.internal.example/'}], config)[1]
+    assert parse_forward_targets([{'url': 'http://169.254.169.254/'}], config)[1]
+
+def test_forwarder_checks_the_address_it_connects_to(target):
+    forwarder = Forwarder()
+    forwarder.db = Database()
+    forwarder.max_attempts = 1
+    forwarder.pools = PoolManager(policy=HostPolicy(''))
+    url = f'http://127.0.0.1:{target.server_port}/'
+    pool, path = forwarder.pools.pool_for(url, 1)
+    assert forwarder.attempt(make_delivery(url), pool, path) == FAILED
+    assert 'not an allowed forward target' in forwarder.db.webhook_deliveries.updates[0]['$set']['error']
+    assert target.received == []
+
+def test_pools_are_shared_per_host_and_bounded():
+    pools = PoolManager(maxpools=2)
+    a, _ = pools.pool_for('http://a.example/one', 1)
+    assert pools.pool_for('HTTP://a.example:80/two?x', 3)[0] is a
+    assert a.maxsize == 3
+    b, _ = pools.pool_for('https://a.example/', 1)
+    assert b is not a
+
+    # The least recently used idle pool goes, a busy one is kept
+    assert b.acquire()
+    c, _ = pools.pool_for('http://c.example/', 1)
+    assert a.closed
+    assert pools.pool_for('https://a.example/', 1)[0] is b
+    b.release()
+    pools.pool_for('http://a.example/', 1)
+    assert c.closed and not b.closed
+
+def test_queue_is_bounded_by_body_size():
+    forwarder = Forwarder()
+    forwarder.enabled = True
+    forwarder.max_pending_bytes = 10
+    webhook = {'_id': ObjectId(), 'path_id': ObjectId(), 'user_id': ObjectId()}
+    targets = [{'url': 'http://a.example/', 'concurrency': 1}] * 2
+    assert forwarder.submit(webhook, targets, b'12345', {}) == 2
+    assert forwarder.submit(webhook, targets[:1], b'1', {}) == 0
+    assert forwarder.pending_bytes() == 10
+
+    forwarder._next()
+    assert forwarder.submit(webhook, targets[:1], b'1', {}) == 1
+    assert (forwarder.pending(), forwarder.pending_bytes()) == (2, 6)
+
+def test_busy_hosts_park_deliveries_until_a_slot_is_released():
+    forwarder = Forwarder()
+    pool, _ = forwarder.pools.pool_for('http://a.example/', 1)
+    first, second = make_delivery('http://a.example/'), make_delivery('http://a.example/')
+    assert forwarder._acquire(pool, first)
+    assert not forwarder._acquire(pool, second)
+    assert forwarder.pending() == 1
+    assert forwarder._schedule == []
+
+    forwarder._release(pool)
+    assert forwarder._next() is second
+    assert forwarder.pending() == 0
+    assert forwarder.pending_bytes() == 0
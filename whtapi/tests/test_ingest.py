@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from bson import ObjectId
+from flask import Flask
+from pymongo.errors import AutoReconnect
+from app.models import path as path_model
+from app.models.path import build_path_updates, store_webhook
+from app.utils.ingest import IngestQueue
+from app.utils.metrics import metrics
+from config import Config
+
+CONFIG = {
+    'INGEST_MODE': 'batched',
+    'INGEST_QUEUE_SIZE': 100,
+    'INGEST_FLUSH_INTERVAL_MS': 50,
+    'INGEST_FLUSH_MAX_DOCS': 100,
+    'INGEST_ENQUEUE_TIMEOUT_MS': 0,
+    'INGEST_FLUSH_RETRIES': 2,
+    'INGEST_FLUSH_RETRY_BACKOFF_MS': 1,
+}
+
+class Writer:
+    """Records the batches handed to it, failing the first ``failures`` calls"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.written = threading.Event()
+
+    def __call__(self, db, batch):
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect('connection reset')
+        self.batches.append(list(batch))
+        self.written.set()
+
+def start_queue(writer, **overrides):
+    ingest = IngestQueue()
+    ingest.init_app(SimpleNamespace(db=None, config={**CONFIG, **overrides}), writer)
+    return ingest
+
+def test_flushes_when_the_batch_is_full():
+    writer = Writer()
+    ingest = start_queue(writer, INGEST_FLUSH_INTERVAL_MS=10000, INGEST_FLUSH_MAX_DOCS=3)
+    started = time.monotonic()
+    for i in range(3):
+        assert ingest.submit(i)
+    assert writer.written.wait(5)
+    assert time.monotonic() - started < 5
+    assert writer.batches == [[0, 1, 2]]
+    ingest.stop()
+
+def test_flushes_after_the_interval():
+    writer = Writer()
+    ingest = start_queue(writer)
+    ingest.submit('a')
+    ingest.submit('b')
+    assert writer.written.wait(5)
+    ingest.stop()
+    assert sum(writer.batches, []) == ['a', 'b']
+
+def test_full_queue_answers_503(monkeypatch):
+    # No flusher, so the queue stays full after the first webhook
+    ingest = IngestQueue()
+    ingest.enabled = True
+    ingest._queue = queue.Queue(maxsize=1)
+    monkeypatch.setattr(path_model, 'ingest_queue', ingest)
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    with app.app_context():
+        doc = {'_id': ObjectId(), 'path_id': ObjectId(), 'received_at': datetime.now(timezone.utc),
+               'payload': {'a': 1}}
+        assert store_webhook(dict(doc)) == (True, None)
+        assert store_webhook(dict(doc, _id=ObjectId())) == (False, "Server busy, try again later")
+    assert ingest.pending() == 1
+
+def test_stop_drains_the_queue():
+    writer = Writer()
+    ingest = start_queue(writer, INGEST_FLUSH_INTERVAL_MS=10000)
+    for i in range(5):
+        ingest.submit(i)
+    ingest.stop()
+    assert sorted(sum(writer.batches, [])) == [0, 1, 2, 3, 4]
+    assert not ingest.enabled
+
+def test_failed_batches_are_retried_then_counted():
+    writer = Writer(failures=2)
+    ingest = IngestQueue()
+    ingest.writer, ingest.flush_retries, ingest.retry_backoff = writer, 2, 0.001
+    ingest._flush(['a'])
+    assert writer.batches == [['a']]
+
+    metrics.reset()
+    writer.failures = 3
+    ingest._flush(['b', 'c'])
+    assert writer.batches == [['a']]
+    assert 'whtesting_ingest_dropped_total 2' in metrics.render().splitlines()
+
+def test_path_counters_are_coalesced():
+    path_id, other = ObjectId(), ObjectId()
+    now = datetime.now(timezone.utc)
+    docs = [
+        {'path_id': path_id, 'received_at': now - timedelta(seconds=5)},
+        {'path_id': other, 'received_at': now},
+        {'path_id': path_id, 'received_at': now},
+        {'path_id': path_id, 'received_at': now - timedelta(seconds=1)},
+    ]
+    updates = {update._filter['_id']: update._doc for update in build_path_updates(docs)}
+    assert updates == {
+        path_id: {'$inc': {'webhook_count': 3}, '$max': {'last_used': now}},
+        other: {'$inc': {'webhook_count': 1}, '$max': {'last_used': now}},
+    }
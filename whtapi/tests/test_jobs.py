@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from bson import ObjectId
+from app.models.job import DONE, FAILED, QUEUED, RUNNING, JobRunner, enqueue_job
+from app.models.path import reconcile_webhook_counts
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if field == '$or':
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not all(compare(doc.get(field), op, arg) for op, arg in condition.items()):
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+def compare(value, op, arg):
+    if op == '$not':
+        return not all(compare(value, inner, inner_arg) for inner, inner_arg in arg.items())
+    if op == '$in':
+        return value in arg
+    if value is None:
+        return False
+    return {'$lt': value < arg, '$gt': value > arg, '$gte': value >= arg}[op]
+
+class Jobs:
+    """The jobs collection operations the runner uses"""
+
+    def __init__(self):
+        self.docs = []
+
+    def insert_one(self, doc):
+        self.docs.append(doc)
+
+    def find_one(self, query):
+        return next((doc for doc in self.docs if matches(doc, query)), None)
+
+    def find_one_and_update(self, query, update, sort=None, return_document=None):
+        doc = self.find_one(query)
+        if doc:
+            self.update_one({'_id': doc['_id']}, update)
+        return doc
+
+    def update_one(self, query, update):
+        doc = self.find_one(query)
+        doc.update(update.get('$set', {}))
+        for field, value in update.get('$inc', {}).items():
+            doc[field] += value
+
+    def update_many(self, query, update):
+        docs = [doc for doc in self.docs if matches(doc, query)]
+        for doc in docs:
+            doc.update(update['$set'])
+        return SimpleNamespace(modified_count=len(docs))
+
+def make_runner(handlers):
+    runner = JobRunner()
+    runner.db = SimpleNamespace(jobs=Jobs())
+    runner.handlers = handlers
+    return runner
+
+def test_jobs_run_once_their_time_comes():
+    runner = make_runner({'count': lambda db, params, report: {'counted': params['n']}})
+    later = enqueue_job(runner.db, 'count', {'n': 2},
+                        run_after=datetime.now(timezone.utc) + timedelta(hours=1))
+    job = enqueue_job(runner.db, 'count', {'n': 1})
+    enqueue_job(runner.db, 'unknown')
+
+    assert runner.run_pending() == 1
+    assert job['status'] == DONE
+    assert job['result'] == {'counted': 1}
+    assert later['status'] == QUEUED
+
+def test_failing_jobs_are_retried_up_to_max_attempts():
+    def fail(db, params, report):
+        raise RuntimeError("boom")
+    runner = make_runner({'fail': fail})
+    job = enqueue_job(runner.db, 'fail')
+
+    assert runner.run_pending() == 3
+    assert job['status'] == FAILED
+    assert job['attempts'] == 3
+    assert job['error'] == "boom"
+
+def test_expired_leases_are_resumed_until_attempts_run_out():
+    runner = make_runner({'work': lambda db, params, report: 'resumed'})
+    expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+    resumable = enqueue_job(runner.db, 'work')
+    resumable.update(status=RUNNING, attempts=1, lease_until=expired)
+    exhausted = enqueue_job(runner.db, 'work')
+    exhausted.update(status=RUNNING, attempts=3, lease_until=expired)
+
+    assert runner.run_pending() == 1
+    assert (resumable['status'], resumable['attempts']) == (DONE, 2)
+    assert (exhausted['status'], exhausted['attempts']) == (FAILED, 3)
+    assert exhausted['lease_until'] is None
+
+def test_report_saves_progress_and_renews_the_lease():
+    seen = []
+    def work(db, params, report):
+        report({'done': 1})
+        seen.append(dict(job))
+    runner = make_runner({'work': work})
+    job = enqueue_job(runner.db, 'work')
+    runner.run_pending()
+    assert seen[0]['progress'] == {'done': 1}
+    assert seen[0]['lease_until'] > datetime.now(timezone.utc)
+
+class Paths:
+    def __init__(self, docs):
+        self.docs = docs
+        self.writes = []
+
+    def find(self, query, projection=None):
+        return list(self.docs)
+
+    def bulk_write(self, requests, ordered=True):
+        self.writes.extend(requests)
+
+class Database(SimpleNamespace):
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+def test_reconcile_fixes_only_wrong_counts():
+    right, wrong, empty = ObjectId(), ObjectId(), ObjectId()
+    webhook_data = SimpleNamespace(aggregate=lambda pipeline, **kwargs: iter([
+        {'_id': right, 'count': 2},
+        {'_id': wrong, 'count': 5},
+    ]))
+    paths = Paths([
+        {'_id': right, 'webhook_count': 2},
+        {'_id': wrong, 'webhook_count': 3},
+        {'_id': empty, 'webhook_count': 1},
+    ])
+    db = Database(paths=paths, webhook_data=webhook_data)
+
+    progress = []
+    assert reconcile_webhook_counts(db, report=progress.append) == {'updated': 2}
+    assert {update._filter['_id']: update._doc for update in paths.writes} == {
+        wrong: {'$set': {'webhook_count': 5}},
+        empty: {'$set': {'webhook_count': 0}},
+    }
+    assert progress == [{'updated': 2}]
@@ -0,0 +1,32 @@
+from app.utils.metrics import MetricsRegistry
+
+def test_counter_and_labels():
+    registry = MetricsRegistry()
+    registry.inc('requests_total', command='find')
+    registry.inc('requests_total', 2, command='find')
+    registry.inc('requests_total', command='in"sert')
+    text = registry.render()
+    assert 'requests_total{command="find"} 3' in text
+    assert 'requests_total{command="in\\"sert"} 1' in text
+    assert text.count('# TYPE requests_total counter') == 1
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    for value in (0.0004, 0.003, 0.003, 20):
+        registry.observe('latency_seconds', value, stage='store')
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{stage="store",le="0.0005"} 1' in lines
+    assert 'latency_seconds_bucket{stage="store",le="0.005"} 3' in lines
+    assert 'latency_seconds_bucket{stage="store",le="10.0"} 3' in lines
+    assert 'latency_seconds_bucket{stage="store",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{stage="store"} 4' in lines
+
+def test_gauge_and_disabled_registry():
+    registry = MetricsRegistry()
+    registry.gauge('queue_pending', 'Queued items', lambda: 7)
+    registry.enabled = False
+    registry.inc('ignored_total')
+    text = registry.render()
+    assert '# TYPE queue_pending gauge' in text
+    assert 'queue_pending 7' in text
+    assert 'ignored_total' not in text
@@ -0,0 +1,32 @@
+import pytest
+from datetime import datetime, timezone
+from bson import ObjectId
+from app.utils.pagination import encode_cursor, decode_cursor, keyset_query, NEXT, PREV
+
+def test_cursor_round_trip():
+    doc = {
+        '_id': ObjectId(),
+        'received_at': datetime(2024, 2, 20, 11, 45, 0, 123000)
+    }
+    received_at, object_id, direction = decode_cursor(encode_cursor(doc, PREV))
+    assert received_at == doc['received_at'].replace(tzinfo=timezone.utc)
+    assert object_id == doc['_id']
+    assert direction == PREV
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+
+def test_keyset_query_without_cursor():
+    query, sort, direction = keyset_query({'path_id': 1}, None)
+    assert query == {'path_id': 1}
+    assert direction == NEXT
+    assert sort[0] == ('received_at', -1)
+
+def test_keyset_query_next_page():
+    doc = {'_id': ObjectId(), 'received_at': datetime(2024, 2, 20, tzinfo=timezone.utc)}
+    query, sort, direction = keyset_query({'path_id': 1}, encode_cursor(doc))
+    assert query['path_id'] == 1
+    assert query['$or'][0] == {'received_at': {'$lt': doc['received_at']}}
+    assert query['$or'][1] == {'received_at': doc['received_at'], '_id': {'$lt': doc['_id']}}
+    assert direction == NEXT
@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+from app.models.path import encode_payload, decode_payload, present_payload
+
+CONFIG = {
+    'PAYLOAD_COMPRESS_THRESHOLD': 100,
+    'PAYLOAD_EXTERNAL_THRESHOLD': 1000,
+    'PAYLOAD_PREVIEW_BYTES': 10,
+    'PAYLOAD_COMPRESSION': 'zlib'
+}
+
+def make_doc(payload):
+    return {
+        '_id': ObjectId(),
+        'path_id': ObjectId(),
+        'received_at': datetime.now(timezone.utc),
+        'payload': payload
+    }
+
+def test_small_payload_stays_inline():
+    doc = make_doc({'key': 'value'})
+    entry = encode_payload(doc, CONFIG)
+    assert entry.payload_doc is None
+    assert entry.doc['payload'] == {'key': 'value'}
+    assert decode_payload(entry.doc) == {'key': 'value'}
+    assert present_payload(entry.doc)['payload'] == {'key': 'value'}
+
+def test_medium_payload_is_compressed():
+    payload = {'key': 'v' * 500}
+    entry = encode_payload(make_doc(payload), CONFIG)
+    assert entry.payload_doc is None
+    assert 'payload' not in entry.doc
+    assert entry.doc['payload_preview'] == '{"key":"vv'
+    assert decode_payload(entry.doc) == payload
+
+def test_large_payload_is_stored_out_of_line():
+    payload = 'x' * 5000
+    entry = encode_payload(make_doc(payload), CONFIG)
+    assert entry.doc['payload_external'] is True
+    assert 'payload_z' not in entry.doc
+    assert entry.payload_doc['_id'] == entry.doc['_id']
+    assert decode_payload(entry.doc, entry.payload_doc['data']) == payload
+
+    listed = present_payload(dict(entry.doc))
+    assert listed['payload'] is None
+    assert listed['payload_truncated'] is True
+    assert listed['payload_ref'] == str(entry.doc['_id'])
+    assert listed['payload_size'] == 5000
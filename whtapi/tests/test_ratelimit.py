@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+from app.utils.ratelimit import IngestLimits, TokenBucketLimiter
+
+CONFIG = {
+    'INGEST_MAX_BODY_BYTES': 100,
+    'INGEST_MAX_INFLIGHT': 2,
+    'INGEST_RATE_PER_ID': 1000,
+    'INGEST_BURST_PER_ID': 1000,
+    'INGEST_RATE_PER_PATH': 1,
+    'INGEST_BURST_PER_PATH': 2,
+    'INGEST_RATE_MAX_KEYS': 100,
+}
+
+def make_limits(**overrides):
+    limits = IngestLimits()
+    limits.init_app(SimpleNamespace(config={**CONFIG, **overrides}, request_class=None))
+    return limits
+
+def test_bucket_allows_bursts_then_refills():
+    bucket = TokenBucketLimiter(rate=2, burst=3)
+    assert [bucket.allow('a', now=0) for _ in range(3)] == [0, 0, 0]
+    assert bucket.allow('a', now=0) == 0.5
+    assert bucket.allow('b', now=0) == 0
+    assert bucket.allow('a', now=0.5) == 0
+    assert bucket.allow('a', now=0.5) > 0
+
+def test_bucket_tracks_a_bounded_number_of_keys():
+    bucket = TokenBucketLimiter(rate=1, burst=1, maxsize=2)
+    for key in 'abc':
+        bucket.allow(key, now=0)
+    assert len(bucket) == 2
+
+def test_rate_limit_per_path():
+    limits = make_limits(INGEST_MAX_INFLIGHT=0)
+    assert limits.admit('id', 'hook', 10) == (None, None)
+    assert limits.admit('id', 'hook', 10) == (None, None)
+    status, retry_after = limits.admit('id', 'hook', 10)
+    assert status == 429 and 0 < retry_after <= 1
+    assert limits.admit('id', 'other', 10) == (None, None)
+
+def test_body_size_and_concurrency():
+    limits = make_limits(INGEST_RATE_PER_PATH=0)
+    assert limits.admit('id', 'hook', 101) == (413, None)
+    assert limits.admit('id', 'hook', None) == (None, None)
+    assert limits.admit('id', 'hook', 100) == (None, None)
+    assert limits.admit('id', 'hook', 10) == (429, 1)
+    limits.release()
+    assert limits.admit('id', 'hook', 10) == (None, None)
+    assert limits.inflight == 2
+
+def test_rejected_requests_only_count_against_the_limit_that_rejected_them():
+    limits = make_limits(INGEST_RATE_PER_ID=1, INGEST_BURST_PER_ID=3, INGEST_MAX_INFLIGHT=0)
+    assert limits.admit('id', 'hook', 10) == (None, None)
+    assert limits.admit('id', 'hook', 10) == (None, None)
+    for _ in range(5):
+        assert limits.admit('id', 'hook', 10)[0] == 429
+    # The path's rejections left the id's last token for another path
+    assert limits.admit('id', 'other', 10) == (None, None)
+
+    limits = make_limits(INGEST_RATE_PER_PATH=1, INGEST_BURST_PER_PATH=1, INGEST_MAX_INFLIGHT=1)
+    assert limits.admit('id', 'hook', 10) == (None, None)
+    assert limits.admit('id', 'other', 10) == (429, 1)
+    limits.release()
+    assert limits.admit('id', 'other', 10) == (None, None)
+
+def test_refund_never_exceeds_the_burst():
+    bucket = TokenBucketLimiter(rate=1, burst=1)
+    bucket.allow('a', now=0)
+    bucket.refund('a')
+    bucket.refund('a')
+    bucket.refund('b')
+    assert bucket.allow('a', now=0) == 0
+    assert bucket.allow('a', now=0) > 0
+    assert len(bucket) == 1
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+from app.utils.websocket import ReplayBuffer
+
+def make_buffer(size=3, max_age=60, message_queue=''):
+    buffer = ReplayBuffer()
+    buffer.init_app(SimpleNamespace(config={
+        'REPLAY_BUFFER_SIZE': size,
+        'REPLAY_MAX_AGE_S': max_age,
+        'REPLAY_MAX_USERS': 10,
+        'REPLAY_MAX_EVENTS': 100,
+        'SOCKETIO_MESSAGE_QUEUE': message_queue,
+    }))
+    return buffer
+
+def test_replays_events_after_the_last_seen():
+    buffer = make_buffer()
+    for i in range(3):
+        buffer.record('a@b.c', {'_id': str(i)})
+    buffer.record('x@y.z', {'_id': 'other'})
+    assert buffer.since('a@b.c', '0') == [{'_id': '1'}, {'_id': '2'}]
+    assert buffer.since('a@b.c', '2') == []
+    assert buffer.since('a@b.c', 'unknown') is None
+    assert buffer.since('nobody@b.c', '0') is None
+
+def test_gap_outside_the_buffer():
+    buffer = make_buffer(size=2)
+    for i in range(3):
+        buffer.record('a@b.c', {'_id': str(i)})
+    # Event 0 was pushed out, the caller has to fall back to the database
+    assert buffer.since('a@b.c', '0') is None
+    assert buffer.since('a@b.c', '1') == [{'_id': '2'}]
+
+def test_old_events_expire():
+    buffer = make_buffer(max_age=0)
+    buffer.record('a@b.c', {'_id': '0'})
+    buffer.record('a@b.c', {'_id': '1'})
+    assert buffer.since('a@b.c', '0') is None
+
+def test_disabled_with_a_message_queue():
+    buffer = make_buffer(message_queue='mongodb')
+    buffer.record('a@b.c', {'_id': '0'})
+    buffer.record('a@b.c', {'_id': '1'})
+    assert buffer.since('a@b.c', '0') is None
@@ -0,0 +1,14 @@
+from app.models.retention import effective_retention
+
+def test_global_retention_only():
+    assert effective_retention({}, 30) == {'max_age_days': 30, 'max_count': None}
+
+def test_no_retention():
+    assert effective_retention({}, 0) == {'max_age_days': None, 'max_count': None}
+
+def test_path_can_only_shorten_max_age():
+    path = {'retention': {'max_age_days': 7, 'max_count': 100}}
+    assert effective_retention(path, 30) == {'max_age_days': 7, 'max_count': 100}
+    path = {'retention': {'max_age_days': 90}}
+    assert effective_retention(path, 30)['max_age_days'] == 30
+    assert effective_retention(path, 0)['max_age_days'] == 90
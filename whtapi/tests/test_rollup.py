@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from bson import ObjectId
+from app.models.rollup import RollupBuffer, bucket_start, fill_series, remove_rollups
+from app.routes.path import CHART_MAX_POINTS, parse_chart_args
+
+class Rollups:
+    def __init__(self):
+        self.updates = []
+
+    def bulk_write(self, requests, ordered=True):
+        self.updates.extend(requests)
+
+def test_bucket_start():
+    dt = datetime(2024, 2, 20, 11, 45, 30, 500, tzinfo=timezone.utc)
+    assert bucket_start(dt, 'minute') == datetime(2024, 2, 20, 11, 45, tzinfo=timezone.utc)
+    assert bucket_start(dt, 'hour') == datetime(2024, 2, 20, 11, tzinfo=timezone.utc)
+    assert bucket_start(dt, 'day') == datetime(2024, 2, 20, tzinfo=timezone.utc)
+    # Naive datetimes from Mongo are UTC
+    assert bucket_start(dt.replace(tzinfo=None), 'hour') == bucket_start(dt, 'hour')
+
+def test_fill_series_fills_gaps():
+    start = datetime(2024, 2, 20, 11, 0, 30, tzinfo=timezone.utc)
+    end = datetime(2024, 2, 20, 11, 3, tzinfo=timezone.utc)
+    minute = datetime(2024, 2, 20, 11, 1, tzinfo=timezone.utc).timestamp() * 1000
+    timestamps, counts = fill_series({minute: 4}, 'minute', start, end)
+    assert len(timestamps) == 4
+    assert timestamps[0] == datetime(2024, 2, 20, 11, tzinfo=timezone.utc).timestamp() * 1000
+    assert timestamps[1] - timestamps[0] == 60000
+    assert counts == [0, 4, 0, 0]
+
+def test_parse_chart_args():
+    assert parse_chart_args({}) == (timedelta(hours=1), 'minute', None)
+    assert parse_chart_args({'range': '30d'}) == (timedelta(days=30), 'day', None)
+    assert parse_chart_args({'range': '24h', 'resolution': 'minute'}) == (timedelta(hours=24), 'minute', None)
+    assert parse_chart_args({'range': '1x'})[2] == "Invalid range"
+    assert parse_chart_args({'range': '0h'})[2] == "Invalid range"
+    assert parse_chart_args({'resolution': 'week'})[2] == "Invalid resolution"
+
+    days = CHART_MAX_POINTS // (24 * 60) + 1
+    assert parse_chart_args({'range': f'{days}d', 'resolution': 'minute'})[2] == \
+        "Too many points, use a coarser resolution"
+    assert parse_chart_args({'range': f'{CHART_MAX_POINTS}m', 'resolution': 'minute'})[2] is None
+
+def test_buffer_coalesces_counts_per_bucket():
+    rollups = Rollups()
+    buffer = RollupBuffer()
+    buffer.db = SimpleNamespace(webhook_rollups=rollups)
+    path_id = ObjectId()
+    now = datetime(2024, 2, 20, 11, 45, tzinfo=timezone.utc)
+    for seconds in (1, 2, 3):
+        buffer.add([{'path_id': path_id, 'received_at': now + timedelta(seconds=seconds)}])
+    assert rollups.updates == []
+
+    buffer.flush()
+    assert len(rollups.updates) == 3  # minute, hour, day
+    assert {update._doc['$inc']['count'] for update in rollups.updates} == {3}
+    assert all(update._upsert for update in rollups.updates)
+
+    buffer.flush()
+    assert len(rollups.updates) == 3
+
+def test_pruned_webhooks_leave_their_buckets():
+    rollups = Rollups()
+    path_id = ObjectId()
+    now = datetime(2024, 2, 20, 11, 45, tzinfo=timezone.utc)
+    remove_rollups(SimpleNamespace(webhook_rollups=rollups), [
+        {'path_id': path_id, 'received_at': now},
+        {'path_id': path_id, 'received_at': now + timedelta(minutes=1)},
+    ])
+    minute = [u for u in rollups.updates if u._filter['resolution'] == 'minute']
+    day = [u for u in rollups.updates if u._filter['resolution'] == 'day']
+    assert [u._doc for u in minute] == [{'$inc': {'count': -1}}] * 2
+    assert [u._doc for u in day] == [{'$inc': {'count': -2}}]
+    assert not any(update._upsert for update in rollups.updates)
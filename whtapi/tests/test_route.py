@@ -0,0 +1,131 @@
+import pickle
+from types import SimpleNamespace
+import pytest
+from bson import ObjectId
+from flask import Flask
+from app.models.route import RouteTable
+from app.utils.base62 import objectid_to_base62
+from app.utils.pubsub import RelayMixin
+
+CONFIG = {'ROUTE_CACHE_SIZE': 100, 'ROUTE_CACHE_TTL': 60, 'ROUTE_CACHE_NEGATIVE_TTL': 60}
+
+class Collection:
+    """Serves documents by _id, or by user_id and path, counting lookups"""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.lookups = 0
+
+    def find_one(self, query, projection=None):
+        self.lookups += 1
+        for doc in self.docs:
+            if all(doc.get(field) == value for field, value in query.items()):
+                return dict(doc)
+        return None
+
+@pytest.fixture
+def db():
+    user_id = ObjectId()
+    db = SimpleNamespace(
+        users=Collection([{'_id': user_id, 'email': 'a@example.com'}]),
+        paths=Collection([{'_id': ObjectId(), 'user_id': user_id, 'path': 'hook', 'deleted_at': None}])
+    )
+    db.user_id = user_id
+    db.base62_id = objectid_to_base62(user_id)
+    app = Flask(__name__)
+    app.db = db
+    with app.app_context():
+        yield db
+
+def make_table():
+    table = RouteTable()
+    table.init_app(SimpleNamespace(config=CONFIG))
+    return table
+
+def test_resolved_routes_are_cached(db):
+    table = make_table()
+    route, error = table.resolve(db.base62_id, 'hook')
+    assert error is None
+    assert route['user_id'] == db.user_id
+    assert route['email'] == 'a@example.com'
+    assert table.resolve(db.base62_id, 'hook') == (route, None)
+    assert (db.users.lookups, db.paths.lookups) == (1, 1)
+
+def test_unknown_paths_and_users_are_cached(db):
+    table = make_table()
+    assert table.resolve(db.base62_id, 'other') == (None, "Path not found")
+    assert table.resolve(db.base62_id, 'other') == (None, "Path not found")
+    assert db.paths.lookups == 1
+
+    unknown = objectid_to_base62(ObjectId())
+    assert table.resolve(unknown, 'hook') == (None, "User not found")
+    # Every path of an unknown user is answered from the user-level miss
+    assert table.resolve(unknown, 'anything') == (None, "User not found")
+    assert db.users.lookups == 2
+
+def test_invalidate_drops_the_path_and_its_misses(db):
+    table = make_table()
+    notified = []
+    table.add_invalidation_listener(lambda *args: notified.append(args))
+    table.resolve(db.base62_id, 'hook')
+    table.resolve(db.base62_id, 'new')
+
+    # Path created: the miss goes, the other route stays
+    db.paths.docs.append({'_id': ObjectId(), 'user_id': db.user_id, 'path': 'new', 'deleted_at': None})
+    table.invalidate(db.user_id, 'new')
+    assert notified == [(db.user_id, 'new')]
+    assert table.resolve(db.base62_id, 'new')[1] is None
+    lookups = db.paths.lookups
+    table.resolve(db.base62_id, 'hook')
+    assert db.paths.lookups == lookups
+
+    # A user-wide invalidation from another process, not passed on
+    db.paths.docs[0]['deleted_at'] = 1
+    table.apply_invalidation(db.user_id)
+    assert table.resolve(db.base62_id, 'hook') == (None, "Path not found")
+    assert len(notified) == 1
+
+class Backend:
+    """Stands in for a python-socketio pub/sub manager"""
+
+    def __init__(self, host_id, received=()):
+        self.host_id = host_id
+        self.received = list(received)
+        self.published = []
+
+    def _publish(self, data):
+        self.published.append(pickle.dumps(data))
+
+    def _listen(self):
+        yield from self.received
+
+class Relay(RelayMixin, Backend):
+    pass
+
+def test_invalidations_travel_over_any_queue(db):
+    table = make_table()
+    sender = Relay('sender')
+    table.add_invalidation_listener(
+        lambda user_id, user_path: sender.publish_message('route_invalidate', (user_id, user_path))
+    )
+    table.invalidate(db.user_id, 'hook')
+
+    receiver_table = make_table()
+    receiver_table.resolve(db.base62_id, 'hook')
+    emit = pickle.dumps({'method': 'emit', 'event': 'webhook_update_batch', 'host_id': 'sender'})
+    receiver = Relay('receiver', sender.published + [emit])
+    receiver.subscribe('route_invalidate', lambda data: receiver_table.apply_invalidation(*data))
+
+    # Socket.IO's own messages still reach it
+    assert list(receiver._listen()) == [emit]
+    db.paths.docs[0]['deleted_at'] = 1
+    assert receiver_table.resolve(db.base62_id, 'hook') == (None, "Path not found")
+
+def test_legacy_and_padded_ids_share_a_route(db):
+    table = make_table()
+    legacy = db.base62_id.lstrip('0')
+    assert legacy != db.base62_id
+    route, error = table.resolve(legacy, 'hook')
+    assert error is None
+    assert table.resolve(db.base62_id, 'hook') == (route, None)
+    assert (db.users.lookups, db.paths.lookups) == (1, 1)
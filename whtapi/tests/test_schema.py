@@ -0,0 +1,80 @@
+from app.schema import RETENTION_TTL_INDEX, check_indexes, declared_indexes, ensure_indexes
+
+CONFIG = {'WEBHOOK_STORAGE': 'standard', 'RETENTION_DAYS': 0, 'RETENTION_GRACE_DAYS': 1}
+
+class Collection:
+    """Keeps index specs the way index_information reports them"""
+
+    def __init__(self, indexes):
+        self.indexes = {'_id_': {'key': [('_id', 1)]}, **indexes}
+
+    def index_information(self):
+        return {name: dict(spec) for name, spec in self.indexes.items()}
+
+    def create_indexes(self, models):
+        for model in models:
+            self.indexes[model.document['name']] = spec_of(model)
+
+    def drop_index(self, name):
+        del self.indexes[name]
+
+class Database(dict):
+    def __init__(self, config):
+        super().__init__({
+            name: Collection({model.document['name']: spec_of(model) for model in models})
+            for name, models in declared_indexes(config).items()
+        })
+        self.commands = []
+
+    def command(self, *args, **kwargs):
+        self.commands.append((args, kwargs))
+
+def spec_of(model):
+    spec = dict(model.document)
+    spec['key'] = list(spec['key'].items())
+    return spec
+
+def test_matching_indexes_report_nothing():
+    assert check_indexes(Database(CONFIG), CONFIG) == {}
+
+def test_differences_are_reported_by_collection():
+    db = Database(CONFIG)
+    del db['users'].indexes['email_1']
+    db['users'].indexes['base62_id_1'].pop('unique')
+    db['paths'].indexes['user_id_1_path_1'] = {'key': [('user_id', 1), ('path', 1)], 'unique': True}
+
+    assert check_indexes(db, CONFIG) == {
+        'users': {'missing': ['email_1'], 'changed': ['base62_id_1'], 'extra': []},
+        'paths': {'missing': [], 'changed': [], 'extra': ['user_id_1_path_1']},
+    }
+
+def test_ensure_drops_retired_indexes_and_keeps_unknown_ones():
+    db = Database(CONFIG)
+    db['paths'].indexes['user_id_1_path_1'] = {'key': [('user_id', 1), ('path', 1)], 'unique': True}
+    db['paths'].indexes['custom_1'] = {'key': [('custom', 1)]}
+    del db['users'].indexes['email_1']
+
+    ensure_indexes(db, CONFIG)
+    assert check_indexes(db, CONFIG) == {
+        'paths': {'missing': [], 'changed': [], 'extra': ['custom_1']},
+    }
+
+    ensure_indexes(db, CONFIG, drop_extra=True)
+    assert check_indexes(db, CONFIG) == {}
+
+def test_ensure_changes_retention_ttl_in_place():
+    config = dict(CONFIG, RETENTION_DAYS=30)
+    db = Database(config)
+    db['webhook_data'].indexes[RETENTION_TTL_INDEX]['expireAfterSeconds'] = 86400
+
+    assert check_indexes(db, config) == {
+        'webhook_data': {'missing': [], 'changed': [RETENTION_TTL_INDEX], 'extra': []},
+    }
+    ensure_indexes(db, config)
+    assert db.commands == [(('collMod', 'webhook_data'), {'index': {
+        'name': RETENTION_TTL_INDEX, 'expireAfterSeconds': 31 * 86400
+    }})]
+
+    # With retention turned off the TTL index is dropped
+    ensure_indexes(db, CONFIG)
+    assert RETENTION_TTL_INDEX not in db['webhook_data'].indexes
@@ -0,0 +1,50 @@
+from bson import ObjectId
+from app.models.search import add_search_fields, build_search_query, flatten_payload
+
+CONFIG = {'SEARCH_MAX_FIELDS': 32, 'SEARCH_MAX_VALUE_LENGTH': 8, 'SEARCH_TEXT_BYTES': 16}
+
+def test_flatten_nested_payload():
+    payload = {'order': {'id': 42, 'items': [{'sku': 'A'}, {'sku': 'A'}, {'sku': 'B'}]}, 'ok': True}
+    assert flatten_payload(payload, 32, 128) == [
+        {'k': 'ok', 'v': True},
+        {'k': 'order.id', 'v': 42},
+        {'k': 'order.items.sku', 'v': 'A'},
+        {'k': 'order.items.sku', 'v': 'B'},
+    ]
+
+def test_flatten_is_bounded():
+    payload = {'deep': {'a': {'b': 1}}, 'long': 'x' * 20}
+    payload.update({f'f{i}': i for i in range(10)})
+    fields = flatten_payload(payload, 5, 8)
+    assert len(fields) == 5
+    assert {'k': 'long', 'v': 'x' * 8} in fields
+    assert all(field['k'] != 'deep.a.b' for field in fields)
+
+def test_add_search_fields():
+    doc = add_search_fields({'payload': {'message': 'héllo wörld, again'}}, CONFIG)
+    assert doc['search_fields'] == [{'k': 'message', 'v': 'héllo wö'}]
+    assert len(doc['search_text'].encode('utf-8')) <= 16
+    text_doc = add_search_fields({'payload': 'plain body'}, CONFIG)
+    assert 'search_fields' not in text_doc
+    assert text_doc['search_text'] == 'plain body'
+
+def test_build_search_query():
+    path_id = ObjectId()
+    query, error = build_search_query(path_id, {
+        'payload.order.id': '42',
+        'ip': '10.0.0.1',
+        'content_type': 'application/json',
+        'limit': '10'
+    }, CONFIG)
+    assert error is None
+    assert query['path_id'] == path_id
+    assert query['ip_address'] == '10.0.0.1'
+    assert query['content_type'] == {'$regex': '^application/json'}
+    assert query['search_fields'] == {'$all': [
+        {'$elemMatch': {'k': 'order.id', 'v': {'$in': ['42', 42]}}}
+    ]}
+
+def test_disabled_search():
+    config = {**CONFIG, 'SEARCH_MAX_FIELDS': 0, 'SEARCH_TEXT_BYTES': 0}
+    assert build_search_query(ObjectId(), {'payload.a': '1'}, config)[1] == "Payload search is disabled"
+    assert build_search_query(ObjectId(), {'q': 'error'}, config)[1] == "Text search is disabled"
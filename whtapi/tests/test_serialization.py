@@ -0,0 +1,36 @@
+import json
+from datetime import datetime, timezone
+from bson import ObjectId, encode
+from bson.raw_bson import RawBSONDocument
+from app.utils import serialization
+from app.utils.serialization import dumps_bytes
+
+OID = ObjectId('65d4a1f2c3b8a9e7f6d5c4b3')
+
+def _doc():
+    return {
+        '_id': OID,
+        'received_at': datetime(2024, 2, 20, 11, 45, 0, 123000),
+        'created_at': datetime(2024, 2, 20, 11, 45, tzinfo=timezone.utc),
+        'payload': {'ids': [OID], 'text': 'café'}
+    }
+
+EXPECTED = {
+    '_id': str(OID),
+    'received_at': '2024-02-20T11:45:00.123000',
+    'created_at': '2024-02-20T11:45:00+00:00',
+    'payload': {'ids': [str(OID)], 'text': 'café'}
+}
+
+def test_bson_types_match_manual_conversion():
+    assert json.loads(dumps_bytes(_doc())) == EXPECTED
+
+def test_json_fallback(monkeypatch):
+    monkeypatch.setattr(serialization, 'orjson', None)
+    assert json.loads(dumps_bytes(_doc())) == EXPECTED
+
+def test_raw_bson_document():
+    raw = RawBSONDocument(encode({'_id': OID, 'nested': {'path_id': OID}}))
+    assert json.loads(dumps_bytes({'data': [raw]})) == {
+        'data': [{'_id': str(OID), 'nested': {'path_id': str(OID)}}]
+    }
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+from bson import ObjectId
+from pymongo import MongoClient, DESCENDING
+from app.models.storage import (
+    WebhookStorage,
+    to_timeseries,
+    from_timeseries,
+    timeseries_query,
+    merge_sorted
+)
+from app.schema import declared_indexes
+from config import Config
+
+CONFIG = {
+    'WEBHOOK_STORAGE': 'timeseries',
+    'WEBHOOK_TIMESERIES_COLLECTION': 'webhook_events',
+    'WEBHOOK_TIMESERIES_GRANULARITY': 'seconds',
+    'WEBHOOK_DUAL_READ': False,
+    'RETENTION_DAYS': 0,
+}
+
+def make_storage(version=(7, 0, 2, 0), **overrides):
+    storage = WebhookStorage()
+    storage.ensure_collection = lambda db: None
+    db = SimpleNamespace(client=SimpleNamespace(server_info=lambda: {'versionArray': list(version)}))
+    storage.init_app(SimpleNamespace(db=db, config={**CONFIG, **overrides}))
+    return storage
+
+def test_documents_round_trip():
+    doc = {'_id': ObjectId(), 'path_id': ObjectId(), 'user_id': ObjectId(), 'payload': {'a': 1}}
+    stored = to_timeseries(doc)
+    assert 'path_id' not in stored
+    assert stored['meta'] == {'path_id': doc['path_id'], 'user_id': doc['user_id']}
+    assert from_timeseries(stored) == doc
+
+def test_queries_use_the_meta_field():
+    path_id = ObjectId()
+    query = timeseries_query({
+        'path_id': path_id,
+        '$or': [{'received_at': 1}, {'user_id': 2, '_id': 3}]
+    })
+    assert query == {
+        'meta.path_id': path_id,
+        '$or': [{'received_at': 1}, {'meta.user_id': 2, '_id': 3}]
+    }
+
+def test_merge_drops_copied_documents():
+    sort = [('received_at', DESCENDING), ('_id', DESCENDING)]
+    migrated = [{'_id': 5, 'received_at': 5}, {'_id': 3, 'received_at': 3}]
+    legacy = [{'_id': 4, 'received_at': 4}, {'_id': 3, 'received_at': 3}, {'_id': 1, 'received_at': 1}]
+    assert [doc['_id'] for doc in merge_sorted([migrated, legacy], sort)] == [5, 4, 3, 1]
+
+def test_backends():
+    db = MongoClient(connect=False).whtesting
+    standard = make_storage(WEBHOOK_STORAGE='standard')
+    assert standard.collection(db).name == 'webhook_data'
+    assert standard.reads_legacy
+    lookup = standard.latest_lookup(db, 3, {'payload_z': 0}, 'events')['$lookup']
+    assert lookup['from'] == 'webhook_data'
+
+    timeseries = make_storage()
+    assert timeseries.collection(db).name == 'webhook_events'
+    assert not timeseries.reads_legacy
+    lookup = timeseries.latest_lookup(db, 3, {'payload_z': 0}, 'events')['$lookup']
+    assert lookup['from'] == 'webhook_events'
+    assert lookup['pipeline'][0] == {'$match': {'$expr': {'$eq': ['$meta.path_id', '$$path_id']}}}
+
+def test_deletes_by_filter():
+    assert make_storage(WEBHOOK_STORAGE='standard').deletes_by_filter
+    assert make_storage().deletes_by_filter
+    assert not make_storage(version=(6, 0, 14, 0)).deletes_by_filter
+
+def test_timeseries_indexes():
+    config = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+    assert 'webhook_events' not in declared_indexes(config)
+    config['WEBHOOK_STORAGE'] = 'timeseries'
+    indexes = declared_indexes(config)['webhook_events']
+    assert [list(index.document['key']) for index in indexes] == [
+        ['meta.path_id', 'received_at'], ['meta.user_id', 'received_at'],
+        ['meta.path_id', 'ip_address', 'received_at'],
+        ['meta.path_id', 'search_fields.k', 'search_fields.v', 'received_at']
+    ]
@@ -0,0 +1,115 @@
+import json
+from types import SimpleNamespace
+import pytest
+from socketio.packet import Packet
+from app.utils import websocket
+from app.utils.pubsub import BoundedManager
+from app.utils.websocket import EmitScheduler
+
+@pytest.fixture
+def emitted(monkeypatch):
+    calls = []
+    monkeypatch.setattr(websocket.socketio, 'emit',
+                        lambda event, data, room=None, **kwargs: calls.append((event, data, room)))
+    return calls
+
+def make_scheduler(interval=0.05, max_pending=3, max_payload_bytes=100):
+    scheduler = EmitScheduler()
+    scheduler.interval = interval
+    scheduler.max_pending = max_pending
+    scheduler.max_payload_bytes = max_payload_bytes
+    return scheduler
+
+def test_events_are_coalesced_per_room(emitted):
+    scheduler = make_scheduler()
+    scheduler.schedule('a@x', {'_id': '1', 'payload': {}})
+    scheduler.schedule('a@x', {'_id': '2', 'payload': {}})
+    scheduler.schedule('b@x', {'_id': '3', 'payload': {}})
+    assert emitted == []
+    assert scheduler.pending() == 3
+    assert scheduler.pending_ids('a@x') == {'1', '2'}
+
+    scheduler.flush()
+    assert emitted == [
+        ('webhook_update_batch', {'events': [{'_id': '1', 'payload': {}}, {'_id': '2', 'payload': {}}], 'missed': 0}, 'a@x'),
+        ('webhook_update_batch', {'events': [{'_id': '3', 'payload': {}}], 'missed': 0}, 'b@x'),
+    ]
+    assert scheduler.pending() == 0
+
+def test_overflow_drops_the_oldest_and_counts_them(emitted):
+    scheduler = make_scheduler(max_pending=2)
+    for i in range(5):
+        scheduler.schedule('a@x', {'_id': str(i), 'payload': {}})
+    scheduler.flush()
+    _, batch, _ = emitted[0]
+    assert [event['_id'] for event in batch['events']] == ['3', '4']
+    assert batch['missed'] == 3
+
+    scheduler.schedule('a@x', {'_id': '5', 'payload': {}})
+    scheduler.flush()
+    assert emitted[1][1]['missed'] == 0
+
+def test_large_payloads_are_left_out(emitted):
+    scheduler = make_scheduler(max_payload_bytes=10)
+    small = scheduler.schedule('a@x', {'_id': '1', 'payload': 'short'})
+    assert small['payload'] == 'short'
+
+    large = scheduler.schedule('a@x', {'_id': '2', 'payload': {'key': 'x' * 20}})
+    assert large['payload'] is None
+    assert large['payload_truncated'] is True
+    assert large['payload_size'] == len('{"key": "' + 'x' * 20 + '"}')
+
+    # The received size is trusted over the payload
+    sized = scheduler.schedule('a@x', {'_id': '3', 'payload': 'short'}, payload_size=500)
+    assert sized['payload_truncated'] is True
+    assert sized['payload_size'] == 500
+
+def test_zero_interval_emits_right_away(emitted):
+    scheduler = make_scheduler(interval=0)
+    scheduler.schedule('a@x', {'_id': '1', 'payload': {}})
+    assert emitted == [('webhook_update_batch', {'events': [{'_id': '1', 'payload': {}}], 'missed': 0}, 'a@x')]
+    assert scheduler.pending() == 0
+
+class EngineSocket:
+    def __init__(self, backlog):
+        self.queue = SimpleNamespace(qsize=lambda: backlog[0])
+
+def make_manager(backlogs):
+    """A BoundedManager with one connection per backlog, all in room 'a@x'"""
+    sent = []
+    server = SimpleNamespace(
+        eio=SimpleNamespace(sockets={}, generate_id=lambda: f'sid{len(server.eio.sockets)}'),
+        packet_class=Packet,
+        _send_eio_packet=lambda eio_sid, pkt: sent.append(
+            (eio_sid, json.loads(pkt.data[pkt.data.index('['):])[1])
+        )
+    )
+    manager = BoundedManager()
+    manager.set_server(server)
+    manager.max_backlog = 2
+    for i, backlog in enumerate(backlogs):
+        eio_sid = f'eio{i}'
+        sid = manager.connect(eio_sid, '/')
+        server.eio.sockets[eio_sid] = EngineSocket(backlog)
+        manager.enter_room(sid, '/', 'a@x')
+    return manager, sent
+
+def test_slow_connections_miss_batches():
+    fast, slow = [0], [5]
+    manager, sent = make_manager([fast, slow])
+    manager.emit('webhook_update_batch', {'events': [1, 2], 'missed': 1}, '/', room='a@x')
+    assert [eio_sid for eio_sid, _ in sent] == ['eio0']
+
+    # Once caught up, the slow connection learns what it missed
+    slow[0] = 0
+    sent.clear()
+    manager.emit('webhook_update_batch', {'events': [3], 'missed': 0}, '/', room='a@x')
+    received = {eio_sid: data for eio_sid, data in sent}
+    assert received['eio0'] == {'events': [3], 'missed': 0}
+    assert received['eio1'] == {'events': [3], 'missed': 3}
+
+    # Other events are never held back
+    slow[0] = 5
+    sent.clear()
+    manager.emit('authenticated', {'status': 'success'}, '/', room='a@x')
+    assert sorted(eio_sid for eio_sid, _ in sent) == ['eio0', 'eio1']
@@ -76,7 +76,8 @@ export default {
       exportSuccess: 'Data exported successfully',
       exportError: 'Failed to export data',
       urlCopied: 'Webhook URL copied to clipboard',
-      copyError: 'Failed to copy URL to clipboard'
+      copyError: 'Failed to copy URL to clipboard',
+      payloadError: 'Failed to load the full payload'
     }
   },
   common: {
@@ -76,7 +76,8 @@ export default {
       exportSuccess: 'Datos exportados correctamente',
       exportError: 'Error al exportar los datos',
       urlCopied: 'URL del webhook copiada al portapapeles',
-      copyError: 'Error al copiar la URL al portapapeles'
+      copyError: 'Error al copiar la URL al portapapeles',
+      payloadError: 'Error al cargar el payload completo'
     }
   },
   common: {
@@ -1,7 +1,7 @@
 import { defineStore } from 'pinia'
 import { api } from 'src/boot/axios'
 import { useSocketStore } from 'src/stores/socket'
-import { exportToCSV } from 'src/utils/export'
+import { downloadBlob } from 'src/utils/export'
 
 export const usePathStore = defineStore('path', {
   state: () => ({
@@ -22,11 +22,19 @@ export const usePathStore = defineStore('path', {
       console.log('Fetching paths...')
       this.loading = true
       try {
-        const response = await api.get('/api/paths/')
+        // The summary includes each path's sparkline, so the mini charts
+        // don't need a request of their own
+        const response = await api.get('/api/paths/summary')
         console.log('Paths response:', response)
         
         if (response.data.success) {
-          this.paths = response.data.data || []
+          const paths = response.data.data || []
+          paths.forEach(({ _id, chart }) => {
+            if (chart) {
+              this.chartData.set(_id, chart)
+            }
+          })
+          this.paths = paths.map(({ chart, ...path }) => path)
           console.log('Paths updated:', this.paths)
         } else {
           console.error('Failed to fetch paths:', response.data.error)
@@ -68,8 +76,10 @@ export const usePathStore = defineStore('path', {
       console.log('Fetching path data for:', pathId)
       this.pathData.loading = true
       try {
+        // The list only shows these fields, payloads are fetched when an
+        // item is expanded
         const response = await api.get(`/api/paths/${pathId}/data/`, {
-          params: { limit, skip }
+          params: { limit, skip, fields: 'path_id,received_at,content_type,ip_address' }
         })
         console.log('Path data response:', response)
 
@@ -91,6 +101,20 @@ export const usePathStore = defineStore('path', {
       }
     },
 
+    async fetchWebhookPayload(pathId, item) {
+      // Payloads are left out of the list (or listed by preview only when
+      // large), fetch the full body on demand
+      try {
+        const response = await api.get(`/api/paths/${pathId}/data/${item.payload_ref || item._id}/payload`)
+        if (response.data.success) {
+          item.payload = response.data.data.payload
+          item.payload_truncated = false
+        }
+      } catch (error) {
+        throw error.response?.data?.error || 'Failed to fetch payload'
+      }
+    },
+
     setupWebhookListener() {
       console.log('Setting up webhook listener...')
       const socketStore = useSocketStore()
@@ -104,9 +128,22 @@ export const usePathStore = defineStore('path', {
       this.cleanupWebhookListener()
 
       try {
-        socketStore.socket.on('webhook_update', (data) => {
-          console.log('Webhook update received:', data)
-          this.handleWebhookUpdate(data)
+        // Updates arrive in batches; `missed` counts events the server had
+        // to drop because we fell behind, and `resync` is set when the
+        // updates missed while disconnected could not be replayed, so
+        // resync the counts from the API
+        socketStore.socket.on('webhook_update_batch', (batch) => {
+          console.log('Webhook update batch received:', batch)
+          const { events = [], missed = 0, resync = false } = batch || {}
+          events.forEach(data => this.handleWebhookUpdate(data))
+          if (events.length > 0) {
+            socketStore.lastEventId = events[events.length - 1]._id
+          }
+          if (missed > 0 || resync) {
+            this.fetchPaths().catch(error => {
+              console.error('Error resyncing paths:', error)
+            })
+          }
         })
         console.log('Webhook listener setup complete')
       } catch (error) {
@@ -185,7 +222,7 @@ export const usePathStore = defineStore('path', {
       const socketStore = useSocketStore()
       if (socketStore.socket) {
         try {
-          socketStore.socket.off('webhook_update')
+          socketStore.socket.off('webhook_update_batch')
           console.log('Webhook listener cleaned up')
         } catch (error) {
           console.error('Error cleaning up webhook listener:', error)
@@ -210,13 +247,13 @@ export const usePathStore = defineStore('path', {
 
     async exportPathData(pathId, pathName) {
       try {
-        const response = await api.get(`/api/paths/${pathId}/data/`, {
-          params: { limit: 1000000 } // Get all data
+        // The server streams every row as CSV (same columns as exportToCSV)
+        const response = await api.get(`/api/paths/${pathId}/export`, {
+          params: { format: 'csv', gzip: true },
+          responseType: 'blob'
         })
-        if (response.data.success) {
-          const filename = `webhook-data-${pathName}-${new Date().toISOString().split('T')[0]}.csv`
-          exportToCSV(response.data.data.data, filename)
-        }
+        const filename = `webhook-data-${pathName}-${new Date().toISOString().split('T')[0]}.csv`
+        downloadBlob(response.data, filename)
       } catch (error) {
         console.error('Error exporting data:', error)
         throw error
@@ -6,13 +6,17 @@ export const useSocketStore = defineStore('socket', {
     socket: null,
     connected: false,
     authenticated: false,
-    reconnectAttempts: 0
+    reconnectAttempts: 0,
+    // Id of the last live update received, sent on reconnect so the
+    // server can replay what was missed in between
+    lastEventId: null
   }),
 
   actions: {
     initialize(token) {
       // Clean up existing connection first
       this.disconnect()
+      this.lastEventId = null
 
       console.log('Initializing socket connection...')
 
@@ -35,8 +39,11 @@ export const useSocketStore = defineStore('socket', {
           console.log('Socket connected, sending authentication...')
           this.connected = true
           this.reconnectAttempts = 0
-          // Send authentication immediately after connection
-          this.socket.emit('authenticate', token)
+          // Send authentication immediately after connection, with the
+          // last update seen when this is a reconnect
+          this.socket.emit('authenticate', this.lastEventId
+            ? { token, last_event_id: this.lastEventId }
+            : token)
         })
 
         this.socket.on('authenticated', (response) => {
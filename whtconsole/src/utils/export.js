@@ -15,6 +15,10 @@ export function exportToCSV(data, filename) {
   // Join fields with semicolon instead of comma
   const csvContent = csvRows.map(row => row.join(';')).join('\n')
   const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' })
+  downloadBlob(blob, filename)
+}
+
+export function downloadBlob(blob, filename) {
   const link = document.createElement('a')
   
   if (navigator.msSaveBlob) { // IE 10+